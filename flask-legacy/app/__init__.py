@@ -21,12 +21,39 @@ def create_app(config_name=None):
     CORS(app)
     
     # 注册蓝图
-    from app.routes import auth, mdm, dictionary, item_query, approval
+    from app.routes import auth, mdm, dictionary, item_query, approval, metrics, suggest
     app.register_blueprint(auth.bp)
     app.register_blueprint(mdm.bp, url_prefix='/api/mdm')
     app.register_blueprint(dictionary.bp, url_prefix='/api/dictionary')
     app.register_blueprint(item_query.bp, url_prefix='/api/item')
     app.register_blueprint(approval.bp, url_prefix='/api/approval')
+    app.register_blueprint(metrics.bp, url_prefix='/api/metrics')
+    app.register_blueprint(suggest.bp, url_prefix='/api/suggest')
+    
+    # 解析结果缓存容量 + 字典关键词引擎 + LLM熔断 + 物料缓存
+    from app.services.mdm_parser import configure_parse_cache
+    from app.services.keyword_engine import dictionary_keywords
+    from app.services.dictionary_store import get_dictionary_store
+    from app.services.llm_providers import configure_breakers
+    from app.services.ebs_service import configure_item_cache, configure_item_fanout
+    configure_parse_cache(app.config['PARSE_CACHE_SIZE'])
+    # 字段词典变更（页面编辑或文件被修改）时后台重建解析器关键词自动机
+    dictionary = get_dictionary_store(app.config['DICTIONARY_FILE'])
+    dictionary_keywords.load(dictionary.all())
+    dictionary.subscribe(dictionary_keywords.rebuild_async)
+    configure_breakers(app.config['LLM_BREAKER_FAILURES'], app.config['LLM_BREAKER_RESET'])
+    configure_item_cache(app.config['ITEM_CACHE_SIZE'], app.config['ITEM_CACHE_EBS_TTL'],
+                         app.config['ITEM_CACHE_PLM_TTL'])
+    configure_item_fanout(app.config['ITEM_FANOUT_WORKERS'], app.config['ITEM_EBS_TIMEOUT'],
+                          app.config['ITEM_PLM_TIMEOUT'])
+    
+    # 物料主数据后端：启动时创建并预热Oracle连接池，或打开本地SQLite替身
+    from app.utils.item_master import init_item_master
+    init_item_master(app)
+    
+    # 审批回写后台线程
+    from app.services.writeback_queue import start_writeback_workers
+    start_writeback_workers(app)
     
     # 注册主页路由
     from flask import render_template
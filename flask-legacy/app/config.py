@@ -19,15 +19,93 @@ class Config:
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
     AI_MODEL = os.getenv('AI_MODEL', 'gpt-4')  # 可选: gpt-4, claude-3-opus
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')  # 为空使用官方地址；可指向兼容网关或本地测试服务
+    ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL', '')
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))  # 单次调用读取超时（秒）
+    LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))  # 建立连接超时（秒）
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))  # 连续失败多少次后熔断
+    LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', '30'))  # 熔断后多少秒放行探测请求
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+    LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '8'))  # 批量解析最大并发
+    LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', '5'))  # 每秒最多调用次数，0 不限流
+    LLM_RATE_BURST = int(os.getenv('LLM_RATE_BURST', '10'))
+    # 规则优先：规则置信度不低于此值的行不调用AI（>1 则总是调用AI）
+    LLM_CONFIDENCE_THRESHOLD = float(os.getenv('LLM_CONFIDENCE_THRESHOLD', '0.6'))
+    # 大文档流式解析：每块估算token上限、AI输出token上限、合并去重窗口（条）
+    LLM_CHUNK_TOKENS = int(os.getenv('LLM_CHUNK_TOKENS', '2000'))
+    LLM_MAX_OUTPUT_TOKENS = int(os.getenv('LLM_MAX_OUTPUT_TOKENS', '4096'))
+    STREAM_DEDUPE_WINDOW = int(os.getenv('STREAM_DEDUPE_WINDOW', '100000'))
     
     # Ingest API key (for cron scraper)
     INGEST_API_KEY = os.getenv('INGEST_API_KEY', 'openassist-ingest-2026')
     
+    # mdm_parser result cache (LRU entries, 0 = disabled)
+    PARSE_CACHE_SIZE = int(os.getenv('PARSE_CACHE_SIZE', '4096'))
+    
+    # 物料主数据缓存（条目数，0 禁用；TTL 单位秒）
+    ITEM_CACHE_SIZE = int(os.getenv('ITEM_CACHE_SIZE', '2048'))
+    ITEM_CACHE_EBS_TTL = int(os.getenv('ITEM_CACHE_EBS_TTL', '300'))
+    ITEM_CACHE_PLM_TTL = int(os.getenv('ITEM_CACHE_PLM_TTL', '600'))
+    # 物料查询 EBS/PLM 并发：共享线程数、各后端超时（秒）
+    ITEM_FANOUT_WORKERS = int(os.getenv('ITEM_FANOUT_WORKERS', '16'))
+    ITEM_EBS_TIMEOUT = float(os.getenv('ITEM_EBS_TIMEOUT', '5'))
+    ITEM_PLM_TIMEOUT = float(os.getenv('ITEM_PLM_TIMEOUT', '3'))
+    
+    # 批量审批：一次最多处理的请求数、并发回写线程数
+    APPROVAL_BULK_MAX = int(os.getenv('APPROVAL_BULK_MAX', '200'))
+    APPROVAL_BULK_WORKERS = int(os.getenv('APPROVAL_BULK_WORKERS', '8'))
+    
     # Data file paths
     DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'data')
     DICTIONARY_FILE = os.path.join(DATA_DIR, 'field_dictionary.json')
     REQUESTS_FILE = os.path.join(DATA_DIR, 'change_requests.json')
     SAMPLE_DIR = os.path.join(DATA_DIR, 'sample_requests')
+    
+    # LLM解析结果缓存（SQLite，LLM_CACHE_FILE 置空则禁用）
+    LLM_CACHE_FILE = os.getenv('LLM_CACHE_FILE', os.path.join(DATA_DIR, 'llm_cache.sqlite3'))
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))  # 秒
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '10000'))
+    
+    # 审批回写队列（SQLite，WRITEBACK_QUEUE_FILE 置空则审批时同步回写）
+    WRITEBACK_QUEUE_FILE = os.getenv('WRITEBACK_QUEUE_FILE', os.path.join(DATA_DIR, 'writeback_queue.sqlite3'))
+    WRITEBACK_WORKERS = int(os.getenv('WRITEBACK_WORKERS', '2'))
+    WRITEBACK_START_WORKERS = os.getenv('WRITEBACK_START_WORKERS', 'true').lower() in ('1', 'true', 'yes')
+    WRITEBACK_MAX_ATTEMPTS = int(os.getenv('WRITEBACK_MAX_ATTEMPTS', '5'))
+    WRITEBACK_RETRY_BASE = float(os.getenv('WRITEBACK_RETRY_BASE', '5'))  # 秒，每次失败翻倍
+    WRITEBACK_RETRY_MAX = float(os.getenv('WRITEBACK_RETRY_MAX', '300'))
+    WRITEBACK_LEASE = float(os.getenv('WRITEBACK_LEASE', '600'))  # 秒，须大于单次回写的最长耗时
+    
+    # 审计事件日志（只追加分段文件 + 偏移索引，EVENT_LOG_DIR 置空则禁用）
+    EVENT_LOG_DIR = os.getenv('EVENT_LOG_DIR', os.path.join(DATA_DIR, 'events'))
+    EVENT_LOG_SEGMENT_BYTES = int(os.getenv('EVENT_LOG_SEGMENT_BYTES', str(64 * 1024 * 1024)))
+    EVENT_LOG_FSYNC = os.getenv('EVENT_LOG_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+    
+    # 输入联想：默认/最多返回条数
+    SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', '10'))
+    SUGGEST_MAX_LIMIT = int(os.getenv('SUGGEST_MAX_LIMIT', '50'))
+    
+    # Oracle 连接池：启动时创建并预热（失败后台重试）、容量、获取连接等待上限、语句缓存
+    DB_POOL_EAGER = os.getenv('DB_POOL_EAGER', 'true').lower() in ('1', 'true', 'yes')
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+    DB_POOL_INCREMENT = int(os.getenv('DB_POOL_INCREMENT', '1'))
+    DB_POOL_WAIT_TIMEOUT_MS = int(os.getenv('DB_POOL_WAIT_TIMEOUT_MS', '5000'))
+    DB_POOL_RETRY_INTERVAL = float(os.getenv('DB_POOL_RETRY_INTERVAL', '5'))  # 秒，失败后翻倍
+    DB_POOL_RETRY_MAX_INTERVAL = float(os.getenv('DB_POOL_RETRY_MAX_INTERVAL', '300'))
+    DB_STMT_CACHE_SIZE = int(os.getenv('DB_STMT_CACHE_SIZE', '50'))
+    # 数据库熔断：连续连接失败多少次后快速失败、多少秒后放行探测查询
+    DB_BREAKER_FAILURES = int(os.getenv('DB_BREAKER_FAILURES', '3'))
+    DB_BREAKER_RESET = float(os.getenv('DB_BREAKER_RESET', '30'))
+    # Oracle 取数调优：每次网络往返取的行数、execute 时预取行数
+    DB_FETCH_ARRAYSIZE = int(os.getenv('DB_FETCH_ARRAYSIZE', '500'))
+    DB_PREFETCH_ROWS = int(os.getenv('DB_PREFETCH_ROWS', '501'))
+    
+    # 物料主数据后端: oracle（EBS）或 sqlite（本地替身，离线开发/压测用；连接数、取数参数沿用上面的 DB_* 配置）
+    ITEM_MASTER_BACKEND = os.getenv('ITEM_MASTER_BACKEND', 'oracle')
+    ITEM_MASTER_SQLITE_FILE = os.getenv('ITEM_MASTER_SQLITE_FILE', os.path.join(DATA_DIR, 'item_master.sqlite3'))
+    ITEM_MASTER_SEED_ITEMS = int(os.getenv('ITEM_MASTER_SEED_ITEMS', '20000'))  # 表为空时填充的物料数
+    ITEM_MASTER_LATENCY_MS = float(os.getenv('ITEM_MASTER_LATENCY_MS', '0'))  # 每次往返注入的延迟
+    ITEM_MASTER_JITTER_MS = float(os.getenv('ITEM_MASTER_JITTER_MS', '0'))  # 额外随机延迟上限
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -47,10 +125,19 @@ class ProductionConfig(Config):
     DB_USER = 'Xxapps_ro'
     DB_PASSWORD = 'Xxapps_ro'
 
+class TestingConfig(Config):
+    """测试配置：不启动回写线程，不预建数据库连接池，不在源码目录写回写队列和事件日志"""
+    TESTING = True
+    DB_POOL_EAGER = False
+    WRITEBACK_START_WORKERS = False
+    WRITEBACK_QUEUE_FILE = ''
+    EVENT_LOG_DIR = ''
+
 def get_config(env='development'):
     """获取配置对象"""
     configs = {
         'development': DevelopmentConfig,
-        'production': ProductionConfig
+        'production': ProductionConfig,
+        'testing': TestingConfig
     }
     return configs.get(env, DevelopmentConfig)
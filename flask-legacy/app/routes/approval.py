@@ -6,31 +6,80 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.utils.auth import login_required, get_current_user
 from app.utils.logger import logger
-from app.services.plm_service import update_plm_item
-from app.services.ebs_service import update_ebs_item
-import json
-import os
+from app.services.writeback_queue import (apply_writeback, change_from_request, get_writeback_queue,
+                                          writeback_event, writeback_status)
+from app.utils.json_store import load_json, lock_for, save_json
+from app.utils.event_log import get_event_log, record_event, APPROVED, REJECTED, WRITEBACK_REQUEUED
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import wraps
 
 bp = Blueprint('approval', __name__)
 
 def load_requests():
     """加载变更请求数据"""
-    req_file = current_app.config['REQUESTS_FILE']
-    if os.path.exists(req_file):
-        with open(req_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+    return load_json(current_app.config['REQUESTS_FILE'])
 
 def save_requests(data):
-    """保存变更请求数据"""
-    req_file = current_app.config['REQUESTS_FILE']
-    os.makedirs(os.path.dirname(req_file), exist_ok=True)
-    with open(req_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """保存变更请求数据（原子写入，与回写线程并发时不会读到半截文件）"""
+    save_json(current_app.config['REQUESTS_FILE'], data)
+
+def store_locked(f):
+    """读-改-写请求数据期间持有存储锁（与各进程的回写线程、其他审批和编辑请求互斥）"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        with lock_for(current_app.config['REQUESTS_FILE']):
+            return f(*args, **kwargs)
+    return wrapper
+
+def _writeback_inline(req):
+    """未启用回写队列时在请求内同步回写"""
+    return apply_writeback(change_from_request(req))
+
+def _mark_approved(req, user, comment, writeback=None):
+    """
+    更新请求状态为已审批
+    
+    writeback 为 None 表示已加入回写队列（状态 Approved，由回写线程改为 Applied/Failed）；
+    否则为同步回写结果，直接置为 Applied/Failed（有字段需在EBS中手工维护时保持 Approved）
+    """
+    req['approved_by'] = user['username']
+    req['approved_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    req['comment'] = comment
+    req.pop('update_errors', None)
+    req.pop('update_skipped', None)
+    if writeback is None:
+        req['status'] = 'Approved'
+        req['update_result'] = '已加入回写队列'
+        return
+    req['status'] = writeback_status(writeback)
+    req['update_result'] = writeback['update_message']
+    if writeback['update_errors']:
+        req['update_errors'] = writeback['update_errors']
+    if writeback.get('update_skipped'):
+        req['update_skipped'] = writeback['update_skipped']
+
+def _record_decision(req, user, comment, writeback=None, job_id=None):
+    """审批/拒绝已保存后记录审计事件（同步回写时一并记录回写结果）"""
+    config = current_app.config
+    if req['status'] == 'Rejected':
+        record_event(config, req['request_id'], REJECTED, user['username'], comment=comment)
+        return
+    record_event(config, req['request_id'], APPROVED, user['username'], comment=comment, job_id=job_id)
+    if writeback is not None:
+        record_event(config, req['request_id'], writeback_event(writeback), user['username'],
+                     message=writeback['update_message'], errors=writeback['update_errors'])
+
+def _mark_rejected(req, user, comment):
+    """更新请求状态为已拒绝"""
+    req['status'] = 'Rejected'
+    req['approved_by'] = user['username']
+    req['approved_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    req['comment'] = comment
 
 @bp.route('/approve/<request_id>', methods=['POST'])
 @login_required
+@store_locked
 def approve_request(request_id):
     """审批通过"""
     try:
@@ -48,41 +97,35 @@ def approve_request(request_id):
                         'message': f'请求状态为 {req.get("status")}，无法审批'
                     }), 400
                 
-                # 根据系统调用相应的更新接口
-                system = req.get('system', '').upper()
-                item = req.get('item')
-                field = req.get('field')
-                new_value = req.get('new_value')
-                
-                update_success = False
-                update_message = ''
-                
-                if 'PLM' in system:
-                    result = update_plm_item(item, field, new_value)
-                    update_success = result['success']
-                    update_message = result['message']
-                
-                if 'EBS' in system:
-                    result = update_ebs_item(item, field, new_value)
-                    update_success = result['success']
-                    update_message = result['message']
+                queue = get_writeback_queue(current_app.config)
+                if queue is not None:
+                    # 记录审批并入队，回写由后台线程完成
+                    _mark_approved(req, user, comment)
+                    save_requests(requests_list)
+                    job_id = queue.enqueue(request_id, change_from_request(req))
+                    _record_decision(req, user, comment, job_id=job_id)
+                    logger.info(f'请求审批通过: {request_id} by {user["username"]}，回写任务 {job_id}')
+                    return jsonify({
+                        'success': True,
+                        'message': '审批通过，已加入回写队列',
+                        'queued': True,
+                        'job_id': job_id,
+                        'data': req
+                    })
                 
-                # 更新请求状态
-                req['status'] = 'Approved'
-                req['approved_by'] = user['username']
-                req['approved_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                req['comment'] = comment
-                req['update_result'] = update_message
+                writeback = _writeback_inline(req)
+                _mark_approved(req, user, comment, writeback)
                 
                 save_requests(requests_list)
+                _record_decision(req, user, comment, writeback)
                 
                 logger.info(f'请求审批通过: {request_id} by {user["username"]}')
                 
                 return jsonify({
                     'success': True,
                     'message': '审批通过',
-                    'update_success': update_success,
-                    'update_message': update_message,
+                    'queued': False,
+                    **writeback,
                     'data': req
                 })
         
@@ -97,6 +140,7 @@ def approve_request(request_id):
 
 @bp.route('/reject/<request_id>', methods=['POST'])
 @login_required
+@store_locked
 def reject_request(request_id):
     """拒绝请求"""
     try:
@@ -120,13 +164,10 @@ def reject_request(request_id):
                         'message': f'请求状态为 {req.get("status")}，无法操作'
                     }), 400
                 
-                # 更新请求状态
-                req['status'] = 'Rejected'
-                req['approved_by'] = user['username']
-                req['approved_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                req['comment'] = comment
+                _mark_rejected(req, user, comment)
                 
                 save_requests(requests_list)
+                _record_decision(req, user, comment)
                 
                 logger.info(f'请求已拒绝: {request_id} by {user["username"]}')
                 
@@ -145,6 +186,195 @@ def reject_request(request_id):
             'message': f'操作失败: {str(e)}'
         }), 500
 
+@bp.route('/bulk', methods=['POST'])
+@login_required
+@store_locked
+def bulk_action():
+    """
+    批量审批/拒绝
+    
+    请求体: {"request_ids": [...], "action": "approve" | "reject", "comment": str}
+    
+    数据文件只读写一次；先逐个校验，再回写（启用回写队列时统一入队，否则并发同步回写），
+    最后统一保存，返回每个请求的结果。
+    """
+    try:
+        user = get_current_user()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'message': '请求体必须是JSON对象'}), 400
+        action = data.get('action')
+        comment = data.get('comment', '')
+        request_ids = data.get('request_ids')
+        
+        if action not in ('approve', 'reject'):
+            return jsonify({'success': False, 'message': 'action 必须为 approve 或 reject'}), 400
+        if action == 'reject' and not comment:
+            return jsonify({'success': False, 'message': '拒绝理由不能为空'}), 400
+        if (not isinstance(request_ids, list) or not request_ids
+                or not all(isinstance(request_id, str) and request_id for request_id in request_ids)):
+            return jsonify({'success': False, 'message': 'request_ids 必须是非空的请求ID字符串列表'}), 400
+        max_ids = current_app.config['APPROVAL_BULK_MAX']
+        if len(request_ids) > max_ids:
+            return jsonify({'success': False, 'message': f'一次最多处理 {max_ids} 个请求'}), 400
+        request_ids = list(dict.fromkeys(request_ids))
+        
+        requests_list = load_requests()
+        by_id = {}
+        for req in requests_list:
+            by_id.setdefault(req.get('request_id'), req)
+        
+        # 校验：不存在或非待审批的请求不处理
+        results, valid = {}, []
+        for request_id in request_ids:
+            req = by_id.get(request_id)
+            if req is None:
+                results[request_id] = {'success': False, 'message': '请求不存在'}
+            elif req.get('status') != 'Pending':
+                results[request_id] = {'success': False, 'message': f'请求状态为 {req.get("status")}，无法操作'}
+            else:
+                valid.append(req)
+        
+        queue = get_writeback_queue(current_app.config) if action == 'approve' else None
+        if queue is not None:
+            for req in valid:
+                _mark_approved(req, user, comment)
+                results[req['request_id']] = {'success': True, 'message': '审批通过，已加入回写队列',
+                                              'status': 'Approved', 'queued': True}
+        elif action == 'approve' and valid:
+            app = current_app._get_current_object()
+            
+            def run(req):
+                with app.app_context():
+                    return _writeback_inline(req)
+            
+            workers = min(current_app.config['APPROVAL_BULK_WORKERS'], len(valid))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-approval') as pool:
+                futures = [(req, pool.submit(run, req)) for req in valid]
+                for req, future in futures:
+                    try:
+                        writeback = future.result()
+                    except Exception as e:
+                        logger.error(f'回写失败: {req.get("request_id")}: {str(e)}')
+                        results[req['request_id']] = {'success': False, 'message': f'回写失败: {str(e)}'}
+                        continue
+                    _mark_approved(req, user, comment, writeback)
+                    results[req['request_id']] = {'success': True, 'message': '审批通过', 'status': req['status'],
+                                                  'queued': False, **writeback}
+        else:
+            for req in valid:
+                _mark_rejected(req, user, comment)
+                results[req['request_id']] = {'success': True, 'message': '请求已拒绝', 'status': 'Rejected'}
+        
+        done = sum(1 for r in results.values() if r['success'])
+        if done:
+            save_requests(requests_list)
+        for req in valid:
+            outcome = results[req['request_id']]
+            if not outcome['success']:
+                continue
+            if queue is not None:
+                # 保存后再入队，回写线程读到的一定是已审批的请求
+                outcome['job_id'] = queue.enqueue(req['request_id'], change_from_request(req))
+            writeback = None if queue is not None or action == 'reject' else outcome
+            _record_decision(req, user, comment, writeback, outcome.get('job_id'))
+        
+        logger.info(f'批量{"审批" if action == "approve" else "拒绝"}: {done}/{len(request_ids)} by {user["username"]}')
+        
+        return jsonify({
+            'success': True,
+            'message': f'已处理 {done} 个，失败 {len(request_ids) - done} 个',
+            'processed': done,
+            'failed': len(request_ids) - done,
+            'results': [{'request_id': request_id, **results[request_id]} for request_id in request_ids]
+        })
+    
+    except Exception as e:
+        logger.error(f'批量操作失败: {str(e)}')
+        return jsonify({
+            'success': False,
+            'message': f'批量操作失败: {str(e)}'
+        }), 500
+
+def _queue_or_error():
+    queue = get_writeback_queue(current_app.config)
+    if queue is None:
+        return None, (jsonify({'success': False, 'message': '回写队列未启用（WRITEBACK_QUEUE_FILE 为空）'}), 400)
+    return queue, None
+
+@bp.route('/writeback/dead', methods=['GET'])
+@login_required
+def get_dead_letters():
+    """回写死信列表（重试耗尽或不可重试的失败）"""
+    try:
+        queue, error = _queue_or_error()
+        if error:
+            return error
+        limit = request.args.get('limit', 100, type=int)
+        return jsonify({'success': True, 'data': queue.dead_letters(limit)})
+    
+    except Exception as e:
+        logger.error(f'获取死信列表失败: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@bp.route('/writeback/<request_id>', methods=['GET'])
+@login_required
+def get_writeback_status(request_id):
+    """请求的回写状态：请求状态 + 回写任务（状态、重试次数、最近错误、下次重试时间）"""
+    try:
+        queue, error = _queue_or_error()
+        if error:
+            return error
+        req = next((r for r in load_requests() if r.get('request_id') == request_id), None)
+        if req is None:
+            return jsonify({'success': False, 'message': '请求不存在'}), 404
+        return jsonify({
+            'success': True,
+            'data': {
+                'request_id': request_id,
+                'status': req.get('status'),
+                'update_result': req.get('update_result', ''),
+                'update_errors': req.get('update_errors', []),
+                'jobs': queue.jobs_for(request_id)
+            }
+        })
+    
+    except Exception as e:
+        logger.error(f'获取回写状态失败: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@bp.route('/writeback/<int:job_id>/retry', methods=['POST'])
+@login_required
+@store_locked
+def retry_writeback(job_id):
+    """死信任务重新入队，请求状态改回 Approved"""
+    try:
+        queue, error = _queue_or_error()
+        if error:
+            return error
+        job = queue.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'message': '回写任务不存在'}), 404
+        if not queue.requeue(job_id):
+            return jsonify({'success': False, 'message': f'任务状态为 {job["state"]}，只能重试死信任务'}), 400
+        
+        requests_list = load_requests()
+        for req in requests_list:
+            if req.get('request_id') == job['request_id'] and req.get('status') == 'Failed':
+                req['status'] = 'Approved'
+                req['update_result'] = '已重新加入回写队列'
+                save_requests(requests_list)
+                break
+        record_event(current_app.config, job['request_id'], WRITEBACK_REQUEUED, get_current_user()['username'],
+                     job_id=job_id)
+        
+        logger.info(f'回写任务重新入队: {job_id}（{job["request_id"]}） by {get_current_user()["username"]}')
+        return jsonify({'success': True, 'message': '已重新加入回写队列', 'job_id': job_id})
+    
+    except Exception as e:
+        logger.error(f'重试回写失败: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @bp.route('/history/<request_id>', methods=['GET'])
 @login_required
 def get_approval_history(request_id):
@@ -162,8 +392,13 @@ def get_approval_history(request_id):
                     'approved_by': req.get('approved_by'),
                     'approved_at': req.get('approved_at'),
                     'comment': req.get('comment', ''),
-                    'update_result': req.get('update_result', '')
+                    'update_result': req.get('update_result', ''),
+                    'update_errors': req.get('update_errors', [])
                 }
+                # 完整审计记录（创建、修改、审批、回写...）
+                events = get_event_log(current_app.config)
+                if events is not None:
+                    history['events'] = events.history(request_id)
                 
                 return jsonify({
                     'success': True,
@@ -178,3 +413,38 @@ def get_approval_history(request_id):
             'success': False,
             'message': str(e)
         }), 500
+
+@bp.route('/events', methods=['GET'])
+@login_required
+def query_events():
+    """
+    按时间范围 / 操作人 / 事件类型查询审计事件（最新的在前）
+    
+    参数: start, end（YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS，含 start 不含 end）, actor, type, limit
+    """
+    try:
+        events = get_event_log(current_app.config)
+        if events is None:
+            return jsonify({'success': False, 'message': '审计日志未启用（EVENT_LOG_DIR 为空）'}), 400
+        try:
+            start, end = (_parse_time(request.args.get(name)) for name in ('start', 'end'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        limit = min(request.args.get('limit', 200, type=int), 5000)
+        data = events.query(start, end, request.args.get('actor'), request.args.get('type'), limit)
+        return jsonify({'success': True, 'count': len(data), 'data': data})
+    
+    except Exception as e:
+        logger.error(f'查询审计事件失败: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def _parse_time(value):
+    """YYYY-MM-DD[ HH:MM:SS] → 时间戳，空值返回None"""
+    if not value:
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f'时间格式无效: {value}')
@@ -6,33 +6,20 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.utils.auth import login_required
 from app.utils.logger import logger
-import json
-import os
-from datetime import datetime
+from app.services.dictionary_store import get_dictionary_store, DuplicateEntry
 
 bp = Blueprint('dictionary', __name__)
 
-def load_dictionary():
-    """加载字典数据"""
-    dict_file = current_app.config['DICTIONARY_FILE']
-    if os.path.exists(dict_file):
-        with open(dict_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
-
-def save_dictionary(data):
-    """保存字典数据"""
-    dict_file = current_app.config['DICTIONARY_FILE']
-    os.makedirs(os.path.dirname(dict_file), exist_ok=True)
-    with open(dict_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def dictionary_store():
+    """当前应用的字段词典存储（内存缓存，文件变化时自动重新加载）"""
+    return get_dictionary_store(current_app.config['DICTIONARY_FILE'])
 
 @bp.route('/', methods=['GET'])
 @login_required
 def get_dictionary():
     """获取字典列表"""
     try:
-        dictionary = load_dictionary()
+        dictionary = dictionary_store().all()
         return jsonify({
             'success': True,
             'data': dictionary,
@@ -42,29 +29,22 @@ def get_dictionary():
         logger.error(f'获取字典失败: {str(e)}')
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@bp.route('/<int:item_id>', methods=['GET'])
+@login_required
+def get_dictionary_item(item_id):
+    """获取单个字典项"""
+    item = dictionary_store().get(item_id)
+    if item is None:
+        return jsonify({'success': False, 'message': '字典项不存在'}), 404
+    return jsonify({'success': True, 'data': item})
+
 @bp.route('/', methods=['POST'])
 @login_required
 def add_dictionary():
     """添加字典项"""
     try:
-        data = request.get_json()
-        dictionary = load_dictionary()
-        
-        # 生成ID
-        new_id = max([item.get('id', 0) for item in dictionary], default=0) + 1
-        
-        new_item = {
-            'id': new_id,
-            'business_desc': data.get('business_desc', ''),
-            'field_name': data.get('field_name', ''),
-            'system': data.get('system', ''),
-            'description': data.get('description', ''),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        dictionary.append(new_item)
-        save_dictionary(dictionary)
-        
+        data = request.get_json() or {}
+        new_item = dictionary_store().add(data)
         logger.info(f'添加字典项: {new_item["business_desc"]} -> {new_item["field_name"]}')
         
         return jsonify({
@@ -73,6 +53,8 @@ def add_dictionary():
             'data': new_item
         })
     
+    except DuplicateEntry as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
     except Exception as e:
         logger.error(f'添加字典项失败: {str(e)}')
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -82,28 +64,20 @@ def add_dictionary():
 def update_dictionary(item_id):
     """更新字典项"""
     try:
-        data = request.get_json()
-        dictionary = load_dictionary()
+        data = request.get_json() or {}
+        item = dictionary_store().update(item_id, data)
+        if item is None:
+            return jsonify({'success': False, 'message': '字典项不存在'}), 404
         
-        for item in dictionary:
-            if item.get('id') == item_id:
-                item['business_desc'] = data.get('business_desc', item['business_desc'])
-                item['field_name'] = data.get('field_name', item['field_name'])
-                item['system'] = data.get('system', item['system'])
-                item['description'] = data.get('description', item.get('description', ''))
-                item['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                save_dictionary(dictionary)
-                logger.info(f'更新字典项: ID={item_id}')
-                
-                return jsonify({
-                    'success': True,
-                    'message': '更新成功',
-                    'data': item
-                })
-        
-        return jsonify({'success': False, 'message': '字典项不存在'}), 404
+        logger.info(f'更新字典项: ID={item_id}')
+        return jsonify({
+            'success': True,
+            'message': '更新成功',
+            'data': item
+        })
     
+    except DuplicateEntry as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
     except Exception as e:
         logger.error(f'更新字典项失败: {str(e)}')
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -113,13 +87,7 @@ def update_dictionary(item_id):
 def delete_dictionary(item_id):
     """删除字典项"""
     try:
-        dictionary = load_dictionary()
-        
-        original_len = len(dictionary)
-        dictionary = [item for item in dictionary if item.get('id') != item_id]
-        
-        if len(dictionary) < original_len:
-            save_dictionary(dictionary)
+        if dictionary_store().delete(item_id):
             logger.info(f'删除字典项: ID={item_id}')
             return jsonify({
                 'success': True,
@@ -3,17 +3,59 @@
 """
 物料查询路由
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from app.utils.auth import login_required
 from app.utils.logger import logger
-from app.services.ebs_service import query_item_info
+from app.services.ebs_service import query_item_info, query_items_batch
 
 bp = Blueprint('item_query', __name__)
 
+def _bypass_cache():
+    """?refresh=1 或 ?nocache=1 时跳过缓存"""
+    return any(request.args.get(name, '').lower() in ('1', 'true', 'yes') for name in ('refresh', 'nocache'))
+
+# 单次批量查询最多物料数
+MAX_BATCH_ITEMS = 500
+
+@bp.route('/batch', methods=['POST'])
+@login_required
+def get_items_batch():
+    """
+    批量查询物料信息
+    
+    请求: {"items": ["WAL653133N", "IVC12345", ...]}（?refresh=1 跳过缓存）
+    返回: {"success": true, "data": {物料号: {ebs_data, plm_data, ebs_found, cached}}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'message': '物料号列表不能为空'}), 400
+        items = [str(i).strip() for i in items if str(i).strip()]
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({'success': False, 'message': f'单次最多查询 {MAX_BATCH_ITEMS} 个物料'}), 400
+        
+        logger.info(f'批量查询物料信息: {len(items)} 个')
+        
+        result = query_items_batch(items, use_cache=not _bypass_cache())
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'message': f'查询成功，共 {len(result)} 个物料'
+        })
+    
+    except Exception as e:
+        logger.error(f'批量查询物料信息失败: {str(e)}')
+        return jsonify({
+            'success': False,
+            'message': f'查询失败: {str(e)}'
+        }), 500
+
 @bp.route('/<item_number>', methods=['GET'])
 @login_required
 def get_item_info(item_number):
-    """查询物料信息"""
+    """查询物料信息（?refresh=1 跳过缓存，直接查询EBS/PLM）"""
     try:
         if not item_number:
             return jsonify({'success': False, 'message': '物料号不能为空'}), 400
@@ -21,7 +63,7 @@ def get_item_info(item_number):
         logger.info(f'查询物料信息: {item_number}')
         
         # 查询EBS和PLM数据
-        result = query_item_info(item_number)
+        result = query_item_info(item_number, use_cache=not _bypass_cache())
         
         if result['success']:
             return jsonify(result)
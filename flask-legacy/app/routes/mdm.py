@@ -3,30 +3,27 @@
 """
 MDM变更请求管理路由
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from app.utils.auth import login_required, get_current_user
 from app.utils.logger import logger
-from app.services.mdm_parser import parse_request
+from app.services.mdm_ingest import ingest_records
+from app.services.ai_parser import parse_stream
+from app.services.suggest_index import refresh_requests
+from app.utils.json_store import load_json, save_json, lock_for
+from app.utils.event_log import record_event, CREATED, UPDATED, DELETED
 import json
-import os
 from datetime import datetime
 
 bp = Blueprint('mdm', __name__)
 
 def load_requests():
     """加载变更请求数据"""
-    req_file = current_app.config['REQUESTS_FILE']
-    if os.path.exists(req_file):
-        with open(req_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+    return load_json(current_app.config['REQUESTS_FILE'])
 
 def save_requests(data):
-    """保存变更请求数据"""
-    req_file = current_app.config['REQUESTS_FILE']
-    os.makedirs(os.path.dirname(req_file), exist_ok=True)
-    with open(req_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """保存变更请求数据，并同步更新输入联想索引（物料、申请人、处理人）"""
+    save_json(current_app.config['REQUESTS_FILE'], data)
+    refresh_requests(current_app.config, data)
 
 @bp.route('/requests', methods=['GET'])
 @login_required
@@ -123,54 +120,16 @@ def ingest_requests():
         if not incoming:
             return jsonify({'success': False, 'message': 'No requests provided'}), 400
 
-        requests_list = load_requests()
-        existing_titles = {r.get('source_title', '') for r in requests_list}
-
-        added = 0
-        for item in incoming:
-            title = item.get('title', '').strip()
-            if not title or title in existing_titles:
-                continue
-
-            # Parse title + instructions into structured fields
-            instructions = item.get('instructions', '')
-            req_type = item.get('type', item.get('change_type', ''))
-            parsed = parse_request(title, instructions, req_type)
+        # Shares the store lock with approvals and the writeback worker so no load → save overwrites another
+        with lock_for(current_app.config['REQUESTS_FILE']):
+            requests_list = load_requests()
+            added = ingest_records(requests_list, incoming)
+            save_requests(requests_list)
 
-            request_id = f"SP{datetime.now().strftime('%Y%m%d%H%M%S')}{added:03d}"
-            new_req = {
-                'request_id': request_id,
-                'source_title': title,
-                'items': parsed['items'],
-                'item': ', '.join(parsed['items'][:5]) if parsed['items'] else '',
-                'orgs': parsed['orgs'],
-                'org': ', '.join(parsed['orgs']) if parsed['orgs'] else '',
-                'change_type': req_type or parsed['category'],
-                'category': parsed['category'],
-                'field': parsed['field'],
-                'old_value': parsed['old_value'],
-                'new_value': parsed['new_value'],
-                'system': parsed['system'],
-                'priority': _map_urgency(item.get('urgency', 'Medium')),
-                'risk': item.get('risk', 'Low'),
-                'status': 'Pending',
-                'source_status': item.get('status', ''),
-                'requestor': item.get('requestor', ''),
-                'date_requested': item.get('date_requested', ''),
-                'requested_completion': item.get('requested_completion', ''),
-                'instructions': instructions,
-                'assigned_to': item.get('assigned_to', ''),
-                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'created_by': 'cron-scraper',
-                'updated_at': None,
-                'approved_by': None,
-                'approved_at': None,
-            }
-            requests_list.append(new_req)
-            existing_titles.add(title)
-            added += 1
+        for req in requests_list[len(requests_list) - added:]:
+            record_event(current_app.config, req['request_id'], CREATED, req.get('created_by'),
+                         source_title=req.get('source_title'), field=req.get('field'), items=req.get('items'))
 
-        save_requests(requests_list)
         logger.info(f'Ingest: added {added} new requests, skipped {len(incoming) - added} duplicates')
 
         return jsonify({
@@ -185,6 +144,46 @@ def ingest_requests():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@bp.route('/parse', methods=['POST'])
+@login_required
+def parse_upload():
+    """
+    流式解析上传的文档（multipart 字段 file）
+    
+    以 NDJSON 逐行返回变更记录（解析失败的块返回 {"chunk_error": true, "chunk": 序号, "message": ...}），
+    最后一行为汇总 {"done": 全部块成功, "count": N, "failed_chunks": M}
+    """
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'success': False, 'message': '请上传文件'}), 400
+    
+    changes = parse_stream(upload.stream)
+    
+    def generate():
+        count = failed = 0
+        try:
+            for change in changes:
+                if change.get('chunk_error'):
+                    failed += 1
+                else:
+                    count += 1
+                yield json.dumps(change, ensure_ascii=False) + '\n'
+        except Exception as e:
+            logger.error(f'文档流式解析失败: {str(e)}')
+            yield json.dumps({'done': False, 'count': count, 'failed_chunks': failed, 'message': str(e)},
+                             ensure_ascii=False) + '\n'
+            return
+        if failed:
+            logger.warning(f'文档解析部分失败: {upload.filename}，{count} 条变更，{failed} 块解析失败')
+            yield json.dumps({'done': False, 'count': count, 'failed_chunks': failed,
+                              'message': f'{failed} 块解析失败'}, ensure_ascii=False) + '\n'
+            return
+        logger.info(f'文档解析完成: {upload.filename}，{count} 条变更')
+        yield json.dumps({'done': True, 'count': count, 'failed_chunks': 0}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @bp.route('/stats', methods=['GET'])
 @login_required
 def get_stats():
@@ -237,37 +236,36 @@ def get_stats():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
-def _map_urgency(urgency):
-    """Map SharePoint urgency to priority."""
-    mapping = {'high': 'High', 'medium': 'Medium', 'low': 'Low'}
-    return mapping.get(urgency.lower(), 'Medium') if urgency else 'Medium'
-
-
 @bp.route('/request/<request_id>', methods=['PUT'])
 @login_required
 def update_request(request_id):
     """更新变更请求"""
     try:
         data = request.get_json()
-        requests_list = load_requests()
+        with lock_for(current_app.config['REQUESTS_FILE']):
+            requests_list = load_requests()
         
-        for req in requests_list:
-            if req.get('request_id') == request_id:
-                # 更新字段
-                for key in ['item', 'org', 'change_type', 'field', 'old_value', 'new_value', 'system', 'priority', 'risk']:
-                    if key in data:
-                        req[key] = data[key]
+            for req in requests_list:
+                if req.get('request_id') == request_id:
+                    # 更新字段
+                    changes = {}
+                    for key in ['item', 'org', 'change_type', 'field', 'old_value', 'new_value', 'system', 'priority', 'risk']:
+                        if key in data:
+                            if req.get(key) != data[key]:
+                                changes[key] = [req.get(key), data[key]]
+                            req[key] = data[key]
                 
-                req['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    req['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 
-                save_requests(requests_list)
-                logger.info(f'更新请求: {request_id}')
+                    save_requests(requests_list)
+                    record_event(current_app.config, request_id, UPDATED, get_current_user()['username'], changes=changes)
+                    logger.info(f'更新请求: {request_id}')
                 
-                return jsonify({
-                    'success': True,
-                    'message': '更新成功',
-                    'data': req
-                })
+                    return jsonify({
+                        'success': True,
+                        'message': '更新成功',
+                        'data': req
+                    })
         
         return jsonify({'success': False, 'message': '请求不存在'}), 404
     
@@ -280,18 +278,20 @@ def update_request(request_id):
 def delete_request(request_id):
     """删除变更请求"""
     try:
-        requests_list = load_requests()
+        with lock_for(current_app.config['REQUESTS_FILE']):
+            requests_list = load_requests()
         
-        original_len = len(requests_list)
-        requests_list = [r for r in requests_list if r.get('request_id') != request_id]
+            original_len = len(requests_list)
+            requests_list = [r for r in requests_list if r.get('request_id') != request_id]
         
-        if len(requests_list) < original_len:
-            save_requests(requests_list)
-            logger.info(f'删除请求: {request_id}')
-            return jsonify({
-                'success': True,
-                'message': '删除成功'
-            })
+            if len(requests_list) < original_len:
+                save_requests(requests_list)
+                record_event(current_app.config, request_id, DELETED, get_current_user()['username'])
+                logger.info(f'删除请求: {request_id}')
+                return jsonify({
+                    'success': True,
+                    'message': '删除成功'
+                })
         
         return jsonify({'success': False, 'message': '请求不存在'}), 404
     
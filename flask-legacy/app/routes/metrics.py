@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+运行指标路由 - 缓存命中率等
+"""
+from flask import Blueprint, jsonify
+from app.utils.auth import login_required
+from app.utils.logger import logger
+from app.services.mdm_parser import parse_cache_stats
+from app.services.llm_cache import llm_cache_stats
+from app.services.ai_parser import cascade_stats
+from app.services.llm_providers import provider_stats
+from app.services.ebs_service import item_cache_stats
+from app.services.writeback_queue import writeback_stats
+from app.utils.event_log import event_log_stats
+from app.utils.item_master import item_master_stats
+from app.services.suggest_index import suggest_stats
+
+bp = Blueprint('metrics', __name__)
+
+# 指标分组: 名称 → 采集函数
+SECTIONS = {
+    'parser': parse_cache_stats,
+    'llm_cache': llm_cache_stats,
+    'cascade': cascade_stats,
+    'llm': provider_stats,
+    'item_cache': item_cache_stats,
+    'db': item_master_stats,
+    'writeback': writeback_stats,
+    'events': event_log_stats,
+    'suggest': suggest_stats,
+}
+
+@bp.route('/', methods=['GET'])
+@login_required
+def get_metrics():
+    """获取全部指标"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {name: collect() for name, collect in SECTIONS.items()}
+        })
+    except Exception as e:
+        logger.error(f'获取指标失败: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@bp.route('/<section>', methods=['GET'])
+@login_required
+def get_metrics_section(section):
+    """获取单组指标"""
+    collect = SECTIONS.get(section)
+    if collect is None:
+        return jsonify({'success': False, 'message': f'未知指标: {section}'}), 404
+    try:
+        return jsonify({'success': True, 'data': collect()})
+    except Exception as e:
+        logger.error(f'获取指标失败: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+输入联想路由 - 业务描述、字段名、物料编码、申请人、处理人的前缀补全
+"""
+from flask import Blueprint, request, jsonify, current_app
+from app.utils.auth import login_required
+from app.utils.logger import logger
+from app.services.suggest_index import get_suggest_index, KINDS
+
+bp = Blueprint('suggest', __name__)
+
+@bp.route('/', methods=['GET'])
+@login_required
+def suggest():
+    """
+    前缀补全
+
+    参数: kind（business_desc / field_name / item / requestor / assignee）、q（前缀）、limit
+    """
+    kind = request.args.get('kind', '')
+    if kind not in KINDS:
+        return jsonify({'success': False, 'message': f'kind 必须是 {", ".join(KINDS)} 之一'}), 400
+    try:
+        limit = int(request.args.get('limit', current_app.config['SUGGEST_LIMIT']))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit 必须是整数'}), 400
+    limit = max(1, min(limit, current_app.config['SUGGEST_MAX_LIMIT']))
+
+    try:
+        data = get_suggest_index(current_app.config).suggest(kind, request.args.get('q', ''), limit)
+        return jsonify({'success': True, 'data': data})
+    except Exception as e:
+        logger.error(f'输入联想失败: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
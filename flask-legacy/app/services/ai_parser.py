@@ -3,10 +3,88 @@
 """
 AI文档解析服务
 """
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
 from app.utils.logger import logger
+from app.utils.rate_limit import TokenBucket
+from app.services import mdm_parser
+from app.services.llm_cache import get_llm_cache, make_key
+from app.services.llm_providers import get_provider
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.cache import LRUCache
+from collections import Counter, deque
 import json
+import random
 import re
+import threading
+import time
+
+# 提示词版本：修改 PROMPT_TEMPLATE 时递增，使旧的缓存结果失效
+PROMPT_VERSION = 1
+
+PROMPT_TEMPLATE = """请解析以下物料维护请求文档，提取所有变更信息。
+
+文档内容：
+{text}
+
+请以JSON格式返回，每条变更记录包含：
+- item: 物料号
+- org: 组织
+- change_type: 变更类型（如：Update, Create, Deactivate）
+- field: 字段名
+- old_value: 旧值
+- new_value: 新值
+- system: 系统（PLM/EBS）
+- priority: 优先级（High/Medium/Low）
+- risk: 风险等级（High/Medium/Low）
+
+返回格式：
+{{"changes": [...]}}
+"""
+
+# 规则优先级联：低于此置信度的行视为没有规则信号（标题、签名等），不送AI
+_NOISE_FLOOR = 0.1
+# 规则识别到物料和字段即可信、不需要新值的字段
+_NO_VALUE_FIELDS = frozenset({'bom'})
+
+# 流式解析合并时判断重复变更的字段
+_DEDUPE_FIELDS = ('item', 'org', 'field', 'old_value', 'new_value', 'system')
+
+_cascade_counts = Counter()
+_cascade_lock = threading.Lock()
+
+def _build_prompt(text):
+    """生成解析提示词"""
+    return PROMPT_TEMPLATE.format(text=text)
+
+def _llm_settings(config):
+    """
+    从配置读取AI调用参数
+    
+    在请求线程中调用一次，结果传给工作线程（工作线程中没有 current_app）
+    """
+    ai_model = config.get('AI_MODEL', 'gpt-4')
+    openai_key = config.get('OPENAI_API_KEY', '')
+    anthropic_key = config.get('ANTHROPIC_API_KEY', '')
+    
+    if openai_key and 'gpt' in ai_model.lower():
+        provider, api_key, base_url = 'openai', openai_key, config.get('OPENAI_BASE_URL') or None
+    elif anthropic_key and 'claude' in ai_model.lower():
+        provider, api_key, base_url = 'claude', anthropic_key, config.get('ANTHROPIC_BASE_URL') or None
+    else:
+        provider, api_key, base_url = None, '', None
+    
+    return {
+        'provider': provider,
+        'model': ai_model,
+        'api_key': api_key,
+        'base_url': base_url,
+        'timeout': config.get('LLM_TIMEOUT', 30),
+        'connect_timeout': config.get('LLM_CONNECT_TIMEOUT', 5),
+        'retries': config.get('LLM_MAX_RETRIES', 2),
+        'threshold': config.get('LLM_CONFIDENCE_THRESHOLD', 0.6),
+        'max_output_tokens': config.get('LLM_MAX_OUTPUT_TOKENS', 4096),
+    }
 
 def parse_document(text):
     """
@@ -19,20 +97,21 @@ def parse_document(text):
         dict: {
             'success': bool,
             'changes': [变更记录列表],
-            'message': str
+            'message': str,
+            'engine': str,      # openai / claude / rules
+            'cached': bool,     # 是否命中LLM结果缓存
+            'path': str,        # rules / llm / mixed：规则优先级联实际走的路径
+            'rule_lines': int,  # 规则高置信度直接采用的行数
+            'llm_lines': int    # 交给AI的行数
         }
     """
     try:
-        # 尝试使用配置的AI模型
-        ai_model = current_app.config.get('AI_MODEL', 'gpt-4')
-        openai_key = current_app.config.get('OPENAI_API_KEY', '')
-        anthropic_key = current_app.config.get('ANTHROPIC_API_KEY', '')
+        settings = _llm_settings(current_app.config)
         
-        # 如果有API Key，调用真实AI接口
-        if openai_key and 'gpt' in ai_model.lower():
-            return _parse_with_openai(text, openai_key, ai_model)
-        elif anthropic_key and 'claude' in ai_model.lower():
-            return _parse_with_claude(text, anthropic_key, ai_model)
+        # 如果有API Key：规则优先，低置信度部分才调用AI（结果按内容缓存）
+        if settings['provider']:
+            cache = get_llm_cache(current_app.config)
+            return _parse_cascade(text, settings, cache)
         else:
             # 降级：使用规则解析（Demo模式）
             logger.warning('未配置AI API Key，使用规则解析模式')
@@ -46,102 +125,308 @@ def parse_document(text):
             'message': f'解析失败: {str(e)}'
         }
 
-def _parse_with_openai(text, api_key, model):
-    """使用OpenAI API解析"""
-    try:
-        import openai
-        openai.api_key = api_key
-        
-        prompt = f"""请解析以下物料维护请求文档，提取所有变更信息。
-
-文档内容：
-{text}
+def parse_documents(texts, concurrency=None, rate=None, timeout=None, retries=None):
+    """
+    批量解析多个文档：并发调用AI，令牌桶限流，单次调用超时，失败带抖动重试
+    
+    Args:
+        texts: 文档文本列表
+        concurrency: 最大并发调用数（默认 LLM_CONCURRENCY）
+        rate: 每秒最多发起的AI调用数（默认 LLM_RATE_LIMIT，0 不限流）
+        timeout: 单次调用超时秒数（默认 LLM_TIMEOUT）
+        retries: 失败重试次数（默认 LLM_MAX_RETRIES）
+    
+    Returns:
+        list: 与 texts 顺序一致，每项同 parse_document 的返回值
+    """
+    config = current_app.config
+    texts = list(texts)
+    settings = _llm_settings(config)
+    if timeout is not None:
+        settings['timeout'] = timeout
+    if retries is not None:
+        settings['retries'] = retries
+    
+    if not settings['provider']:
+        logger.warning('未配置AI API Key，使用规则解析模式')
+        return [_parse_with_rules(text) for text in texts]
+    
+    cache = get_llm_cache(config)
+    limiter = TokenBucket(config.get('LLM_RATE_LIMIT', 5) if rate is None else rate,
+                          config.get('LLM_RATE_BURST'))
+    concurrency = concurrency or config.get('LLM_CONCURRENCY', 8)
+    
+    def parse_one(text):
+        try:
+            return _parse_cascade(text, settings, cache, limiter)
+        except Exception as e:
+            logger.error(f'AI解析失败: {str(e)}')
+            return {'success': False, 'changes': [], 'message': f'解析失败: {str(e)}'}
+    
+    # 同一批中重复的文档只解析一次
+    unique = list(dict.fromkeys(texts))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique))),
+                            thread_name_prefix='llm-parse') as pool:
+        results = dict(zip(unique, pool.map(parse_one, unique)))
+    logger.info(f'批量AI解析完成: {len(texts)} 个文档（去重后 {len(unique)}），'
+                f'并发 {concurrency}，耗时 {time.perf_counter() - started:.1f}s')
+    return [dict(results[text]) for text in texts]
 
-请以JSON格式返回，每条变更记录包含：
-- item: 物料号
-- org: 组织
-- change_type: 变更类型（如：Update, Create, Deactivate）
-- field: 字段名
-- old_value: 旧值
-- new_value: 新值
-- system: 系统（PLM/EBS）
-- priority: 优先级（High/Medium/Low）
-- risk: 风险等级（High/Medium/Low）
+def parse_stream(fileobj, chunk_tokens=None, concurrency=None):
+    """
+    流式解析大文档：逐行读取文件对象，按token上限切块，并发解析，合并去重后逐条产出变更记录
+    
+    内存占用与文档大小无关：只保留正在解析的若干块和一个有界的去重窗口
+    
+    Args:
+        fileobj: 文本或二进制文件对象（如上传文件的 stream）
+        chunk_tokens: 每块估算token上限（默认 LLM_CHUNK_TOKENS）
+        concurrency: 同时解析的块数（默认 LLM_CONCURRENCY）
+    
+    Returns:
+        generator: 变更记录dict，按文档顺序；某块解析失败时在该块位置产出
+                   {'chunk_error': True, 'chunk': 块序号, 'message': 原因}，由调用方计数上报
+    """
+    config = current_app.config
+    settings = _llm_settings(config)
+    cache = get_llm_cache(config) if settings['provider'] else None
+    limiter = TokenBucket(config.get('LLM_RATE_LIMIT', 5), config.get('LLM_RATE_BURST'))
+    chunk_tokens = chunk_tokens or config.get('LLM_CHUNK_TOKENS', 2000)
+    concurrency = concurrency or config.get('LLM_CONCURRENCY', 8)
+    window = config.get('STREAM_DEDUPE_WINDOW', 100000)
+    
+    def parse_chunk(text):
+        if settings['provider']:
+            return _parse_cascade(text, settings, cache, limiter)['changes']
+        # 未配置AI：只用逐行规则（不生成示例数据）
+        return [c for c in map(_parse_line, text.split('\n')) if c]
+    
+    chunks = _iter_chunks(_iter_lines(fileobj, chunk_tokens * 4), chunk_tokens)
+    return _stream_changes(chunks, parse_chunk, concurrency, window)
 
-返回格式：
-{{"changes": [...]}}
-"""
-        
-        response = openai.ChatCompletion.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "你是一个专业的MDM物料数据解析助手。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        
-        result_text = response.choices[0].message.content
-        result = json.loads(result_text)
-        
-        return {
-            'success': True,
-            'changes': result.get('changes', []),
-            'message': f'AI解析成功，识别 {len(result.get("changes", []))} 条变更'
-        }
+def _stream_changes(chunks, parse_chunk, concurrency, window):
+    """有界并发解析各块，按块顺序产出去重后的变更记录（失败的块产出错误标记）"""
+    seen = LRUCache(window)
+    pending = deque()
+    total = duplicates = failed = 0
+    started = time.perf_counter()
     
-    except Exception as e:
-        logger.error(f'OpenAI解析失败: {str(e)}')
-        # 降级到规则解析
-        return _parse_with_rules(text)
+    def drain(index, future):
+        nonlocal total, duplicates, failed
+        try:
+            changes = future.result()
+        except Exception as e:
+            failed += 1
+            logger.error(f'文档第 {index} 块解析失败: {str(e)}')
+            yield {'chunk_error': True, 'chunk': index, 'message': f'第 {index} 块解析失败: {str(e)}'}
+            return
+        for change in changes:
+            key = tuple(str(change.get(k, '')) for k in _DEDUPE_FIELDS)
+            if seen.get(key):
+                duplicates += 1
+                continue
+            seen.put(key, True)
+            total += 1
+            yield change
+    
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='llm-stream') as pool:
+        n = 0
+        try:
+            for n, chunk in enumerate(chunks, 1):
+                pending.append((n, pool.submit(parse_chunk, chunk)))
+                # 最多 2×并发 个块在内存中
+                while len(pending) >= concurrency * 2:
+                    yield from drain(*pending.popleft())
+            while pending:
+                yield from drain(*pending.popleft())
+        finally:
+            # 调用方提前停止读取时，取消尚未开始的块
+            for _, future in pending:
+                future.cancel()
+    logger.info(f'流式解析完成: {n} 块（失败 {failed} 块），{total} 条变更（去重 {duplicates} 条），'
+                f'耗时 {time.perf_counter() - started:.1f}s')
 
-def _parse_with_claude(text, api_key, model):
-    """使用Claude API解析"""
-    try:
-        import anthropic
-        client = anthropic.Anthropic(api_key=api_key)
-        
-        prompt = f"""请解析以下物料维护请求文档，提取所有变更信息。
+def _iter_lines(fileobj, max_chars):
+    """逐行读取；超长行按 max_chars 截断为多段，避免一次读入整个无换行的文件"""
+    while True:
+        line = fileobj.readline(max_chars)
+        if not line:
+            return
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if line:
+            yield line
 
-文档内容：
-{text}
+def _estimate_tokens(text):
+    """粗略估算token数：英文约4字符1个token，中文约1字1个token（UTF-8 3字节）"""
+    return len(text.encode('utf-8')) // 3 + 1
 
-请以JSON格式返回，每条变更记录包含：
-- item: 物料号
-- org: 组织
-- change_type: 变更类型（如：Update, Create, Deactivate）
-- field: 字段名
-- old_value: 旧值
-- new_value: 新值
-- system: 系统（PLM/EBS）
-- priority: 优先级（High/Medium/Low）
-- risk: 风险等级（High/Medium/Low）
+def _iter_chunks(lines, max_tokens):
+    """把行合并成不超过 max_tokens 的块（按行边界切分）"""
+    chunk, size = [], 0
+    for line in lines:
+        tokens = _estimate_tokens(line)
+        if chunk and size + tokens > max_tokens:
+            yield '\n'.join(chunk)
+            chunk, size = [], 0
+        chunk.append(line)
+        size += tokens
+    if chunk:
+        yield '\n'.join(chunk)
 
-返回格式：
-{{"changes": [...]}}
-"""
-        
-        message = client.messages.create(
-            model=model,
-            max_tokens=1024,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        result_text = message.content[0].text
-        result = json.loads(result_text)
-        
-        return {
+def _rule_confidence(line, change):
+    """
+    单行规则解析及置信度，返回 (变更记录列表, 置信度)
+
+    先用逐行规则；结果不够确定时用 mdm_parser 的标题规则复核，取置信度高的一方
+    """
+    if change:
+        confidence = 0.9 if change['new_value'] or change['field'] in _NO_VALUE_FIELDS else 0.5
+        changes = [change]
+    else:
+        confidence, changes = 0.0, []
+    if confidence >= 0.9:
+        return changes, confidence
+    
+    parsed = mdm_parser.parse_request(line, '')
+    if parsed['confidence'] > confidence and parsed['items']:
+        changes = _changes_from_mdm(parsed)
+    return changes, max(confidence, parsed['confidence'])
+
+def _changes_from_mdm(parsed):
+    """mdm_parser 结果 → 每个物料一条变更记录"""
+    return [{
+        'item': item,
+        'org': parsed['orgs'][0] if parsed['orgs'] else 'US01',
+        'change_type': 'Update',
+        'field': parsed['field'],
+        'old_value': parsed['old_value'],
+        'new_value': parsed['new_value'],
+        'system': parsed['system'],
+        'priority': 'Medium',
+        'risk': 'Low'
+    } for item in parsed['items']]
+
+def _parse_cascade(text, settings, cache, limiter=None):
+    """
+    规则优先级联解析
+
+    逐行打分：置信度 >= 阈值的行直接采用规则结果；没有任何规则信号的行（签名等）忽略。
+    剩余低置信度的行常常是一条请求拆成多行（标题写字段、正文列物料），先把它们合起来
+    按一条请求再用 mdm_parser 打分，仍低于阈值才交给AI。规则什么都没识别到时整篇交给AI。
+    """
+    threshold = settings['threshold']
+    confident, low_lines, low_changes = [], [], []
+    rule_lines = 0
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        changes, confidence = _rule_confidence(line, _parse_line(line))
+        if confidence < _NOISE_FLOOR:
+            continue
+        if confidence >= threshold:
+            rule_lines += 1
+            confident.extend({**c, 'confidence': confidence} for c in changes)
+        else:
+            low_lines.append(line)
+            low_changes.extend({**c, 'confidence': confidence} for c in changes)
+    
+    if low_lines:
+        parsed = mdm_parser.parse_request(low_lines[0], ' '.join(low_lines[1:]))
+        if parsed['confidence'] >= threshold and parsed['items']:
+            rule_lines += len(low_lines)
+            confident.extend({**c, 'confidence': parsed['confidence']} for c in _changes_from_mdm(parsed))
+            low_lines, low_changes = [], []
+    
+    if confident and not low_lines:
+        path = 'rules'
+        result = {
             'success': True,
-            'changes': result.get('changes', []),
-            'message': f'AI解析成功，识别 {len(result.get("changes", []))} 条变更'
+            'changes': confident,
+            'message': f'规则解析完成，识别 {len(confident)} 条变更（置信度均不低于 {threshold}）',
+            'engine': 'rules',
+            'cached': False,
         }
+    else:
+        # 没有高置信度结果时把全文交给AI，保留上下文
+        path = 'mixed' if confident else 'llm'
+        llm_text = '\n'.join(low_lines) if confident else text
+        result = _cached_llm_call(llm_text, settings, cache, lambda: _parse_with_llm(llm_text, settings, limiter))
+        if confident:
+            # AI失败时 result 为规则降级结果，只保留低置信度行自己的规则结果
+            llm_changes = result['changes'] if result.get('engine') != 'rules' else low_changes
+            result = {**result, 'success': True, 'changes': confident + llm_changes,
+                      'message': f'规则识别 {len(confident)} 条，AI识别 {len(llm_changes)} 条变更'}
     
-    except Exception as e:
-        logger.error(f'Claude解析失败: {str(e)}')
-        # 降级到规则解析
-        return _parse_with_rules(text)
+    with _cascade_lock:
+        _cascade_counts[path] += 1
+    llm_lines = len(low_lines) if confident else sum(1 for line in text.split('\n') if line.strip())
+    return {**result, 'path': path, 'rule_lines': rule_lines, 'llm_lines': 0 if path == 'rules' else llm_lines}
+
+def cascade_stats():
+    """级联路径统计（供 /api/metrics 使用），用于调整 LLM_CONFIDENCE_THRESHOLD"""
+    with _cascade_lock:
+        counts = dict(_cascade_counts)
+    total = sum(counts.values())
+    return {
+        'documents': total,
+        'paths': counts,
+        'llm_skip_rate': round(counts.get('rules', 0) / total, 4) if total else 0.0,
+    }
+
+def _cached_llm_call(text, settings, cache, call):
+    """先查LLM结果缓存；未命中则调用AI，只缓存真正由AI返回的结果（不缓存规则降级结果）"""
+    key = make_key(text, settings['model'], PROMPT_VERSION) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+    
+    started = time.perf_counter()
+    result = call()
+    if cache and result.get('success') and result.get('engine') != 'rules':
+        cache.put(key, settings['model'], result, time.perf_counter() - started)
+    return {**result, 'cached': False}
+
+def _parse_with_llm(text, settings, limiter=None):
+    """
+    调用AI解析；网络/服务端错误按指数退避+随机抖动重试，最终失败或熔断时降级到规则解析
+    """
+    retries = settings['retries']
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            return _request_llm(text, settings)
+        except CircuitOpenError as e:
+            # 熔断中：不等待、不重试，直接走规则解析
+            logger.warning(str(e))
+            break
+        except ValueError as e:
+            # 返回内容不是合法JSON，重试无意义
+            logger.error(f'{settings["provider"]}返回结果无法解析: {str(e)}')
+            break
+        except Exception as e:
+            logger.error(f'{settings["provider"]}解析失败（第 {attempt + 1} 次）: {str(e)}')
+            if attempt < retries:
+                time.sleep(min(10.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+    # 降级到规则解析
+    return _parse_with_rules(text)
+
+def _request_llm(text, settings):
+    """调用一次AI接口并解析JSON结果，失败抛出异常"""
+    provider = get_provider(settings)
+    result_text = provider.complete(_build_prompt(text), settings['model'], settings['max_output_tokens'])
+    result = json.loads(result_text)
+    return {
+        'success': True,
+        'changes': result.get('changes', []),
+        'message': f'AI解析成功，识别 {len(result.get("changes", []))} 条变更',
+        'engine': settings['provider']
+    }
 
 def _parse_with_rules(text):
     """
@@ -163,54 +448,9 @@ def _parse_with_rules(text):
         if not line:
             continue
         
-        change = {
-            'item': '',
-            'org': 'US01',
-            'change_type': 'Update',
-            'field': '',
-            'old_value': '',
-            'new_value': '',
-            'system': 'EBS',
-            'priority': 'Medium',
-            'risk': 'Low'
-        }
-        
-        # 提取物料号
-        item_match = re.search(r'[Ii]tem[:\s]+([A-Z0-9\-]+)', line)
-        if item_match:
-            change['item'] = item_match.group(1)
-        
-        # 识别字段和值
-        if 'status' in line.lower():
-            change['field'] = 'item_status'
-            # 查找 "from X to Y" 模式
-            from_to = re.search(r'from\s+(\w+)\s+to\s+(\w+)', line, re.IGNORECASE)
-            if from_to:
-                change['old_value'] = from_to.group(1)
-                change['new_value'] = from_to.group(2)
-        
-        elif 'buyer' in line.lower():
-            change['field'] = 'buyer_code'
-            change['system'] = 'EBS'
-            # 查找 "to XXX" 模式
-            to_match = re.search(r'to\s+([A-Z0-9]+)', line)
-            if to_match:
-                change['new_value'] = to_match.group(1)
-        
-        elif 'pallet' in line.lower():
-            change['field'] = 'pallet_config'
-            change['system'] = 'PLM'
-            from_to = re.search(r'from\s+(\w+)\s+to\s+(\w+)', line, re.IGNORECASE)
-            if from_to:
-                change['old_value'] = from_to.group(1)
-                change['new_value'] = from_to.group(2)
-        
-        elif 'bom' in line.lower():
-            change['field'] = 'bom'
-            change['system'] = 'PLM/EBS'
-        
+        change = _parse_line(line)
         # 只添加有效的变更记录
-        if change['item'] and change['field']:
+        if change:
             changes.append(change)
     
     # 如果没有匹配到，创建一条示例数据
@@ -232,5 +472,59 @@ def _parse_with_rules(text):
     return {
         'success': True,
         'changes': changes,
-        'message': f'规则解析完成（Demo模式），识别 {len(changes)} 条变更'
+        'message': f'规则解析完成（Demo模式），识别 {len(changes)} 条变更',
+        'engine': 'rules'
     }
+
+def _parse_line(line):
+    """解析单行，识别到物料号和字段时返回变更记录，否则返回None"""
+    change = {
+        'item': '',
+        'org': 'US01',
+        'change_type': 'Update',
+        'field': '',
+        'old_value': '',
+        'new_value': '',
+        'system': 'EBS',
+        'priority': 'Medium',
+        'risk': 'Low'
+    }
+    
+    # 提取物料号
+    item_match = re.search(r'[Ii]tem[:\s]+([A-Z0-9\-]+)', line)
+    if item_match:
+        change['item'] = item_match.group(1)
+    
+    # 识别字段和值
+    if 'status' in line.lower():
+        change['field'] = 'item_status'
+        # 查找 "from X to Y" 模式
+        from_to = re.search(r'from\s+(\w+)\s+to\s+(\w+)', line, re.IGNORECASE)
+        if from_to:
+            change['old_value'] = from_to.group(1)
+            change['new_value'] = from_to.group(2)
+    
+    elif 'buyer' in line.lower():
+        change['field'] = 'buyer_code'
+        change['system'] = 'EBS'
+        # 查找 "to XXX" 模式
+        to_match = re.search(r'to\s+([A-Z0-9]+)', line)
+        if to_match:
+            change['new_value'] = to_match.group(1)
+    
+    elif 'pallet' in line.lower():
+        change['field'] = 'pallet_config'
+        change['system'] = 'PLM'
+        from_to = re.search(r'from\s+(\w+)\s+to\s+(\w+)', line, re.IGNORECASE)
+        if from_to:
+            change['old_value'] = from_to.group(1)
+            change['new_value'] = from_to.group(2)
+    
+    elif 'bom' in line.lower():
+        change['field'] = 'bom'
+        change['system'] = 'PLM/EBS'
+    
+    if change['item'] and change['field']:
+        return change
+    return None
+
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+字段词典存储 - 内存缓存（按文件 mtime 校验）、ID索引、业务描述/字段名查找、原子写入、变更通知
+
+读操作不读文件：只 stat 一次，文件未变就直接用内存快照（被手工修改或其他进程写入时自动重新加载）。
+写操作在锁内生成新列表，原子写入后整体替换快照，并通知订阅者（如解析器关键词引擎重建）。
+业务描述（忽略大小写）唯一，新增和修改都在锁内检查。
+快照中的条目只读，修改必须通过 add / update / delete。
+"""
+import os
+import threading
+from datetime import datetime
+from app.utils.json_store import load_json, save_json
+from app.utils.logger import logger
+
+# 可编辑字段
+EDITABLE_FIELDS = ('business_desc', 'field_name', 'system', 'description')
+
+
+class DuplicateEntry(ValueError):
+    """业务描述与已有词条重复"""
+
+    def __init__(self, entry):
+        super().__init__(f'业务描述已存在（ID={entry.get("id")}）')
+        self.entry = entry
+
+
+def _key(text):
+    """查找键：去掉首尾空白、忽略大小写"""
+    return (text or '').strip().lower()
+
+
+def _value(fields, name):
+    """取可编辑字段值，JSON null 按空字符串处理"""
+    value = fields.get(name)
+    return '' if value is None else value
+
+
+class _Snapshot:
+    """某一版本的词典及其索引"""
+
+    def __init__(self, entries, stamp):
+        self.entries = entries
+        self.stamp = stamp
+        self.by_id = {entry.get('id'): entry for entry in entries}
+        self.by_desc = {}
+        self.by_field = {}
+        for entry in entries:
+            self.by_desc.setdefault(_key(entry.get('business_desc')), entry)
+            self.by_field.setdefault(_key(entry.get('field_name')), []).append(entry)
+        self.max_id = max((entry.get('id', 0) for entry in entries), default=0)
+
+
+class DictionaryStore:
+    """field_dictionary.json 的缓存与读写"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._listeners = []
+        self.reloads = 0
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _current(self):
+        """当前快照；文件变化（或首次访问）时重新加载"""
+        snapshot, stamp = self._snapshot, self._stamp()
+        if snapshot is not None and snapshot.stamp == stamp:
+            return snapshot
+        with self._lock:
+            stamp = self._stamp()
+            if self._snapshot is not None and self._snapshot.stamp == stamp:
+                return self._snapshot
+            changed = self._snapshot is not None
+            self._snapshot = _Snapshot(load_json(self.path), stamp)
+            self.reloads += 1
+            if changed:
+                logger.info(f'字段词典文件已变化，重新加载: {len(self._snapshot.entries)} 项')
+                self._notify(self._snapshot.entries)
+            return self._snapshot
+
+    def all(self):
+        """全部词条（只读）"""
+        return list(self._current().entries)
+
+    def get(self, item_id):
+        """按ID取词条，不存在返回None"""
+        return self._current().by_id.get(item_id)
+
+    def find_by_desc(self, business_desc):
+        """按业务描述取词条（忽略大小写）"""
+        return self._current().by_desc.get(_key(business_desc))
+
+    def find_by_field(self, field_name):
+        """字段名对应的全部词条"""
+        return list(self._current().by_field.get(_key(field_name), ()))
+
+    def _check_unique(self, snapshot, entry):
+        """业务描述非空且已被其他词条使用时抛 DuplicateEntry（调用方持有锁）"""
+        existing = snapshot.by_desc.get(_key(entry.get('business_desc')))
+        if _key(entry.get('business_desc')) and existing is not None and existing.get('id') != entry.get('id'):
+            raise DuplicateEntry(existing)
+
+    def add(self, fields):
+        """新增词条，返回新词条；业务描述重复时抛 DuplicateEntry"""
+        with self._lock:
+            snapshot = self._current()
+            entry = {
+                'id': snapshot.max_id + 1,
+                **{name: _value(fields, name) for name in EDITABLE_FIELDS},
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self._check_unique(snapshot, entry)
+            self._write(snapshot.entries + [entry])
+            return entry
+
+    def update(self, item_id, fields):
+        """修改词条（只改传入的可编辑字段），不存在返回None；业务描述与其他词条重复时抛 DuplicateEntry"""
+        with self._lock:
+            snapshot = self._current()
+            old = snapshot.by_id.get(item_id)
+            if old is None:
+                return None
+            entry = dict(old)
+            for name in EDITABLE_FIELDS:
+                if name in fields:
+                    entry[name] = _value(fields, name)
+            self._check_unique(snapshot, entry)
+            entry['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self._write([entry if e is old else e for e in snapshot.entries])
+            return entry
+
+    def delete(self, item_id):
+        """删除词条，返回是否存在"""
+        with self._lock:
+            snapshot = self._current()
+            if item_id not in snapshot.by_id:
+                return False
+            self._write([e for e in snapshot.entries if e.get('id') != item_id])
+            return True
+
+    def _write(self, entries):
+        """原子写入并替换快照（调用方持有锁）"""
+        save_json(self.path, entries)
+        self._snapshot = _Snapshot(entries, self._stamp())
+        self._notify(entries)
+
+    def subscribe(self, callback):
+        """词典变化时调用 callback(entries)（同一回调只注册一次）"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def _notify(self, entries):
+        for callback in list(self._listeners):
+            try:
+                callback(list(entries))
+            except Exception as e:
+                logger.error(f'词典变更通知失败: {str(e)}')
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_dictionary_store(path):
+    """按文件路径取共享实例"""
+    key = os.path.abspath(path)
+    with _instances_lock:
+        store = _instances.get(key)
+        if store is None:
+            store = _instances[key] = DictionaryStore(path)
+        return store
@@ -3,38 +3,117 @@
 """
 EBS接口服务
 """
-from app.utils.db import OraclePool
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app, has_app_context
+from app.config import Config
+from app.utils.cache import TTLCache
+from app.utils.db import DatabaseUnavailable
+from app.utils.item_master import get_item_master
 from app.utils.logger import logger
-from app.services.plm_service import query_plm_item
+from app.services.plm_service import query_plm_item, query_plm_items
+import re
+import time
 
-def query_item_info(item_number):
+# 物料主数据缓存：EBS、PLM 分别设置TTL；审批回写后通过 invalidate_item 失效
+_ebs_cache = TTLCache(Config.ITEM_CACHE_SIZE, Config.ITEM_CACHE_EBS_TTL)
+_plm_cache = TTLCache(Config.ITEM_CACHE_SIZE, Config.ITEM_CACHE_PLM_TTL)
+
+# EBS/PLM 并发查询的共享线程池及各后端超时（秒）
+_executor_workers = Config.ITEM_FANOUT_WORKERS
+_executor = ThreadPoolExecutor(max_workers=_executor_workers, thread_name_prefix='item-fanout')
+_timeouts = {'ebs': Config.ITEM_EBS_TIMEOUT, 'plm': Config.ITEM_PLM_TIMEOUT}
+_STATUS_LABELS = {'timeout': '超时', 'error': '失败', 'unavailable': '不可用'}
+
+def configure_item_cache(maxsize, ebs_ttl, plm_ttl):
+    """按配置调整物料缓存容量和TTL（应用启动时调用）"""
+    for cache, ttl in ((_ebs_cache, ebs_ttl), (_plm_cache, plm_ttl)):
+        cache.resize(maxsize)
+        cache.ttl = ttl
+
+def invalidate_item(*items):
+    """物料数据被修改后失效缓存"""
+    for item in items:
+        if item:
+            _ebs_cache.pop(item)
+            _plm_cache.pop(item)
+
+def item_cache_stats():
+    """物料缓存统计（供 /api/metrics 使用）"""
+    return {'ebs': _ebs_cache.stats(), 'plm': _plm_cache.stats()}
+
+def configure_item_fanout(workers, ebs_timeout, plm_timeout):
+    """按配置设置EBS/PLM并发查询线程数和各后端超时（应用启动时调用）"""
+    global _executor, _executor_workers
+    _timeouts.update(ebs=ebs_timeout, plm=plm_timeout)
+    if workers != _executor_workers:
+        old, _executor = _executor, ThreadPoolExecutor(max_workers=workers, thread_name_prefix='item-fanout')
+        _executor_workers = workers
+        old.shutdown(wait=False)
+
+def query_item_info(item_number, use_cache=True):
     """
-    查询物料信息（EBS + PLM）
+    查询物料信息（EBS + PLM 并发查询）
+    
+    各后端有独立超时：超时或失败时返回缓存中的旧数据（标记为 stale），
+    没有旧数据则返回空（标记为 missing），不拖慢另一个后端的结果。
     
     Args:
         item_number: 物料号
+        use_cache: False 时跳过缓存读取，直接查询后端（结果仍写入缓存）
     
     Returns:
         dict: {
             'success': bool,
             'ebs_data': dict,
             'plm_data': dict,
+            'cached': {'ebs': bool, 'plm': bool},
+            'stale': [str],         # 超时/失败、返回旧数据的后端
+            'missing': [str],       # 超时/失败且无旧数据的后端
+            'degraded': bool,       # 有后端不可用（数据库熔断/超时/失败），结果不完整或非最新
+            'timings_ms': {'ebs': float, 'plm': float},
             'message': str
         }
     """
     try:
-        # 查询EBS数据
-        ebs_data = _query_ebs_item(item_number)
+        caches = {'ebs': _ebs_cache, 'plm': _plm_cache}
+        fetchers = {'ebs': _query_ebs_item, 'plm': _query_plm_data}
+        
+        data, cached, timings = {}, {}, {}
+        for name, cache in caches.items():
+            data[name] = cache.get(item_number) if use_cache else None
+            cached[name] = data[name] is not None
+            if cached[name]:
+                timings[name] = 0.0
         
-        # 查询PLM数据
-        plm_result = query_plm_item(item_number)
-        plm_data = plm_result.get('data', {}) if plm_result['success'] else {}
+        # 未命中缓存的后端并发查询
+        calls = {name: fetchers[name] for name in caches if not cached[name]}
+        stale, missing = [], []
+        for name, (status, value, ms) in _fan_out(calls, item_number).items():
+            timings[name] = ms
+            if status == 'ok':
+                data[name] = value
+                continue
+            status = _STATUS_LABELS[status]
+            old, age = caches[name].get_stale(item_number)
+            if old is not None:
+                logger.warning(f'{name.upper()}查询{status}，返回 {age:.0f} 秒前的缓存数据: {item_number}')
+                data[name] = old
+                stale.append(name)
+            else:
+                logger.warning(f'{name.upper()}查询{status}，无可用数据: {item_number}')
+                data[name] = {}
+                missing.append(name)
         
         return {
             'success': True,
-            'ebs_data': ebs_data,
-            'plm_data': plm_data,
-            'message': '查询成功'
+            'ebs_data': dict(data['ebs']),
+            'plm_data': dict(data['plm']),
+            'cached': cached,
+            'stale': stale,
+            'missing': missing,
+            'timings_ms': timings,
+            'degraded': bool(stale or missing),
+            'message': '查询成功' if not (stale or missing) else f'降级模式，部分数据不可用: {", ".join(stale + missing)}'
         }
     
     except Exception as e:
@@ -46,12 +125,154 @@ def query_item_info(item_number):
             'message': f'查询失败: {str(e)}'
         }
 
+def _fan_out(calls, item_number):
+    """
+    在共享线程池上并发执行各后端查询，每个后端按自己的超时等待
+    
+    Returns:
+        dict: {后端: (status, value, 耗时ms)}，status 为 ok / timeout / error
+    """
+    app = current_app._get_current_object() if has_app_context() else None
+    started = time.perf_counter()
+    futures = {name: _executor.submit(_timed, app, fn, item_number) for name, fn in calls.items()}
+    
+    results = {}
+    for name, future in futures.items():
+        remaining = _timeouts[name] - (time.perf_counter() - started)
+        try:
+            value, ms = future.result(timeout=max(0.0, remaining))
+            results[name] = ('ok', value, ms)
+        except FutureTimeout:
+            # 超时的查询在后台继续执行，完成后写入缓存供下次使用
+            results[name] = ('timeout', None, round(_timeouts[name] * 1000, 1))
+        except DatabaseUnavailable as e:
+            logger.warning(f'{name.upper()}降级: {str(e)}')
+            results[name] = ('unavailable', None, round((time.perf_counter() - started) * 1000, 1))
+        except Exception as e:
+            logger.error(f'{name.upper()}查询失败: {str(e)}')
+            results[name] = ('error', None, round((time.perf_counter() - started) * 1000, 1))
+    return results
+
+def _timed(app, fn, *args):
+    """在工作线程中执行（需要时推入应用上下文），返回 (结果, 耗时ms)"""
+    started = time.perf_counter()
+    if app is not None:
+        with app.app_context():
+            value = fn(*args)
+    else:
+        value = fn(*args)
+    return value, round((time.perf_counter() - started) * 1000, 1)
+
+def _query_plm_data(item_number):
+    """查询PLM数据并写入缓存，失败抛异常"""
+    plm_result = query_plm_item(item_number)
+    if not plm_result['success']:
+        raise RuntimeError(plm_result['message'])
+    _plm_cache.put(item_number, plm_result['data'])
+    return plm_result['data']
+
+def query_items_batch(item_numbers, use_cache=True):
+    """
+    批量查询物料信息：EBS 每 1000 个物料一次 IN 查询，PLM 一次批量查询
+    
+    Args:
+        item_numbers: 物料号列表（重复的只查一次）
+        use_cache: False 时跳过缓存读取
+    
+    Returns:
+        dict: {物料号: {'ebs_data', 'plm_data', 'ebs_found', 'cached': {'ebs', 'plm'}, 'stale', 'degraded'}}
+    """
+    items = list(dict.fromkeys(i for i in item_numbers if i))
+    
+    ebs_rows, plm_rows = {}, {}
+    if use_cache:
+        for item in items:
+            row = _ebs_cache.get(item)
+            if row is not None:
+                ebs_rows[item] = row
+            plm = _plm_cache.get(item)
+            if plm is not None:
+                plm_rows[item] = plm
+    ebs_cached, plm_cached = set(ebs_rows), set(plm_rows)
+    ebs_unavailable = False
+    
+    ebs_missing = [i for i in items if i not in ebs_rows]
+    if ebs_missing:
+        try:
+            fetched = _fetch_ebs_items(ebs_missing)
+        except DatabaseUnavailable as e:
+            logger.warning(f'EBS批量查询降级: {str(e)}')
+            fetched = {}
+            ebs_unavailable = True
+        except Exception as e:
+            logger.warning(f'EBS批量查询异常: {str(e)}')
+            fetched = {}
+        for item, row in fetched.items():
+            _ebs_cache.put(item, row)
+        ebs_rows.update(fetched)
+    
+    plm_missing = [i for i in items if i not in plm_rows]
+    if plm_missing:
+        plm_result = query_plm_items(plm_missing)
+        if plm_result['success']:
+            for item, data in plm_result['data'].items():
+                _plm_cache.put(item, data)
+            plm_rows.update(plm_result['data'])
+    
+    # 数据库不可用：有旧缓存的用旧数据（标记 stale），没有的留空（不返回Mock）
+    stale = set()
+    if ebs_unavailable:
+        for item in items:
+            if item not in ebs_rows:
+                old, _ = _ebs_cache.get_stale(item)
+                if old is not None:
+                    ebs_rows[item] = old
+                    stale.add(item)
+    
+    not_found = [] if ebs_unavailable else [i for i in items if i not in ebs_rows]
+    if not_found:
+        logger.warning(f'EBS中未找到 {len(not_found)} 个物料，返回Mock数据: {", ".join(not_found[:10])}')
+    logger.info(f'批量查询物料 {len(items)} 个: EBS缓存命中 {len(ebs_cached)}，'
+                f'查询 {len(ebs_missing)}（{-(-len(ebs_missing) // IN_LIST_LIMIT)} 次），PLM查询 {len(plm_missing)}')
+    
+    return {
+        item: {
+            'ebs_data': (dict(ebs_rows[item]) if item in ebs_rows
+                         else {} if ebs_unavailable else _get_mock_ebs_data(item)),
+            'plm_data': dict(plm_rows.get(item, {})),
+            'ebs_found': item in ebs_rows,
+            'cached': {'ebs': item in ebs_cached, 'plm': item in plm_cached},
+            'stale': item in stale,
+            'degraded': ebs_unavailable and item not in ebs_cached,
+        }
+        for item in items
+    }
+
 def _query_ebs_item(item_number):
-    """查询EBS物料主数据"""
+    """
+    查询EBS物料主数据（查到的真实数据写入缓存，Mock数据不缓存）
+    
+    数据库不可用（熔断中）时抛出 DatabaseUnavailable，由调用方标记降级，不再返回Mock数据
+    """
     try:
-        # 尝试连接Oracle数据库查询
-        sql = """
-            SELECT 
+        data = _fetch_ebs_item(item_number)
+        if data:
+            _ebs_cache.put(item_number, data)
+            return data
+        else:
+            # 没有找到数据，返回Mock数据
+            logger.warning(f'EBS中未找到物料 {item_number}，返回Mock数据')
+            return _get_mock_ebs_data(item_number)
+    
+    except DatabaseUnavailable:
+        raise
+    
+    except Exception as e:
+        logger.warning(f'EBS查询异常: {str(e)}，返回Mock数据')
+        return _get_mock_ebs_data(item_number)
+
+# 物料主数据查询列
+EBS_ITEM_COLUMNS = """
                 msi.segment1 AS item_number,
                 msi.description,
                 msi.primary_uom_code AS uom,
@@ -64,30 +285,51 @@ def _query_ebs_item(item_number):
                 msi.attribute1,
                 msi.attribute2,
                 msi.creation_date,
-                msi.last_update_date
+                msi.last_update_date"""
+
+def _fetch_ebs_item(item_number):
+    """从物料主数据后端查询单个物料，未找到返回None"""
+    sql = f"""
+            SELECT {EBS_ITEM_COLUMNS}
             FROM mtl_system_items_b msi
             WHERE msi.segment1 = :item_number
             AND msi.organization_id = 101
             AND ROWNUM = 1
         """
-        
-        results = OraclePool.execute_query(sql, {'item_number': item_number})
-        
-        if results:
-            data = results[0]
-            # 转换Oracle数据类型
-            for key, value in data.items():
-                if hasattr(value, 'strftime'):
-                    data[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-            return data
-        else:
-            # 没有找到数据，返回Mock数据
-            logger.warning(f'EBS中未找到物料 {item_number}，返回Mock数据')
-            return _get_mock_ebs_data(item_number)
     
-    except Exception as e:
-        logger.warning(f'EBS查询异常: {str(e)}，返回Mock数据')
-        return _get_mock_ebs_data(item_number)
+    rows = get_item_master().iter_query(sql, {'item_number': item_number})
+    try:
+        row = next(rows, None)
+    finally:
+        rows.close()
+    return _convert_row(row) if row else None
+
+# Oracle IN 列表最多 1000 项（ORA-01795）
+IN_LIST_LIMIT = 1000
+
+def _fetch_ebs_items(item_numbers):
+    """按 IN_LIST_LIMIT 分块批量查询物料，返回 {物料号: 行数据}"""
+    rows = {}
+    for start in range(0, len(item_numbers), IN_LIST_LIMIT):
+        chunk = item_numbers[start:start + IN_LIST_LIMIT]
+        binds = {f'i{n}': item for n, item in enumerate(chunk)}
+        sql = f"""
+            SELECT {EBS_ITEM_COLUMNS}
+            FROM mtl_system_items_b msi
+            WHERE msi.segment1 IN ({', '.join(':' + name for name in binds)})
+            AND msi.organization_id = 101
+        """
+        for row in get_item_master().iter_query(sql, binds, arraysize=len(chunk)):
+            row = _convert_row(row)
+            rows.setdefault(row['ITEM_NUMBER'], row)
+    return rows
+
+def _convert_row(data):
+    """转换Oracle数据类型"""
+    for key, value in data.items():
+        if hasattr(value, 'strftime'):
+            data[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+    return data
 
 def _get_mock_ebs_data(item_number):
     """返回Mock EBS数据（开发/演示用）"""
@@ -107,9 +349,108 @@ def _get_mock_ebs_data(item_number):
         'LAST_UPDATE_DATE': '2024-01-15 12:00:00'
     }
 
+# 可回写EBS的字段 → mtl_system_items_b 列（白名单：列名拼进SQL，只能来自这里）
+EBS_WRITABLE_COLUMNS = {
+    'item_status': 'inventory_item_status_code',
+    'lead_time': 'full_lead_time',
+    'moq': 'minimum_order_quantity',
+    'foq': 'fixed_order_quantity',
+    'rounding_mult': 'fixed_lot_multiplier',
+}
+# 合法字段名（mdm_parser 产生的 bom / formula / buyer_code 等）：不在白名单内时跳过而不是报错；
+# 其他形状的字段名（含空格、引号、分号等）按非法字段拒绝
+_FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,63}$')
+_NUMERIC_COLUMNS = {'full_lead_time', 'minimum_order_quantity', 'fixed_order_quantity', 'fixed_lot_multiplier'}
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+# 每批最多多少行（一次 executemany、一个事务）
+WRITEBACK_BATCH_SIZE = 500
+
+def update_ebs_items(changes):
+    """
+    批量回写EBS物料数据
+    
+    按字段分组，每组每 WRITEBACK_BATCH_SIZE 行一次 executemany（数组DML，一次往返、一个事务）；
+    单行失败（字段名非法、数值无效、物料不存在、数据库报错）不影响同批其他行；
+    本接口不负责的字段（BOM、配方、采购员等，需在EBS中另行维护）记为跳过，视为成功。
+    
+    Args:
+        changes: [(物料号, 字段名, 新值)]
+    
+    Returns:
+        dict: {
+            'success': bool,        # 全部成功
+            'updated': int,
+            'skipped': int,
+            'results': [{'item', 'field', 'success', 'skipped', 'message', 'retryable'}],  # 与 changes 一一对应；
+                                    # retryable: 整批因数据库不可用失败（可重试），单行错误为数据问题
+            'message': str
+        }
+    """
+    results = [None] * len(changes)
+    groups = {}
+    for index, (item, field, value) in enumerate(changes):
+        column = EBS_WRITABLE_COLUMNS.get(field)
+        if column is None:
+            if _FIELD_NAME.match(str(field or '')):
+                results[index] = (True, f'字段 {field} 不在EBS物料主数据回写范围，已跳过', False, True)
+            else:
+                results[index] = (False, f'非法字段名: {field}', False, False)
+            continue
+        if column in _NUMERIC_COLUMNS:
+            match = _NUMBER.search(str(value or '').replace(',', ''))
+            if not match:
+                results[index] = (False, f'数值无效: {value}', False, False)
+                continue
+            value = float(match.group())
+        groups.setdefault(column, []).append((index, {'value': value, 'item': item}))
+    
+    for column, rows in groups.items():
+        sql = f"""
+            UPDATE mtl_system_items_b
+            SET {column} = :value,
+                last_update_date = SYSDATE
+            WHERE segment1 = :item
+            AND organization_id = 101
+        """
+        for start in range(0, len(rows), WRITEBACK_BATCH_SIZE):
+            batch = rows[start:start + WRITEBACK_BATCH_SIZE]
+            outcome = get_item_master().execute_many(sql, [binds for _, binds in batch])
+            for offset, (index, _) in enumerate(batch):
+                error = outcome['errors'].get(offset)
+                if error:
+                    results[index] = (False, f'EBS更新失败: {error}', outcome.get('retryable', False), False)
+                elif not outcome['rowcounts'][offset]:
+                    results[index] = (False, 'EBS中未找到物料', False, False)
+                else:
+                    results[index] = (True, 'EBS更新成功', False, False)
+    
+    results = [
+        {'item': item, 'field': field, 'success': ok, 'skipped': skipped, 'message': message, 'retryable': retryable}
+        for (item, field, _), (ok, message, retryable, skipped) in zip(changes, results)
+    ]
+    skipped = sum(1 for r in results if r['skipped'])
+    updated = sum(1 for r in results if r['success']) - skipped
+    failed = [r for r in results if not r['success']]
+    for r in failed:
+        logger.warning(f'EBS回写失败 {r["item"]}.{r["field"]}: {r["message"]}')
+    logger.info(f'EBS批量回写: {updated}/{len(changes)} 行成功，跳过 {skipped} 行，{len(groups)} 个字段组')
+    
+    message = (f'EBS更新成功: {updated} 行' if not failed
+               else f'EBS部分更新失败: 成功 {updated} 行，失败 {len(failed)} 行')
+    if skipped:
+        message += f'，跳过 {skipped} 行（字段不在EBS物料主数据回写范围，需在EBS中手工维护）'
+    return {
+        'success': not failed,
+        'updated': updated,
+        'skipped': skipped,
+        'results': results,
+        'message': message
+    }
+
 def update_ebs_item(item, field, value):
     """
-    更新EBS物料数据
+    更新EBS物料数据（单个物料，见 update_ebs_items）
     
     Args:
         item: 物料号
@@ -120,26 +461,10 @@ def update_ebs_item(item, field, value):
         dict: {'success': bool, 'message': str}
     """
     try:
-        # TODO: 实现真实的EBS更新接口
-        # 当前为Mock实现
-        
-        logger.info(f'[EBS Mock] 更新物料 {item}, 字段 {field} = {value}')
-        
-        # 真实场景中，应该调用EBS API或执行SQL更新
-        # sql = """
-        #     UPDATE mtl_system_items_b
-        #     SET {field} = :value,
-        #         last_update_date = SYSDATE
-        #     WHERE segment1 = :item
-        #     AND organization_id = 101
-        # """
-        # 
-        # OraclePool.execute_update(sql, {'value': value, 'item': item})
-        
-        # 模拟成功返回
+        result = update_ebs_items([(item, field, value)])['results'][0]
         return {
-            'success': True,
-            'message': f'EBS更新成功（Mock）: {item}.{field} = {value}'
+            'success': result['success'],
+            'message': f'{result["message"]}: {item}.{field} = {value}'
         }
     
     except Exception as e:
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Dictionary keyword engine — maps field_dictionary.json business keywords to fields.
+
+Every `business_desc` in the field dictionary (several keywords may be
+separated by , ; | or newlines) is compiled into one Aho–Corasick automaton.
+A single left-to-right pass over the request text then finds every keyword
+hit, so parse cost stays flat as the dictionary grows to thousands of entries.
+
+The automaton runs over word tokens rather than characters: keywords only
+ever match whole words, and a title is ~25 tokens instead of ~140 chars.
+
+Rebuilds happen on a background thread and are swapped in atomically, so
+parsing never sees a half-built automaton; a burst of dictionary edits
+collapses into one rebuild with the latest entries.
+"""
+import hashlib
+import re
+import threading
+from collections import deque
+from app.utils.json_store import load_json
+from app.utils.logger import logger
+
+TOKEN = re.compile(r'\w+')
+KEYWORD_SEPARATORS = re.compile(r'[,;|\n]')
+
+
+def tokenize(text):
+    """Lower-cased word tokens."""
+    return TOKEN.findall(text.lower())
+
+
+class AhoCorasick:
+    """Aho–Corasick automaton over token sequences."""
+
+    def __init__(self, patterns):
+        """patterns: iterable of (token_tuple, payload)."""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for tokens, payload in patterns:
+            self._insert(tokens, payload)
+        self._link()
+
+    def _insert(self, tokens, payload):
+        state = 0
+        for tok in tokens:
+            nxt = self._goto[state].get(tok)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][tok] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += ((len(tokens), payload),)
+
+    def _link(self):
+        """Breadth-first failure links; each state also inherits its fail state's outputs."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for tok, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(tok, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def find_all(self, tokens):
+        """Yield (start_index, length, payload) for every hit, in one pass."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, tok in enumerate(tokens):
+            while state and tok not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(tok, 0)
+            for length, payload in out[state]:
+                yield i - length + 1, length, payload
+
+
+def _compile(entries):
+    """Dictionary entries → (automaton, version). Payload is (field_name, system, business_desc)."""
+    patterns = {}
+    for entry in entries:
+        field = (entry.get('field_name') or '').strip()
+        if not field:
+            continue
+        system = (entry.get('system') or '').strip() or 'EBS'
+        for keyword in KEYWORD_SEPARATORS.split(entry.get('business_desc') or ''):
+            tokens = tuple(tokenize(keyword))
+            # First entry wins for a duplicated keyword
+            if tokens and tokens not in patterns:
+                patterns[tokens] = (field, system, keyword.strip())
+
+    items = sorted(patterns.items())
+    version = hashlib.sha1(repr(items).encode('utf-8')).hexdigest()[:8] if items else '0'
+    return AhoCorasick(items), version
+
+
+class KeywordEngine:
+    """Holds the current automaton; rebuilds are atomic reference swaps."""
+
+    def __init__(self):
+        self._snapshot = (AhoCorasick(()), '0')
+        self._lock = threading.Lock()
+        self._pending = None
+        self._worker = None
+
+    @property
+    def version(self):
+        """Content hash of the compiled keywords ('0' when empty)."""
+        return self._snapshot[1]
+
+    def load(self, entries):
+        """Compile synchronously (startup, offline tools, worker processes)."""
+        self._snapshot = _compile(entries)
+        logger.info(f'Keyword engine loaded: version {self.version}, {len(self._snapshot[0])} states')
+
+    def load_file(self, path):
+        """Compile from field_dictionary.json."""
+        self.load(load_json(path))
+
+    def rebuild_async(self, entries):
+        """Schedule a background rebuild with the given dictionary entries."""
+        with self._lock:
+            self._pending = list(entries)
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._rebuild_loop, name='keyword-rebuild', daemon=True)
+            self._worker.start()
+
+    def wait(self, timeout=None):
+        """Block until any in-flight rebuild has been swapped in."""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _rebuild_loop(self):
+        while True:
+            with self._lock:
+                entries, self._pending = self._pending, None
+                if entries is None:
+                    self._worker = None
+                    return
+            try:
+                snapshot = _compile(entries)
+            except Exception as e:
+                logger.error(f'Keyword engine rebuild failed: {str(e)}')
+                continue
+            self._snapshot = snapshot
+            logger.info(f'Keyword engine rebuilt: version {snapshot[1]}, {len(snapshot[0])} states')
+
+    def match(self, text):
+        """
+        Best dictionary hit in text, or None.
+
+        Returns (field_name, system, business_desc); the longest keyword wins,
+        ties go to the earliest one in the text.
+        """
+        automaton = self._snapshot[0]
+        if len(automaton) == 1:
+            return None
+        best = None
+        for start, length, payload in automaton.find_all(tokenize(text)):
+            if best is None or length > best[0] or (length == best[0] and start < best[1]):
+                best = (length, start, payload)
+        return best[2] if best else None
+
+
+# Shared instance used by mdm_parser
+dictionary_keywords = KeywordEngine()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM解析结果缓存（SQLite持久化）
+
+键为 sha256(规范化文本 + 模型 + 提示词版本)：同一文档、同一模型、同一提示词只调用一次AI。
+支持TTL过期与按条目数的LRU淘汰，统计命中率和节省的调用耗时。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.utils.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key         TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    result      TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    latency     REAL NOT NULL DEFAULT 0,
+    hits        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access);
+"""
+
+# 每写入多少次检查一次容量，避免每次 put 都 COUNT(*)
+_EVICT_EVERY = 50
+
+
+def normalize_text(text):
+    """去掉空行和行内多余空白，保留行结构（规则解析按行处理）"""
+    return '\n'.join(' '.join(line.split()) for line in (text or '').splitlines() if line.strip())
+
+
+def make_key(text, model, prompt_version):
+    """内容寻址键"""
+    raw = '\x1f'.join((normalize_text(text), model or '', str(prompt_version)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """SQLite缓存，单连接 + 锁，WAL模式"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.latency_saved = 0.0
+        self.lookup_time = 0.0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key):
+        """命中返回解析结果dict，未命中或已过期返回None"""
+        started = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result, created_at, latency FROM llm_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                result = None
+            elif self.ttl and now - row[1] > self.ttl:
+                self._conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                self.misses += 1
+                self.expired += 1
+                result = None
+            else:
+                self._conn.execute(
+                    'UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key)
+                )
+                self.hits += 1
+                self.latency_saved += row[2]
+                result = json.loads(row[0])
+            self.lookup_time += time.perf_counter() - started
+        return result
+
+    def put(self, key, model, result, latency=0.0):
+        """写入结果；latency 为本次AI调用耗时（秒），命中时计入节省时间"""
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, model, result, created_at, last_access, latency, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                (key, model, payload, now, now, latency)
+            )
+            self._puts += 1
+            if self._puts % _EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        """清理过期条目，超出容量时按最近访问时间淘汰（调用方持有锁）"""
+        if self.ttl:
+            cur = self._conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl,))
+            self.expired += cur.rowcount
+        count = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                'DELETE FROM llm_cache WHERE key IN '
+                '(SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)', (overflow,)
+            )
+            self.evicted += cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_cache')
+
+    def stats(self):
+        """命中率、节省耗时、平均查找耗时"""
+        with self._lock:
+            size = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'latency_saved_s': round(self.latency_saved, 3),
+            'avg_lookup_us': round(self.lookup_time / lookups * 1e6, 1) if lookups else 0.0,
+        }
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_llm_cache(config):
+    """按配置取共享缓存实例（LLM_CACHE_FILE 为空则禁用，返回None）"""
+    path = config.get('LLM_CACHE_FILE')
+    if not path:
+        return None
+    with _instances_lock:
+        cache = _instances.get(path)
+        if cache is None:
+            cache = LLMCache(path, config.get('LLM_CACHE_TTL', 7 * 24 * 3600),
+                             config.get('LLM_CACHE_MAX_ENTRIES', 10000))
+            _instances[path] = cache
+            logger.info(f'LLM缓存已启用: {path}')
+        return cache
+
+
+def llm_cache_stats():
+    """所有缓存实例的统计（供 /api/metrics 使用）"""
+    with _instances_lock:
+        return {path: cache.stats() for path, cache in _instances.items()}
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLM服务提供方 - 长连接客户端池、连接/读取超时、熔断器与调用指标
+
+客户端按 (提供方, API Key, 地址, 超时) 复用，HTTP连接池在进程内长期保持；
+每个提供方一个熔断器，连续失败后直接拒绝调用，由 ai_parser 立即降级到规则解析。
+"""
+import threading
+import time
+from collections import deque
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.logger import logger
+
+SYSTEM_PROMPT = "你是一个专业的MDM物料数据解析助手。"
+
+# 延迟统计保留最近多少次调用
+_LATENCY_WINDOW = 1000
+
+
+class ProviderMetrics:
+    """单个提供方的调用次数、错误数和最近调用延迟"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, latency, error=False):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self._latencies.append(latency)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors = self.calls, self.errors
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else 0.0
+
+        return {
+            'calls': calls,
+            'errors': errors,
+            'error_rate': round(errors / calls, 4) if calls else 0.0,
+            'latency_ms': {'p50': pct(0.5), 'p95': pct(0.95), 'max': pct(1.0)},
+        }
+
+
+class LLMProvider:
+    """提供方基类：子类实现 _create_client() 和 _complete(prompt, model, max_tokens)"""
+
+    name = ''
+
+    def __init__(self, api_key, base_url=None, timeout=30.0, connect_timeout=5.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.breaker = _breakers[self.name]
+        self.metrics = _metrics[self.name]
+        self._client = self._create_client()
+
+    def _timeout(self):
+        import httpx
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+    def complete(self, prompt, model, max_tokens=4096):
+        """
+        调用模型，返回回复文本
+
+        Raises:
+            CircuitOpenError: 熔断中，未发起调用
+            Exception: 调用失败（已计入熔断器）
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'{self.name} 熔断中，跳过AI调用')
+        started = time.perf_counter()
+        try:
+            text = self._complete(prompt, model, max_tokens)
+        except Exception:
+            self.metrics.record(time.perf_counter() - started, error=True)
+            self.breaker.record_failure()
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        self.breaker.record_success()
+        return text
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI（openai>=1.0 客户端，兼容网关可通过 base_url 接入）"""
+
+    name = 'openai'
+
+    def _create_client(self):
+        import openai
+        # 重试由 ai_parser 负责（带抖动），客户端自身不重试
+        return openai.OpenAI(api_key=self.api_key, base_url=self.base_url,
+                             timeout=self._timeout(), max_retries=0)
+
+    def _complete(self, prompt, model, max_tokens):
+        response = self._client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3
+        )
+        return response.choices[0].message.content
+
+
+class ClaudeProvider(LLMProvider):
+    """Anthropic Claude"""
+
+    name = 'claude'
+
+    def _create_client(self):
+        import anthropic
+        return anthropic.Anthropic(api_key=self.api_key, base_url=self.base_url,
+                                   timeout=self._timeout(), max_retries=0)
+
+    def _complete(self, prompt, model, max_tokens):
+        message = self._client.messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        return message.content[0].text
+
+
+PROVIDERS = {cls.name: cls for cls in (OpenAIProvider, ClaudeProvider)}
+
+_breakers = {name: CircuitBreaker(f'llm:{name}') for name in PROVIDERS}
+_metrics = {name: ProviderMetrics() for name in PROVIDERS}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def configure_breakers(failure_threshold, reset_timeout):
+    """按配置设置各提供方熔断阈值（应用启动时调用）"""
+    for breaker in _breakers.values():
+        breaker.failure_threshold = failure_threshold
+        breaker.reset_timeout = reset_timeout
+
+
+def get_provider(settings):
+    """按 ai_parser._llm_settings 取共享的提供方实例（首次使用时创建客户端）"""
+    key = (settings['provider'], settings['api_key'], settings['base_url'],
+           settings['timeout'], settings['connect_timeout'])
+    provider = _clients.get(key)
+    if provider is None:
+        with _clients_lock:
+            provider = _clients.get(key)
+            if provider is None:
+                provider = PROVIDERS[settings['provider']](
+                    settings['api_key'], settings['base_url'], settings['timeout'], settings['connect_timeout'])
+                _clients[key] = provider
+                logger.info(f'LLM客户端已创建: {provider.name} ({settings["base_url"] or "默认地址"})')
+    return provider
+
+
+def provider_stats():
+    """各提供方调用指标与熔断状态（供 /api/metrics 使用）"""
+    return {
+        name: {**_metrics[name].stats(), 'breaker': _breakers[name].stats()}
+        for name in PROVIDERS
+    }
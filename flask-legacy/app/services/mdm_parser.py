@@ -18,8 +18,16 @@ Categories (field_mapping):
   UPC / barcode                          → upc_code      → EBS
   rounding multiple                      → rounding_mult → EBS
   fixed order qty / FOQ                  → foq           → EBS
+
+Keywords from field_dictionary.json (see keyword_engine.py) are checked before
+these built-in rules, so terms added through the dictionary UI affect parsing.
 """
+import hashlib
 import re
+from operator import itemgetter
+from app.config import Config
+from app.services.keyword_engine import dictionary_keywords
+from app.utils.cache import LRUCache
 from app.utils.logger import logger
 
 # ── category rules: (regex_pattern, field_name, system) ──
@@ -73,14 +81,106 @@ ITEM_PATTERNS = [
 # ── "from X to Y" pattern ──
 FROM_TO = re.compile(r'(?i)from\s+([A-Z0-9_\-]+)\s+to\s+([A-Z0-9_\-]+)')
 
+# ── value patterns used by _extract_values ──
+TO_VALUE = re.compile(r'(?i)\bto\s+(\d+\.?\d*\s*(?:kg|days|kgs)?)\b')
+MOQ_VALUE = re.compile(r'(?i)MOQ\s+(?:to\s+)?([0-9,]+(?:\s*(?:kg|kgs))?)')
+PALLET_RATIO = re.compile(r'(\d+)[/x×](\d+)')
+PALLET_LAYERS = re.compile(r'(?i)(?:layers?\s*(?:per\s*pallet)?\s*(?:to)?\s*)(\d+)')
+PALLET_CASES = re.compile(r'(?i)cases/layer\s+(?:to\s+)?(\d+)')
+LEAD_DAYS = re.compile(r'(\d+)\s*days', re.IGNORECASE)
+
 # ── org patterns ──
 ORG_PATTERN = re.compile(r'\b(AND|DDR|WOD|PHL|IVCN?)\b')
 
+# ── confidence scoring ──
+# Base confidence by how the field was detected (see _detect_field)
+FIELD_CONFIDENCE = {
+    'type': 0.9,            # explicit request_type hint
+    'dictionary': 0.85,     # field dictionary keyword
+    'rule': 0.8,            # built-in RULES
+    'type_fallback': 0.6,   # only the request_type category matched
+    'none': 0.1,            # nothing matched → 'other'
+}
+# Fields that normally carry a new value; a missing value lowers confidence
+VALUE_FIELDS = frozenset({
+    'item_status', 'buyer_code', 'pallet_config', 'moq', 'lead_time',
+    'vendor', 'upc_code', 'rounding_mult', 'foq',
+})
+
+
+def _scoped(pattern):
+    """Turn a leading global (?i) flag into a scoped group so patterns can be combined."""
+    if pattern.startswith('(?i)'):
+        return f'(?i:{pattern[4:]})'
+    return f'(?:{pattern})'
+
+
+# ── combined scanners (built from RULES / ITEM_PATTERNS, which stay the source of truth) ──
+# First letters of every RULES keyword — extend when a new rule starts with another letter.
+RULE_FIRST_CHARS = 'abcdfilmprstuv'
+
+# Every rule sits in its own lookahead, so the scanner is tried at every
+# candidate word start and the first rule that matches there wins. Taking the
+# lowest rule index over all positions reproduces "first rule in RULES that
+# matches anywhere" in a single pass.
+RULE_SCANNER = re.compile(rf'(?i:\b(?=[{RULE_FIRST_CHARS}]))(?:' + '|'.join(
+    f'(?=(?P<r{i}>{_scoped(pattern)}))' for i, (pattern, _, _) in enumerate(RULES)
+) + ')')
+
+# Item patterns can match at the same position with different text (e.g.
+# PM12345-1 vs PM12345), so each one gets its own optional lookahead and all
+# are tested at every candidate position. Candidates are word starts that begin
+# with two capitals or five digits (the only places any item pattern can match)
+# and where at least one pattern does match, so the loop never sees empty hits.
+ITEM_SCANNER = re.compile(
+    r'\b(?=[A-Z]{2}|\d{5})(?=' + '|'.join(ITEM_PATTERNS) + ')' + ''.join(
+        f'(?:(?=(?P<i{i}>{pattern})))?' for i, pattern in enumerate(ITEM_PATTERNS)
+    )
+)
+_item_groups = itemgetter(*(ITEM_SCANNER.groupindex[f'i{i}'] - 1 for i in range(len(ITEM_PATTERNS))))
+
+
+# ── parser version ──
+# Bump PARSER_REVISION when parsing *code* changes; pattern changes are picked
+# up automatically because the patterns themselves are part of the fingerprint.
+PARSER_REVISION = 1
+PARSER_VERSION = hashlib.sha1(repr((
+    PARSER_REVISION, RULES, ITEM_PATTERNS,
+    [p.pattern for p in (FROM_TO, TO_VALUE, MOQ_VALUE, PALLET_RATIO, PALLET_LAYERS,
+                         PALLET_CASES, LEAD_DAYS, ORG_PATTERN)],
+)).encode('utf-8')).hexdigest()[:12]
+
+# ── result cache: the scraper re-sends the same titles many times ──
+_parse_cache = LRUCache(Config.PARSE_CACHE_SIZE)
+
+
+def configure_parse_cache(maxsize):
+    """Resize the parse cache (0 disables it); called from create_app with PARSE_CACHE_SIZE."""
+    _parse_cache.resize(maxsize)
+
+
+def parser_version():
+    """Built-in rules fingerprint plus the loaded dictionary keyword version."""
+    return f'{PARSER_VERSION}+d{dictionary_keywords.version}'
+
+
+def parse_cache_stats():
+    """Hit/miss counters for the parse cache."""
+    return {**_parse_cache.stats(), 'parser_version': parser_version()}
+
+
+def _cache_key(title, instructions, request_type):
+    raw = '\x1f'.join((parser_version(), title or '', instructions or '', request_type or ''))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).digest()
+
 
 def parse_request(title: str, instructions: str, request_type: str = '') -> dict:
     """
     Parse a single MDM request into structured fields.
 
+    Results are memoized in a bounded LRU keyed on the inputs plus
+    parser_version(), so a rule or dictionary change never serves stale results.
+
     Returns:
         {
             'field': str,           # e.g. 'item_status', 'buyer_code', 'bom'
@@ -90,14 +190,26 @@ def parse_request(title: str, instructions: str, request_type: str = '') -> dict
             'new_value': str,
             'orgs': [str],
             'category': str,        # human label
+            'confidence': float,    # 0–1, see _confidence
         }
     """
+    key = _cache_key(title, instructions, request_type)
+    cached = _parse_cache.get(key)
+    if cached is None:
+        cached = _parse_uncached(title, instructions, request_type)
+        _parse_cache.put(key, cached)
+    # Callers get their own lists so cached entries can't be mutated
+    return {**cached, 'items': list(cached['items']), 'orgs': list(cached['orgs'])}
+
+
+def _parse_uncached(title, instructions, request_type):
+    """parse_request without the cache."""
     combined = f"{title} {instructions}".strip()
     if not combined:
         return _empty()
 
     # 1. Detect field & system
-    field, system, category = _detect_field(combined, request_type)
+    field, system, category, source = _detect_field(combined, request_type)
 
     # 2. Extract item numbers
     items = _extract_items(combined)
@@ -116,23 +228,52 @@ def parse_request(title: str, instructions: str, request_type: str = '') -> dict
         'new_value': new_val,
         'orgs': orgs,
         'category': category,
+        'confidence': _confidence(source, field, items, new_val),
     }
 
 
+def _confidence(source, field, items, new_value):
+    """
+    How much to trust the rule result, 0–1.
+
+    Starts from how the field was detected and is halved when no item was
+    found; value-carrying fields without an extracted new value lose 30%.
+    Used by ai_parser to decide which records still need the LLM.
+    """
+    score = FIELD_CONFIDENCE[source]
+    if not items:
+        score *= 0.5
+    if field in VALUE_FIELDS and not new_value:
+        score *= 0.7
+    return round(score, 2)
+
+
 def _detect_field(text, request_type):
-    """Match the first applicable rule."""
+    """
+    Match the first applicable rule: type hint → dictionary keyword → built-in RULES → type fallback.
+
+    Returns (field, system, category, source); source keys FIELD_CONFIDENCE.
+    """
     # Check request_type hint first
     type_lower = (request_type or '').lower()
     if 'bulk formula' in type_lower:
-        return 'formula', 'PLM/EBS', 'Formula/MBR Upload'
+        return 'formula', 'PLM/EBS', 'Formula/MBR Upload', 'type'
     if 'sourcing' in type_lower:
-        return 'sourcing_rule', 'EBS', 'Sourcing Rule'
+        return 'sourcing_rule', 'EBS', 'Sourcing Rule', 'type'
     if 'safety stock' in type_lower or 'moq' in type_lower.replace(' ', ''):
-        return 'moq', 'EBS', 'MOQ Update'
+        return 'moq', 'EBS', 'MOQ Update', 'type'
 
-    for pattern, field, system in RULES:
-        if re.search(pattern, text):
-            return field, system, _category_label(field)
+    # Field dictionary keywords (maintained through /api/dictionary) beat the generic built-in rules
+    hit = dictionary_keywords.match(text)
+    if hit:
+        field, system, keyword = hit
+        label = _category_label(field)
+        return field, system, label if label != field else keyword.title(), 'dictionary'
+
+    best = _first_rule(text)
+    if best is not None:
+        _, field, system = RULES[best]
+        return field, system, _category_label(field), 'rule'
 
     # Fallback based on request_type
     type_map = {
@@ -144,9 +285,21 @@ def _detect_field(text, request_type):
     }
     for key, val in type_map.items():
         if key in type_lower:
-            return val
+            return (*val, 'type_fallback')
+
+    return 'other', 'EBS', 'Other', 'none'
 
-    return 'other', 'EBS', 'Other'
+
+def _first_rule(text):
+    """Index of the first rule in RULES that matches anywhere in text, or None."""
+    best = None
+    for m in RULE_SCANNER.finditer(text):
+        idx = int(m.lastgroup[1:])
+        if best is None or idx < best:
+            best = idx
+            if best == 0:
+                break
+    return best
 
 
 def _category_label(field):
@@ -168,12 +321,25 @@ def _category_label(field):
 
 
 def _extract_items(text):
-    """Extract unique item numbers from text."""
+    """Extract unique item numbers from text.
+
+    One pass over ITEM_SCANNER; hits are bucketed per pattern so the result
+    keeps the original order (pattern order, then position in text).
+    """
+    buckets = [[] for _ in ITEM_PATTERNS]
+    ends = [0] * len(ITEM_PATTERNS)
+    for m in ITEM_SCANNER.finditer(text):
+        pos = m.start()
+        for idx, item in enumerate(_item_groups(m.groups())):
+            # Skip hits inside a previous match of the same pattern (finditer semantics)
+            if item is not None and pos >= ends[idx]:
+                buckets[idx].append(item)
+                ends[idx] = pos + len(item)
+
     items = []
     seen = set()
-    for pattern in ITEM_PATTERNS:
-        for m in re.finditer(pattern, text):
-            item = m.group(1)
+    for bucket in buckets:
+        for item in bucket:
             # Skip pure numbers that look like dates or small values
             if item.isdigit() and (len(item) < 5 or int(item) < 10000):
                 continue
@@ -190,30 +356,31 @@ def _extract_values(text, field):
         return m.group(1), m.group(2)
 
     # "to X" pattern for new value
-    to_match = re.search(r'(?i)\bto\s+(\d+\.?\d*\s*(?:kg|days|kgs)?)\b', text)
+    to_match = TO_VALUE.search(text)
     if to_match:
         return '', to_match.group(1)
 
     # MOQ specific: "MOQ to 3,500" or "MOQ 4500"
-    moq_match = re.search(r'(?i)MOQ\s+(?:to\s+)?([0-9,]+(?:\s*(?:kg|kgs))?)', text)
-    if moq_match and field in ('moq', 'rounding_mult'):
-        return '', moq_match.group(1)
+    if field in ('moq', 'rounding_mult'):
+        moq_match = MOQ_VALUE.search(text)
+        if moq_match:
+            return '', moq_match.group(1)
 
     # Pallet: "13/7" or "15x7"
     if field == 'pallet_config':
-        pc = re.search(r'(\d+)[/x×](\d+)', text)
+        pc = PALLET_RATIO.search(text)
         if pc:
             return '', f"{pc.group(1)}/{pc.group(2)}"
-        layer = re.search(r'(?i)(?:layers?\s*(?:per\s*pallet)?\s*(?:to)?\s*)(\d+)', text)
+        layer = PALLET_LAYERS.search(text)
         if layer:
             return '', f"layers={layer.group(1)}"
-        cases = re.search(r'(?i)cases/layer\s+(?:to\s+)?(\d+)', text)
+        cases = PALLET_CASES.search(text)
         if cases:
             return '', f"cases/layer={cases.group(1)}"
 
     # Lead time: "10 days" or "70 days"
     if field == 'lead_time':
-        lt = re.search(r'(\d+)\s*days', text, re.IGNORECASE)
+        lt = LEAD_DAYS.search(text)
         if lt:
             return '', f"{lt.group(1)} days"
 
@@ -229,4 +396,5 @@ def _empty():
         'new_value': '',
         'orgs': [],
         'category': 'Other',
+        'confidence': 0.0,
     }
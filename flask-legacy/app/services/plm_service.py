@@ -60,19 +60,9 @@ def query_plm_item(item):
         logger.info(f'[PLM Mock] 查询物料 {item}')
         
         # 模拟返回数据
-        mock_data = {
-            'item_number': item,
-            'description': 'PLM Item Description',
-            'pallet_config': 'Standard',
-            'bom': 'BOM-12345',
-            'engineering_status': 'Released',
-            'lifecycle_phase': 'Production',
-            'last_updated': '2024-01-15'
-        }
-        
         return {
             'success': True,
-            'data': mock_data,
+            'data': _get_mock_plm_data(item),
             'message': 'PLM查询成功（Mock）'
         }
     
@@ -83,3 +73,52 @@ def query_plm_item(item):
             'data': {},
             'message': f'PLM查询失败: {str(e)}'
         }
+
+def query_plm_items(items):
+    """
+    批量查询PLM物料数据（一次请求）
+    
+    Args:
+        items: 物料号列表
+    
+    Returns:
+        dict: {'success': bool, 'data': {物料号: dict}, 'message': str}
+    """
+    try:
+        # TODO: 实现真实的PLM批量查询接口
+        # 当前返回Mock数据
+        
+        logger.info(f'[PLM Mock] 批量查询物料 {len(items)} 个')
+        
+        # 模拟API调用
+        # response = requests.post(
+        #     'https://plm.corp.ivcinc.com/api/items/query',
+        #     json={'items': items},
+        #     timeout=30
+        # )
+        
+        return {
+            'success': True,
+            'data': {item: _get_mock_plm_data(item) for item in items},
+            'message': 'PLM批量查询成功（Mock）'
+        }
+    
+    except Exception as e:
+        logger.error(f'PLM批量查询失败: {str(e)}')
+        return {
+            'success': False,
+            'data': {},
+            'message': f'PLM批量查询失败: {str(e)}'
+        }
+
+def _get_mock_plm_data(item):
+    """返回Mock PLM数据（开发/演示用）"""
+    return {
+        'item_number': item,
+        'description': 'PLM Item Description',
+        'pallet_config': 'Standard',
+        'bom': 'BOM-12345',
+        'engineering_status': 'Released',
+        'lifecycle_phase': 'Production',
+        'last_updated': '2024-01-15'
+    }
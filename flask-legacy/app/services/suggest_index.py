@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+输入联想索引 - 业务描述、字段名、物料编码、申请人、处理人的前缀补全
+
+每类候选词是一个按小写键排序的数组，前缀查询用 bisect 定位匹配区间，返回区间内出现次数最多的 k 个。
+区间较小时直接在区间内取 top-k；匹配很多的短前缀（长度 ≤ 2）构建时预先算好 top-k，
+更长但匹配仍很多的前缀第一次查询时算好并记住，查询耗时与候选词总量基本无关。
+
+- 字典类（business_desc / field_name）订阅 DictionaryStore 的变更通知，同步重建（词典很小）。
+- 请求类（item / requestor / assignee）由本进程的导入/编辑/删除在保存后调用 refresh_requests 同步重建；
+  其他进程写入的变化在查询时通过文件 mtime 发现，在后台线程重建，期间继续用旧索引应答。
+"""
+import bisect
+import heapq
+import os
+import threading
+from app.services.dictionary_store import get_dictionary_store
+from app.utils.json_store import load_json
+from app.utils.logger import logger
+
+DICTIONARY_KINDS = {'business_desc': 'business_desc', 'field_name': 'field_name'}
+REQUEST_KINDS = {'item': 'item', 'requestor': 'requestor', 'assignee': 'assigned_to'}
+KINDS = tuple(DICTIONARY_KINDS) + tuple(REQUEST_KINDS)
+
+# 匹配区间不超过这么多项时直接扫描区间取 top-k
+SCAN_LIMIT = 1000
+# 预先计算 top-k 的前缀最大长度
+PRECOMPUTED_PREFIX_LEN = 2
+# 前缀后接最大码位作为匹配区间的上界
+_MAX_CHAR = '\U0010ffff'
+
+
+class _Sorted:
+    """排序后的候选词：小写键数组 + 对应的原始写法和出现次数"""
+
+    def __init__(self, values, top_k=50):
+        self.top_k = top_k
+        merged = {}
+        for value in values:
+            value = (value or '').strip()
+            if not value:
+                continue
+            key = value.lower()
+            if key in merged:
+                merged[key][1] += 1
+            else:
+                merged[key] = [value, 1]
+        self.keys = sorted(merged)
+        self.values = [merged[key][0] for key in self.keys]
+        self.counts = [merged[key][1] for key in self.keys]
+        self._top = {}
+        for length in range(PRECOMPUTED_PREFIX_LEN + 1):
+            start = 0
+            while start < len(self.keys):
+                prefix = self.keys[start][:length]
+                end = bisect.bisect_right(self.keys, prefix + _MAX_CHAR, start)
+                if end - start > SCAN_LIMIT:
+                    self._top[prefix] = self._rank(start, end, top_k)
+                start = end
+
+    def _rank(self, start, end, limit):
+        """区间内出现次数最多的 limit 项（次数相同按字母序）"""
+        counts = self.counts
+        return heapq.nsmallest(limit, range(start, end), key=lambda i: (-counts[i], i))
+
+    def complete(self, prefix, limit):
+        prefix = prefix.strip().lower()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_right(self.keys, prefix + _MAX_CHAR, start)
+        if end - start <= SCAN_LIMIT or limit > self.top_k:
+            ranked = self._rank(start, end, limit)
+        else:
+            ranked = self._top.get(prefix)
+            if ranked is None:
+                ranked = self._top[prefix] = self._rank(start, end, self.top_k)
+            ranked = ranked[:limit]
+        return [{'value': self.values[i], 'count': self.counts[i]} for i in ranked]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _request_values(requests_list, field):
+    for r in requests_list:
+        if field == 'item':
+            # 单物料字段 + 多物料列表
+            yield r.get('item')
+            yield from (r.get('items') or ())
+        else:
+            yield r.get(field)
+
+
+class SuggestIndex:
+    """字典 + 变更请求的前缀补全索引"""
+
+    def __init__(self, requests_file, dictionary_store=None, top_k=50):
+        self.requests_file = requests_file
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._requests_stamp = None
+        self._pending_stamp = None
+        self._worker = None
+        self.rebuilds = 0
+        if dictionary_store is not None:
+            self.load_dictionary(dictionary_store.all())
+            dictionary_store.subscribe(self.load_dictionary)
+
+    def load_dictionary(self, entries):
+        """用词典条目重建字典类索引（DictionaryStore 变更回调）"""
+        built = {kind: _Sorted((e.get(field) for e in entries), self.top_k)
+                 for kind, field in DICTIONARY_KINDS.items()}
+        self._indexes = {**self._indexes, **built}
+
+    def load_requests(self, requests_list):
+        """用变更请求重建请求类索引"""
+        built = {kind: _Sorted(_request_values(requests_list, field), self.top_k)
+                 for kind, field in REQUEST_KINDS.items()}
+        self._indexes = {**self._indexes, **built}
+        self.rebuilds += 1
+
+    def refresh_requests(self, requests_list):
+        """请求文件刚保存（调用方持有存储锁）：用内存中的列表同步重建，并记下文件当前版本"""
+        with self._lock:
+            self.load_requests(requests_list)
+            self._requests_stamp = self._stamp()
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.requests_file)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _refresh_requests(self):
+        """请求文件变化时安排重建；还没有索引时同步构建"""
+        stamp = self._stamp()
+        if stamp == self._requests_stamp:
+            return
+        if 'item' not in self._indexes:
+            with self._lock:
+                if 'item' not in self._indexes:
+                    self.load_requests(load_json(self.requests_file))
+                    self._requests_stamp = stamp
+            return
+        with self._lock:
+            self._pending_stamp = stamp
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._rebuild_loop, name='suggest-rebuild', daemon=True)
+            self._worker.start()
+
+    def _rebuild_loop(self):
+        while True:
+            with self._lock:
+                stamp, self._pending_stamp = self._pending_stamp, None
+                if stamp is None:
+                    self._worker = None
+                    return
+            if stamp == self._requests_stamp:
+                continue
+            try:
+                # 先读 stamp 再读文件：读取期间又有写入时下次查询会再重建一次
+                self.load_requests(load_json(self.requests_file))
+                self._requests_stamp = stamp
+            except Exception as e:
+                logger.error(f'联想索引重建失败: {str(e)}')
+
+    def wait(self, timeout=None):
+        """等待进行中的后台重建完成"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def suggest(self, kind, prefix, limit=10):
+        """
+        前缀补全
+
+        Args:
+            kind: KINDS 之一
+            prefix: 输入前缀（忽略大小写），为空时在全部候选词中取
+
+        Returns:
+            list: [{'value': 原始写法, 'count': 出现次数}]，出现次数多的在前，相同时按字母序
+        """
+        if kind not in KINDS:
+            raise ValueError(f'不支持的类型: {kind}')
+        if kind in REQUEST_KINDS:
+            self._refresh_requests()
+        index = self._indexes.get(kind)
+        return index.complete(prefix or '', limit) if index is not None else []
+
+    def stats(self):
+        return {'sizes': {kind: len(index) for kind, index in self._indexes.items()},
+                'rebuilds': self.rebuilds, 'rebuilding': self._worker is not None}
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_suggest_index(config):
+    """按配置取共享联想索引（首次创建时订阅字段词典变更）"""
+    key = (os.path.abspath(config['REQUESTS_FILE']), os.path.abspath(config['DICTIONARY_FILE']))
+    with _instances_lock:
+        index = _instances.get(key)
+        if index is None:
+            index = SuggestIndex(config['REQUESTS_FILE'], get_dictionary_store(config['DICTIONARY_FILE']),
+                                 config.get('SUGGEST_MAX_LIMIT', 50))
+            _instances[key] = index
+        return index
+
+
+def refresh_requests(config, requests_list):
+    """
+    变更请求保存后调用（导入/编辑/删除）：已建立的联想索引立即按新数据重建
+
+    本进程还没有查询过联想时什么都不做（首次查询时再构建）；重建失败只记日志，不影响写入。
+    """
+    requests_file = os.path.abspath(config['REQUESTS_FILE'])
+    with _instances_lock:
+        indexes = [index for key, index in _instances.items() if key[0] == requests_file]
+    for index in indexes:
+        try:
+            index.refresh_requests(requests_list)
+        except Exception as e:
+            logger.error(f'联想索引重建失败: {str(e)}')
+
+
+def suggest_stats():
+    """各联想索引统计（供 /api/metrics 使用）"""
+    with _instances_lock:
+        return {key[0]: index.stats() for key, index in _instances.items()}
@@ -0,0 +1,441 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+审批回写队列（SQLite持久化）
+
+审批只记录回写意图并立即返回；后台工作线程从队列取任务回写PLM/EBS，
+失败按指数退避重试，请求状态 Approved → Applied（成功）/ Failed（重试耗尽或不可重试的错误）。
+失败的任务留在死信列表中，可查看原因并手动重新入队。
+
+多进程（gunicorn 多 worker）共用同一个队列文件：领取任务是一条带条件的 UPDATE，
+同一任务只会被一个工作线程领到；领取时记下领取标记和租约到期时间，
+只有租约过期（进程中途退出）的任务才会被重新领取，其他进程正在执行的任务不受影响。
+回写结果写回 change_requests.json 时持有 json_store.lock_for 的跨进程文件锁，
+与各进程的审批、导入、编辑请求互斥。
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from app.services.ebs_service import update_ebs_items, invalidate_item
+from app.services.plm_service import update_plm_item
+from app.utils.json_store import load_json, lock_for, save_json
+from app.utils.event_log import record_event, WRITEBACK_APPLIED, WRITEBACK_FAILED, WRITEBACK_RETRY, WRITEBACK_SKIPPED
+from app.utils.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS writeback_jobs (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id      TEXT NOT NULL,
+    change          TEXT NOT NULL,
+    state           TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error      TEXT,
+    result          TEXT,
+    claimed_by      TEXT,
+    lease_until     REAL,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_writeback_jobs_due ON writeback_jobs (state, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_writeback_jobs_request ON writeback_jobs (request_id);
+"""
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+# 请求中需要回写的字段
+CHANGE_FIELDS = ('system', 'item', 'items', 'field', 'new_value')
+
+
+def change_from_request(req):
+    """从变更请求中取出回写所需的字段"""
+    return {key: req.get(key) for key in CHANGE_FIELDS}
+
+
+def apply_writeback(change):
+    """
+    按请求的系统回写PLM/EBS（请求涉及的所有物料），并失效物料缓存
+
+    Returns:
+        dict: {
+            'update_success': bool,
+            'update_message': str,
+            'update_errors': [逐行失败原因],
+            'update_skipped': [不在EBS回写范围、需手工维护的行],
+            'retryable': bool       # 失败是否可能是暂时的（数据库/PLM不可用），值得重试
+        }
+    """
+    system = (change.get('system') or '').upper()
+    item = change.get('item')
+    items = change.get('items') or ([item] if item else [])
+    field = change.get('field')
+    new_value = change.get('new_value')
+
+    update_success = False
+    update_message = ''
+    update_errors = []
+    update_skipped = []
+    retryable = False
+
+    if 'PLM' in system:
+        result = update_plm_item(item, field, new_value)
+        update_success = result['success']
+        update_message = result['message']
+        retryable = not result['success']
+
+    if 'EBS' in system:
+        # 所有物料一次批量回写，逐行返回失败原因
+        result = update_ebs_items([(i, field, new_value) for i in items])
+        update_success = update_success and result['success'] if 'PLM' in system else result['success']
+        update_message = f'{update_message}; {result["message"]}' if update_message else result['message']
+        update_errors = [r for r in result['results'] if not r['success']]
+        update_skipped = [r for r in result['results'] if r['skipped']]
+        retryable = retryable or any(r['retryable'] for r in update_errors)
+
+    # 回写后物料缓存失效，下次查询取最新数据
+    invalidate_item(item, *items)
+
+    return {'update_success': update_success, 'update_message': update_message,
+            'update_errors': update_errors, 'update_skipped': update_skipped, 'retryable': retryable}
+
+
+def writeback_status(result):
+    """
+    回写结果对应的请求状态
+
+    全部写入为 Applied，有失败为 Failed；有字段不在EBS回写范围（需手工维护）时
+    不算已应用，保持 Approved
+    """
+    if not result['update_success']:
+        return 'Failed'
+    return 'Approved' if result.get('update_skipped') else 'Applied'
+
+
+def writeback_event(result):
+    """回写结果对应的审计事件类型"""
+    return {'Applied': WRITEBACK_APPLIED, 'Failed': WRITEBACK_FAILED}.get(writeback_status(result), WRITEBACK_SKIPPED)
+
+
+class WritebackQueue:
+    """SQLite任务队列，单连接 + 锁，WAL模式"""
+
+    def __init__(self, path, max_attempts=5, retry_base=2.0, retry_max=300.0, lease=600.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        # 旧版本建的表没有租约字段
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(writeback_jobs)')}
+        for column, kind in (('claimed_by', 'TEXT'), ('lease_until', 'REAL')):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE writeback_jobs ADD COLUMN {column} {kind}')
+
+    def enqueue(self, request_id, change):
+        """加入回写任务，返回任务ID"""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                'INSERT INTO writeback_jobs (request_id, change, state, next_attempt_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (request_id, json.dumps(change, ensure_ascii=False), QUEUED, now, now, now)
+            )
+            self._wakeup.notify()
+            return cur.lastrowid
+
+    def claim(self):
+        """
+        取一个到期的任务并标记为执行中（attempts + 1），没有返回None
+
+        候选任务用带条件的 UPDATE 领取（仍是 queued 才改），被其他进程抢先时换下一个；
+        租约已过期的执行中任务先放回队列。
+        """
+        with self._lock:
+            self._expire_leases()
+            while True:
+                now = time.time()
+                row = self._conn.execute(
+                    'SELECT * FROM writeback_jobs WHERE state = ? AND next_attempt_at <= ? '
+                    'ORDER BY next_attempt_at, id LIMIT 1', (QUEUED, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                token = uuid.uuid4().hex
+                cur = self._conn.execute(
+                    'UPDATE writeback_jobs SET state = ?, attempts = attempts + 1, claimed_by = ?, lease_until = ?, '
+                    'updated_at = ? WHERE id = ? AND state = ?',
+                    (RUNNING, token, now + self.lease, now, row['id'], QUEUED)
+                )
+                if cur.rowcount == 1:
+                    job = _job(row)
+                    job.update(state=RUNNING, attempts=job['attempts'] + 1, claimed_by=token,
+                               lease_until=now + self.lease)
+                    return job
+
+    def wait(self, timeout):
+        """等待新任务入队或下一个重试到期（最多 timeout 秒）"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT MIN(next_attempt_at) FROM writeback_jobs WHERE state = ?', (QUEUED,)
+            ).fetchone()
+            if row[0] is not None:
+                timeout = min(timeout, max(0.0, row[0] - time.time()))
+            if timeout > 0:
+                self._wakeup.wait(timeout)
+
+    def complete(self, job, result):
+        self._finish(job, DONE, result, None)
+
+    def fail(self, job, error, result=None):
+        """
+        记录一次失败：未达最大次数则按指数退避（含抖动）重新排队，否则进入死信
+
+        Returns:
+            float: 下次重试的等待秒数，进入死信返回None
+        """
+        if job['attempts'] >= self.max_attempts:
+            self._finish(job, DEAD, result, error)
+            return None
+        delay = min(self.retry_max, self.retry_base * 2 ** (job['attempts'] - 1))
+        delay *= random.uniform(0.8, 1.2)
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                'UPDATE writeback_jobs SET state = ?, next_attempt_at = ?, last_error = ?, result = ?, '
+                'claimed_by = NULL, lease_until = NULL, updated_at = ? WHERE id = ? AND state = ? AND claimed_by = ?',
+                (QUEUED, now + delay, error, _dumps(result), now, job['id'], RUNNING, job['claimed_by'])
+            )
+        _check_lease(job, cur)
+        return delay
+
+    def dead_letter(self, job, error, result=None):
+        """不可重试的失败：直接进入死信"""
+        self._finish(job, DEAD, result, error)
+
+    def _finish(self, job, state, result, error):
+        """结束任务（只在仍持有租约时生效）"""
+        with self._lock:
+            cur = self._conn.execute(
+                'UPDATE writeback_jobs SET state = ?, last_error = ?, result = ?, claimed_by = NULL, '
+                'lease_until = NULL, updated_at = ? WHERE id = ? AND state = ? AND claimed_by = ?',
+                (state, error, _dumps(result), time.time(), job['id'], RUNNING, job['claimed_by'])
+            )
+        _check_lease(job, cur)
+
+    def requeue(self, job_id):
+        """死信任务重新入队（重置重试次数），返回是否成功"""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                'UPDATE writeback_jobs SET state = ?, attempts = 0, next_attempt_at = ?, updated_at = ? '
+                'WHERE id = ? AND state = ?', (QUEUED, now, now, job_id, DEAD)
+            )
+            self._wakeup.notify()
+            return cur.rowcount == 1
+
+    def recover(self):
+        """把租约已过期（执行进程中途退出）的任务放回队列，返回数量；其他进程正在执行的任务不动"""
+        with self._lock:
+            return self._expire_leases()
+
+    def _expire_leases(self):
+        now = time.time()
+        cur = self._conn.execute(
+            'UPDATE writeback_jobs SET state = ?, claimed_by = NULL, lease_until = NULL, updated_at = ? '
+            'WHERE state = ? AND lease_until < ?', (QUEUED, now, RUNNING, now)
+        )
+        return cur.rowcount
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM writeback_jobs WHERE id = ?', (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def jobs_for(self, request_id):
+        """请求的全部回写任务（新的在前）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM writeback_jobs WHERE request_id = ? ORDER BY id DESC', (request_id,)
+            ).fetchall()
+        return [_job(row) for row in rows]
+
+    def dead_letters(self, limit=100):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM writeback_jobs WHERE state = ? ORDER BY updated_at DESC LIMIT ?', (DEAD, limit)
+            ).fetchall()
+        return [_job(row) for row in rows]
+
+    def stats(self):
+        """各状态任务数"""
+        with self._lock:
+            counts = dict(self._conn.execute('SELECT state, COUNT(*) FROM writeback_jobs GROUP BY state').fetchall())
+            oldest = self._conn.execute(
+                'SELECT MIN(created_at) FROM writeback_jobs WHERE state IN (?, ?)', (QUEUED, RUNNING)
+            ).fetchone()[0]
+        return {
+            **{state: counts.get(state, 0) for state in (QUEUED, RUNNING, DONE, DEAD)},
+            'oldest_pending_s': round(time.time() - oldest, 1) if oldest else 0.0,
+            'max_attempts': self.max_attempts,
+        }
+
+
+def _check_lease(job, cur):
+    if cur.rowcount != 1:
+        logger.warning(f'回写任务 {job["id"]} 的租约已过期并被重新领取，本次结果不再记录')
+
+
+def _dumps(result):
+    return json.dumps(result, ensure_ascii=False) if result is not None else None
+
+
+def _job(row):
+    job = dict(row)
+    job['change'] = json.loads(job['change'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+_workers = {}
+
+
+def get_writeback_queue(config):
+    """按配置取共享队列实例（WRITEBACK_QUEUE_FILE 为空则禁用，审批时同步回写）"""
+    path = config.get('WRITEBACK_QUEUE_FILE')
+    if not path:
+        return None
+    with _instances_lock:
+        queue = _instances.get(path)
+        if queue is None:
+            queue = WritebackQueue(path, config.get('WRITEBACK_MAX_ATTEMPTS', 5),
+                                   config.get('WRITEBACK_RETRY_BASE', 2.0), config.get('WRITEBACK_RETRY_MAX', 300.0),
+                                   config.get('WRITEBACK_LEASE', 600.0))
+            _instances[path] = queue
+        return queue
+
+
+def start_writeback_workers(app):
+    """启动后台回写线程（应用启动时调用；同一队列只启动一次，WRITEBACK_START_WORKERS 关闭时不启动）"""
+    count = app.config.get('WRITEBACK_WORKERS', 2)
+    if not app.config.get('WRITEBACK_START_WORKERS', True) or count <= 0:
+        return []
+    queue = get_writeback_queue(app.config)
+    if queue is None:
+        return []
+    with _instances_lock:
+        if queue.path in _workers:
+            return _workers[queue.path]
+        recovered = queue.recover()
+        if recovered:
+            logger.info(f'回写队列恢复 {recovered} 个租约过期的任务')
+        threads = [
+            threading.Thread(target=_worker_loop, args=(app, queue), name=f'writeback-{n}', daemon=True)
+            for n in range(count)
+        ]
+        _workers[queue.path] = threads
+    for thread in threads:
+        thread.start()
+    logger.info(f'回写队列已启动: {queue.path}（{count} 个工作线程）')
+    return threads
+
+
+def _worker_loop(app, queue):
+    while True:
+        try:
+            job = queue.claim()
+            if job is None:
+                queue.wait(1.0)
+                continue
+            with app.app_context():
+                process_job(queue, job, app.config['REQUESTS_FILE'], app.config)
+        except Exception as e:
+            logger.error(f'回写线程异常: {str(e)}')
+            time.sleep(1.0)
+
+
+def process_job(queue, job, requests_file, config=None):
+    """执行一个回写任务并更新请求状态（传入 config 时记录审计事件）"""
+    request_id = job['request_id']
+    try:
+        result = apply_writeback(job['change'])
+    except Exception as e:
+        result = {'update_success': False, 'update_message': f'回写异常: {str(e)}',
+                  'update_errors': [], 'retryable': True}
+
+    if result['update_success']:
+        queue.complete(job, result)
+        status = writeback_status(result)
+        _update_request(requests_file, request_id, status, result)
+        _record(config, job, writeback_event(result), result)
+        if status == 'Applied':
+            logger.info(f'回写完成: {request_id}（第 {job["attempts"]} 次）')
+        else:
+            logger.info(f'回写完成，部分字段需在EBS中手工维护: {request_id}')
+        return
+
+    error = result['update_message']
+    delay = queue.fail(job, error, result) if result['retryable'] else queue.dead_letter(job, error, result)
+    if delay is not None:
+        logger.warning(f'回写失败: {request_id}（第 {job["attempts"]} 次），{delay:.0f} 秒后重试: {error}')
+        _update_request(requests_file, request_id, None,
+                        dict(result, update_message=f'第 {job["attempts"]} 次回写失败，{delay:.0f} 秒后重试: {error}'))
+        _record(config, job, WRITEBACK_RETRY, result, retry_in_s=round(delay, 1))
+    else:
+        logger.error(f'回写失败，已进入死信: {request_id}（第 {job["attempts"]} 次）: {error}')
+        _update_request(requests_file, request_id, 'Failed', result)
+        _record(config, job, WRITEBACK_FAILED, result)
+
+
+def _record(config, job, event_type, result, **data):
+    if config is not None:
+        record_event(config, job['request_id'], event_type, 'writeback', job_id=job['id'], attempt=job['attempts'],
+                     message=result['update_message'], errors=result['update_errors'], **data)
+
+
+def _update_request(requests_file, request_id, status, result):
+    """把回写结果写回请求（status 为 None 时只更新结果）"""
+    with lock_for(requests_file):
+        requests_list = load_json(requests_file)
+        for req in requests_list:
+            if req.get('request_id') == request_id:
+                if status:
+                    req['status'] = status
+                    req['writeback_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                req['update_result'] = result['update_message']
+                if result['update_errors']:
+                    req['update_errors'] = result['update_errors']
+                else:
+                    req.pop('update_errors', None)
+                if result.get('update_skipped'):
+                    req['update_skipped'] = result['update_skipped']
+                else:
+                    req.pop('update_skipped', None)
+                save_json(requests_file, requests_list)
+                return True
+    return False
+
+
+def writeback_stats():
+    """各队列统计（供 /api/metrics 使用）"""
+    with _instances_lock:
+        return {path: queue.stats() for path, queue in _instances.items()}
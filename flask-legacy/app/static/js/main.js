@@ -158,7 +158,7 @@ async function loadDashboard() {
             const s = result.by_status || {};
             document.getElementById('statActive').textContent    = result.active_count || 0;
             document.getElementById('statPending').textContent   = s['Pending'] || 0;
-            document.getElementById('statApproved').textContent  = s['Approved'] || 0;
+            document.getElementById('statApproved').textContent  = (s['Approved'] || 0) + (s['Applied'] || 0);
             document.getElementById('statCompleted').textContent = result.completed_count || 0;
             document.getElementById('statTotal').textContent     = result.total || 0;
 
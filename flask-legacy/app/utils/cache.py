@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+内存缓存 - 线程安全的有界LRU缓存（可带TTL），带命中统计
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """有界LRU缓存（maxsize=0 表示禁用）"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """读取缓存，命中时移到最近使用端"""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """删除并返回指定条目"""
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """清空缓存（保留统计）"""
+        with self._lock:
+            self._data.clear()
+
+    def resize(self, maxsize):
+        """调整容量"""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > max(maxsize, 0):
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class TTLCache(LRUCache):
+    """
+    带过期时间的有界LRU缓存
+
+    过期条目不会立即删除：get 视为未命中，get_stale 仍可取到（后端超时时返回旧数据），
+    直到被LRU淘汰或被 pop 显式失效
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.expired = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """读取未过期的缓存"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            stored_at, value = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                self.misses += 1
+                self.expired += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key):
+        """不论是否过期，返回 (value, 已缓存秒数)；没有条目返回 (None, None)"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return None, None
+        stored_at, value = entry
+        return value, time.monotonic() - stored_at
+
+    def put(self, key, value):
+        super().put(key, (time.monotonic(), value))
+
+    def pop(self, key, default=None):
+        """显式失效"""
+        entry = super().pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        self.invalidations += 1
+        return entry[1]
+
+    def stats(self):
+        return {**super().stats(), 'ttl': self.ttl, 'expired': self.expired,
+                'invalidations': self.invalidations}
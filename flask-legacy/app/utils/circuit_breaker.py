@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+熔断器 - 后端连续失败后快速失败，冷却后放行一次探测请求（半开）
+"""
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用未执行"""
+
+
+class CircuitBreaker:
+    """
+    三态熔断器
+
+    closed: 正常放行；连续失败 failure_threshold 次后打开
+    open: 直接拒绝；reset_timeout 秒后转为半开
+    half_open: 只放行一个探测调用，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+        _registry[name] = self
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self):
+        """是否放行本次调用（半开时只放行一个探测）"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release(self):
+        """放行后未实际调用后端（如本地排队超时）：不改变状态，半开时允许下一个探测"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def call(self, func, *args, **kwargs):
+        """通过熔断器调用 func；熔断时抛 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(f'{self.name} 熔断中')
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'retry_in_s': round(max(0.0, self.reset_timeout - (now - self._opened_at)), 1)
+                if state == OPEN else 0.0,
+            }
+
+
+_registry = {}
+
+
+def breaker_stats():
+    """所有熔断器状态（供 /api/metrics 使用）"""
+    return {name: breaker.stats() for name, breaker in list(_registry.items())}
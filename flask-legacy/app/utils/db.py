@@ -3,27 +3,102 @@
 """
 数据库连接池管理
 """
-import cx_Oracle
+import threading
+import time
+try:
+    import cx_Oracle
+except ImportError:  # 使用本地SQLite物料主数据替身（ITEM_MASTER_BACKEND=sqlite）时可不安装
+    cx_Oracle = None
 from flask import current_app
+from app.utils.circuit_breaker import CircuitBreaker
 from app.utils.logger import logger
 
+# 连接池获取连接超时（ORA-24457）
+_ACQUIRE_TIMEOUT_CODE = 24457
+
+# 说明数据库不可达的错误码（其余SQL错误说明数据库本身可用，不计入熔断）
+_CONNECTIVITY_CODES = frozenset({
+    1012, 1033, 1034, 1089, 1092, 3113, 3114, 3135, 12153, 12170, 12514, 12528,
+    12537, 12541, 12543, 12545, 12547, 12560, 12571, 24457,
+})
+
+class DatabaseUnavailable(ConnectionError):
+    """数据库不可用（熔断中或无法获取连接），调用方应进入降级模式"""
+
+def _is_connectivity_error(error):
+    """是否为连接类错误"""
+    if cx_Oracle is not None and isinstance(error, (cx_Oracle.OperationalError, cx_Oracle.InterfaceError)):
+        return True
+    return _error_code(error) in _CONNECTIVITY_CODES
+
+def _error_code(error):
+    """cx_Oracle 错误码（ORA-xxxxx），没有时返回None"""
+    return getattr(error.args[0], 'code', None) if error.args else None
+
 class OraclePool:
     """Oracle数据库连接池"""
     
     _pool = None
+    _config = None
+    # 数据库不可达时快速失败：连续失败后熔断，冷却后放行一个探测查询
+    breaker = CircuitBreaker('oracle', failure_threshold=3, reset_timeout=30.0)
+    _lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _retry_thread = None
+    _stats = {
+        'create_attempts': 0,
+        'create_failures': 0,
+        'acquires': 0,
+        'acquire_timeouts': 0,
+        'acquire_failures': 0,
+        'acquire_wait_total_ms': 0.0,
+        'acquire_wait_max_ms': 0.0,
+    }
+    
+    @classmethod
+    def init_app(cls, app):
+        """
+        应用启动时创建并预热连接池；失败则在后台线程按指数退避重试
+        
+        DB_POOL_EAGER 为 False 时保持原来的懒创建（首次查询时创建）
+        """
+        cls._config = app.config
+        cls.breaker.failure_threshold = app.config.get('DB_BREAKER_FAILURES', 3)
+        cls.breaker.reset_timeout = app.config.get('DB_BREAKER_RESET', 30)
+        if not app.config.get('DB_POOL_EAGER', True):
+            return
+        with cls._lock:
+            if cls._pool is None:
+                cls._pool = cls._create_pool()
+        if cls._pool is not None:
+            cls._warm_up()
+        else:
+            cls._start_retry()
     
     @classmethod
     def get_pool(cls):
-        """获取连接池（单例模式）"""
+        """获取连接池（单例模式）；后台重试期间直接返回None，不阻塞请求"""
         if cls._pool is None:
-            cls._pool = cls._create_pool()
+            if cls._retry_thread is not None:
+                return None
+            with cls._lock:
+                if cls._pool is None:
+                    cls._pool = cls._create_pool()
         return cls._pool
     
+    @classmethod
+    def _settings(cls):
+        return cls._config if cls._config is not None else current_app.config
+    
     @classmethod
     def _create_pool(cls):
         """创建连接池"""
+        with cls._stats_lock:
+            cls._stats['create_attempts'] += 1
         try:
-            config = current_app.config
+            if cx_Oracle is None:
+                raise RuntimeError('未安装 cx_Oracle')
+            config = cls._settings()
             dsn = cx_Oracle.makedsn(
                 config['DB_HOST'],
                 config['DB_PORT'],
@@ -34,31 +109,150 @@ class OraclePool:
                 user=config['DB_USER'],
                 password=config['DB_PASSWORD'],
                 dsn=dsn,
-                min=2,
-                max=10,
-                increment=1,
+                min=config.get('DB_POOL_MIN', 2),
+                max=config.get('DB_POOL_MAX', 10),
+                increment=config.get('DB_POOL_INCREMENT', 1),
+                getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT,
+                wait_timeout=config.get('DB_POOL_WAIT_TIMEOUT_MS', 5000),
+                stmtcachesize=config.get('DB_STMT_CACHE_SIZE', 50),
                 encoding='UTF-8'
             )
             
-            logger.info(f'数据库连接池创建成功: {config["DB_HOST"]}:{config["DB_PORT"]}/{config["DB_SERVICE"]}')
+            logger.info(f'数据库连接池创建成功: {config["DB_HOST"]}:{config["DB_PORT"]}/{config["DB_SERVICE"]}'
+                        f'（min={pool.min}, max={pool.max}）')
             return pool
         
         except Exception as e:
+            with cls._stats_lock:
+                cls._stats['create_failures'] += 1
             logger.error(f'数据库连接池创建失败: {str(e)}')
             return None
     
+    @classmethod
+    def _warm_up(cls):
+        """预热：取一个连接做一次往返，确认会话可用"""
+        started = time.perf_counter()
+        conn = cls.get_connection()
+        if conn is None:
+            return
+        try:
+            conn.ping()
+            logger.info(f'数据库连接池预热完成（{(time.perf_counter() - started) * 1000:.0f}ms）')
+        except Exception as e:
+            logger.warning(f'数据库连接池预热失败: {str(e)}')
+        finally:
+            conn.close()
+    
+    @classmethod
+    def _start_retry(cls):
+        """启动后台重试线程（已在运行则忽略）"""
+        with cls._lock:
+            if cls._retry_thread is not None:
+                return
+            cls._retry_thread = threading.Thread(target=cls._retry_loop, name='oracle-pool-retry', daemon=True)
+            cls._retry_thread.start()
+    
+    @classmethod
+    def _retry_loop(cls):
+        config = cls._settings()
+        delay = config.get('DB_POOL_RETRY_INTERVAL', 5)
+        max_delay = config.get('DB_POOL_RETRY_MAX_INTERVAL', 300)
+        while True:
+            logger.info(f'{delay:.0f} 秒后重试创建数据库连接池')
+            time.sleep(delay)
+            pool = cls._create_pool()
+            if pool is not None:
+                with cls._lock:
+                    cls._pool = pool
+                    cls._retry_thread = None
+                cls._warm_up()
+                return
+            delay = min(max_delay, delay * 2)
+    
     @classmethod
     def get_connection(cls):
         """从连接池获取连接"""
         pool = cls.get_pool()
         if pool:
             try:
-                return pool.acquire()
+                return cls._pool_acquire(pool)
             except Exception as e:
                 logger.error(f'获取数据库连接失败: {str(e)}')
-                return None
         return None
     
+    @classmethod
+    def _pool_acquire(cls, pool):
+        started = time.perf_counter()
+        try:
+            conn = pool.acquire()
+        except Exception as e:
+            cls._record_acquire(started, e)
+            raise
+        cls._record_acquire(started)
+        return conn
+    
+    @classmethod
+    def _acquire(cls):
+        """
+        经过熔断器获取连接；熔断中或取不到连接时抛 DatabaseUnavailable
+        
+        连接池已满、等待超时（ORA-24457）是本地排队，不说明数据库不可用，不计入熔断。
+        """
+        if not cls.breaker.allow():
+            raise DatabaseUnavailable('数据库熔断中，跳过查询')
+        pool = cls.get_pool()
+        if not pool:
+            cls.breaker.record_failure()
+            raise DatabaseUnavailable('数据库连接不可用')
+        try:
+            return cls._pool_acquire(pool)
+        except Exception as e:
+            if _error_code(e) == _ACQUIRE_TIMEOUT_CODE:
+                cls.breaker.release()
+                logger.warning(f'连接池已满，获取连接超时: {str(e)}')
+                raise DatabaseUnavailable('连接池已满，获取连接超时') from e
+            cls.breaker.record_failure()
+            logger.error(f'获取数据库连接失败: {str(e)}')
+            raise DatabaseUnavailable('数据库连接不可用') from e
+    
+    @classmethod
+    def _record_outcome(cls, error=None):
+        """按执行结果更新熔断器：连接类错误计为失败，其他结果说明数据库可用"""
+        if error is not None and _is_connectivity_error(error):
+            cls.breaker.record_failure()
+        else:
+            cls.breaker.record_success()
+    
+    @classmethod
+    def _record_acquire(cls, started, error=None):
+        waited = (time.perf_counter() - started) * 1000
+        code = _error_code(error) if error is not None else None
+        with cls._stats_lock:
+            stats = cls._stats
+            stats['acquires'] += 1
+            stats['acquire_wait_total_ms'] += waited
+            stats['acquire_wait_max_ms'] = max(stats['acquire_wait_max_ms'], waited)
+            if error is not None:
+                stats['acquire_timeouts' if code == _ACQUIRE_TIMEOUT_CODE else 'acquire_failures'] += 1
+    
+    @classmethod
+    def stats(cls):
+        """连接池指标（供 /api/metrics 使用）"""
+        pool = cls._pool
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+        acquires = stats['acquires']
+        wait_total = stats.pop('acquire_wait_total_ms')
+        stats['acquire_wait_avg_ms'] = round(wait_total / acquires, 2) if acquires else 0.0
+        stats['acquire_wait_max_ms'] = round(stats['acquire_wait_max_ms'], 2)
+        stats['ready'] = pool is not None
+        stats['retrying'] = cls._retry_thread is not None
+        stats['breaker'] = cls.breaker.stats()
+        if pool is not None:
+            stats.update(open=pool.opened, busy=pool.busy, min=pool.min, max=pool.max,
+                         stmt_cache_size=pool.stmtcachesize)
+        return stats
+    
     @classmethod
     def execute_query(cls, sql, params=None):
         """
@@ -71,32 +265,133 @@ class OraclePool:
         Returns:
             list: 查询结果列表
         """
-        conn = None
         try:
-            conn = cls.get_connection()
-            if not conn:
-                logger.warning('数据库连接不可用，返回空结果')
-                return []
-            
-            cursor = conn.cursor()
+            return list(cls.iter_query(sql, params))
+        
+        except DatabaseUnavailable as e:
+            logger.warning(f'{str(e)}，返回空结果')
+            return []
+        
+        except Exception as e:
+            logger.error(f'SQL查询失败: {str(e)}\nSQL: {sql}')
+            return []
+    
+    @classmethod
+    def iter_query(cls, sql, params=None, columns=None, as_dict=True, arraysize=None, prefetchrows=None):
+        """
+        流式查询：逐行产出结果，内存占用与结果集大小无关
+        
+        游标按 arraysize 批量取数（每批一次网络往返），遍历结束或生成器关闭时
+        释放游标并把连接归还连接池。
+        
+        Args:
+            sql: SQL语句
+            params: 参数（dict或tuple）
+            columns: 只返回这些列（列名，大小写不敏感），None 返回全部
+            as_dict: True 产出 dict，False 产出 tuple（更省内存）
+            arraysize: 每次往返取的行数（默认 DB_FETCH_ARRAYSIZE）
+            prefetchrows: execute 时随响应预取的行数（默认 DB_PREFETCH_ROWS）
+        
+        Yields:
+            dict 或 tuple
+        
+        Raises:
+            DatabaseUnavailable: 数据库熔断中或连接不可用
+        """
+        config = cls._settings()
+        conn = cls._acquire()
+        cursor = None
+        try:
+            # 游标创建也在熔断结果记录范围内：半开探测在这里出错时同样要关闭或重新打开熔断器
+            try:
+                cursor = conn.cursor()
+                cursor.arraysize = arraysize or config.get('DB_FETCH_ARRAYSIZE', 500)
+                cursor.prefetchrows = (prefetchrows if prefetchrows is not None
+                                       else config.get('DB_PREFETCH_ROWS', cursor.arraysize + 1))
+                if params:
+                    cursor.execute(sql, params)
+                else:
+                    cursor.execute(sql)
+            except Exception as e:
+                cls._record_outcome(e)
+                raise
+            cls._record_outcome()
             
-            if params:
-                cursor.execute(sql, params)
+            names = [col[0] for col in cursor.description]
+            if columns:
+                wanted = [name.upper() for name in columns]
+                unknown = [name for name in wanted if name not in names]
+                if unknown:
+                    raise ValueError(f'查询结果中没有列: {", ".join(unknown)}')
+                indexes = [names.index(name) for name in wanted]
+                names = wanted
             else:
-                cursor.execute(sql)
+                indexes = None
             
-            columns = [col[0] for col in cursor.description]
-            results = []
+            while True:
+                try:
+                    rows = cursor.fetchmany()
+                except Exception as e:
+                    cls._record_outcome(e)
+                    raise
+                if not rows:
+                    break
+                for row in rows:
+                    if indexes is not None:
+                        row = tuple(row[i] for i in indexes)
+                    yield dict(zip(names, row)) if as_dict else row
+        
+        finally:
+            if cursor:
+                cursor.close()
+            conn.close()
+    
+    @classmethod
+    def execute_many(cls, sql, rows):
+        """
+        数组DML：多行绑定一次往返执行，整批一个事务
+        
+        单行出错（batcherrors）不影响其他行，其余行照常提交。
+        
+        Args:
+            sql: SQL语句
+            rows: 每行的绑定参数（dict或tuple）列表
+        
+        Returns:
+            dict: {'rowcounts': [每行影响的行数], 'errors': {行号: 错误信息}, 'retryable': bool}，
+                  整批失败时每行都有错误；retryable 只在整批因数据库不可用/连接类错误失败时为 True，
+                  单行错误（约束、数值等数据问题）重试也不会成功
+        """
+        conn = None
+        try:
+            conn = cls._acquire()
             
-            for row in cursor:
-                results.append(dict(zip(columns, row)))
+            cursor = conn.cursor()
+            cursor.executemany(sql, rows, batcherrors=True, arraydmlrowcounts=True)
+            errors = {error.offset: error.message for error in cursor.getbatcherrors()}
+            rowcounts = cursor.getarraydmlrowcounts()
+            if len(rowcounts) != len(rows):
+                # 出错的行不返回影响行数，按行号对齐
+                counts = iter(rowcounts)
+                rowcounts = [0 if offset in errors else next(counts, 0) for offset in range(len(rows))]
             
+            conn.commit()
             cursor.close()
-            return results
+            cls._record_outcome()
+            
+            return {'rowcounts': rowcounts, 'errors': errors, 'retryable': False}
+        
+        except DatabaseUnavailable as e:
+            logger.warning(str(e))
+            return {'rowcounts': [0] * len(rows), 'errors': dict.fromkeys(range(len(rows)), str(e)), 'retryable': True}
         
         except Exception as e:
-            logger.error(f'SQL查询失败: {str(e)}\nSQL: {sql}')
-            return []
+            logger.error(f'SQL批量更新失败: {str(e)}\nSQL: {sql}')
+            cls._record_outcome(e)
+            if conn:
+                conn.rollback()
+            return {'rowcounts': [0] * len(rows), 'errors': dict.fromkeys(range(len(rows)), str(e)),
+                    'retryable': _is_connectivity_error(e)}
         
         finally:
             if conn:
@@ -116,10 +411,7 @@ class OraclePool:
         """
         conn = None
         try:
-            conn = cls.get_connection()
-            if not conn:
-                logger.warning('数据库连接不可用')
-                return 0
+            conn = cls._acquire()
             
             cursor = conn.cursor()
             
@@ -131,11 +423,17 @@ class OraclePool:
             conn.commit()
             rowcount = cursor.rowcount
             cursor.close()
+            cls._record_outcome()
             
             return rowcount
         
+        except DatabaseUnavailable as e:
+            logger.warning(str(e))
+            return 0
+        
         except Exception as e:
             logger.error(f'SQL更新失败: {str(e)}\nSQL: {sql}')
+            cls._record_outcome(e)
             if conn:
                 conn.rollback()
             return 0
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+审计事件日志 - 只追加的分段文件 + SQLite偏移索引
+
+事件按行（JSON）追加到 events-NNNNNN.log，单个分段超过 segment_bytes 后切换新分段；
+每个事件在索引库中记一行（请求ID、类型、操作人、时间 → 分段号 + 字节偏移）。
+查询先走索引，再按偏移 seek 读取对应行，只读涉及的事件，与日志总量无关。
+
+日志是唯一数据源：索引落后（进程在写日志后、写索引前退出）时启动时自动补齐，
+也可以用 rebuild_index() 从分段文件整体重建。
+
+多进程（gunicorn 多 worker）共用同一目录：追加时持有目录下 append.lock 的文件锁，
+在锁内确定当前分段、seek 到文件末尾取偏移，事件序号由索引库分配，各进程的事件互不覆盖。
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+try:
+    import fcntl
+except ImportError:  # Windows 本地开发：只有进程内的线程锁，单进程使用
+    fcntl = None
+from app.utils.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id  TEXT,
+    type        TEXT NOT NULL,
+    actor       TEXT,
+    ts          REAL NOT NULL,
+    segment     INTEGER NOT NULL,
+    offset      INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_request ON events (request_id, seq);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_actor_ts ON events (actor, ts);
+CREATE TABLE IF NOT EXISTS segments (
+    segment       INTEGER PRIMARY KEY,
+    indexed_bytes INTEGER NOT NULL
+);
+"""
+
+_SEGMENT_NAME = re.compile(r'^events-(\d{6})\.log$')
+
+# 事件类型
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+APPROVED = 'approved'
+REJECTED = 'rejected'
+WRITEBACK_APPLIED = 'writeback_applied'
+WRITEBACK_SKIPPED = 'writeback_skipped'
+WRITEBACK_RETRY = 'writeback_retry'
+WRITEBACK_FAILED = 'writeback_failed'
+WRITEBACK_REQUEUED = 'writeback_requeued'
+
+
+def _segment_path(directory, segment):
+    return os.path.join(directory, f'events-{segment:06d}.log')
+
+
+class EventLog:
+    """只追加事件日志，线程安全；多进程通过文件锁串行追加"""
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync=False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.sqlite3'),
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._lock_file = open(os.path.join(directory, 'append.lock'), 'a')
+
+        with self._append_lock():
+            self._catch_up()
+        self._segment = None
+        self._file = None
+
+    def _append_lock(self):
+        """进程内线程锁 + 跨进程文件锁"""
+        return _AppendLock(self._lock, self._lock_file)
+
+    def _open_latest(self):
+        """切到目录中最新的分段（其他进程可能已经切换了分段），返回当前文件末尾偏移"""
+        segments = self._segments()
+        latest = segments[-1] if segments else 1
+        if latest != self._segment:
+            if self._file is not None:
+                self._file.close()
+            self._segment = latest
+            self._file = open(_segment_path(self.directory, latest), 'ab')
+        self._file.seek(0, os.SEEK_END)
+        return self._file.tell()
+
+    def _segments(self):
+        """目录中的分段号（升序）"""
+        return sorted(int(m.group(1)) for m in map(_SEGMENT_NAME.match, os.listdir(self.directory)) if m)
+
+    def _catch_up(self):
+        """把索引之后追加的日志行补进索引，截掉末尾写了一半的行"""
+        indexed = dict(self._conn.execute('SELECT segment, indexed_bytes FROM segments').fetchall())
+        added = 0
+        for segment in self._segments():
+            path = _segment_path(self.directory, segment)
+            start = indexed.get(segment, 0)
+            if os.path.getsize(path) <= start:
+                continue
+            rows = []
+            with open(path, 'rb+') as f:
+                f.seek(start)
+                offset = start
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        logger.warning(f'事件日志 {path} 末尾有不完整的行，已截断（偏移 {offset}）')
+                        f.truncate(offset)
+                        break
+                    event = json.loads(line)
+                    rows.append(_index_row(event, segment, offset))
+                    offset += len(line)
+            with self._conn:
+                self._conn.executemany('INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+                self._conn.execute('INSERT OR REPLACE INTO segments VALUES (?, ?)', (segment, offset))
+            added += len(rows)
+        if added:
+            logger.info(f'事件索引补齐 {added} 条')
+        return added
+
+    def rebuild_index(self):
+        """清空索引并从全部分段文件重建，返回事件数"""
+        with self._append_lock():
+            self._conn.execute('DELETE FROM events')
+            self._conn.execute('DELETE FROM segments')
+            self._catch_up()
+            return self._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def append(self, request_id, event_type, actor=None, **data):
+        """
+        追加一个事件（写一行日志 + 一行索引，与已有事件数量无关）
+
+        在文件锁内：索引事务中插入索引行、由 SQLite 分配序号，写日志行后提交；
+        提交前退出时事务回滚，已写出的日志行由下次启动的补齐逻辑补进索引。
+
+        Returns:
+            dict: 写入的事件
+        """
+        now = time.time()
+        event = {
+            'seq': None,
+            'ts': now,
+            'time': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+            'request_id': request_id,
+            'type': event_type,
+            'actor': actor,
+            'data': data,
+        }
+        with self._append_lock():
+            offset = self._open_latest()
+            indexed = self._conn.execute('SELECT indexed_bytes FROM segments WHERE segment = ?',
+                                         (self._segment,)).fetchone()
+            if offset != (indexed[0] if indexed else 0):
+                # 某个进程写了日志、没来得及提交索引就退出了：先补齐（或截掉半行）再追加
+                self._catch_up()
+                offset = self._open_latest()
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                event['seq'] = self._conn.execute(
+                    'INSERT INTO events (request_id, type, actor, ts, segment, offset) VALUES (?, ?, ?, ?, ?, ?)',
+                    _index_row(event, self._segment, offset)[1:]
+                ).lastrowid
+                line = (json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+                if offset and offset + len(line) > self.segment_bytes:
+                    self._file.close()
+                    self._segment += 1
+                    self._file = open(_segment_path(self.directory, self._segment), 'ab')
+                    offset = 0
+                    self._conn.execute('UPDATE events SET segment = ?, offset = ? WHERE seq = ?',
+                                       (self._segment, offset, event['seq']))
+                self._file.write(line)
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self._conn.execute('INSERT OR REPLACE INTO segments VALUES (?, ?)',
+                                   (self._segment, offset + len(line)))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return event
+
+    def history(self, request_id):
+        """请求的全部事件（按发生顺序），只读取该请求的行"""
+        with self._lock:
+            locations = self._conn.execute(
+                'SELECT segment, offset FROM events WHERE request_id = ? ORDER BY seq', (request_id,)
+            ).fetchall()
+        return self._read(locations)
+
+    def query(self, start=None, end=None, actor=None, event_type=None, limit=1000):
+        """
+        按时间范围 / 操作人 / 事件类型查询（走 ts 或 actor+ts 索引）
+
+        Args:
+            start, end: 时间戳（秒），含 start 不含 end
+            limit: 最多返回条数（按时间倒序取最新的）
+        """
+        clauses, params = [], []
+        for clause, value in (('ts >= ?', start), ('ts < ?', end), ('actor = ?', actor), ('type = ?', event_type)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        with self._lock:
+            locations = self._conn.execute(
+                f'SELECT segment, offset FROM events {where} ORDER BY ts DESC, seq DESC LIMIT ?', (*params, limit)
+            ).fetchall()
+        return self._read(locations)
+
+    def _read(self, locations):
+        """按 (分段, 偏移) 读取事件，同一分段只打开一次"""
+        events = [None] * len(locations)
+        by_segment = {}
+        for index, (segment, offset) in enumerate(locations):
+            by_segment.setdefault(segment, []).append((offset, index))
+        for segment, entries in by_segment.items():
+            with open(_segment_path(self.directory, segment), 'rb') as f:
+                for offset, index in sorted(entries):
+                    f.seek(offset)
+                    events[index] = json.loads(f.readline())
+        return events
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+            segments = self._segments()
+        segment = segments[-1] if segments else 1
+        size = os.path.getsize(_segment_path(self.directory, segment)) if segments else 0
+        return {'events': count, 'segments': segment, 'active_segment_bytes': size,
+                'segment_bytes': self.segment_bytes, 'directory': self.directory}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._lock_file.close()
+            self._conn.close()
+
+
+class _AppendLock:
+    """先取线程锁再取文件锁（flock 按打开的文件描述，同进程的多个线程要先靠线程锁串行）"""
+
+    def __init__(self, lock, lock_file):
+        self._lock = lock
+        self._lock_file = lock_file
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+
+def _index_row(event, segment, offset):
+    return (event['seq'], event.get('request_id'), event['type'], event.get('actor'), event['ts'], segment, offset)
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_event_log(config):
+    """按配置取共享事件日志实例（EVENT_LOG_DIR 为空则禁用，返回None）"""
+    directory = config.get('EVENT_LOG_DIR')
+    if not directory:
+        return None
+    with _instances_lock:
+        log = _instances.get(directory)
+        if log is None:
+            log = EventLog(directory, config.get('EVENT_LOG_SEGMENT_BYTES', 64 * 1024 * 1024),
+                           config.get('EVENT_LOG_FSYNC', False))
+            _instances[directory] = log
+        return log
+
+
+def record_event(config, request_id, event_type, actor=None, **data):
+    """记录审计事件；写日志失败只记错误日志，不影响业务操作"""
+    try:
+        log = get_event_log(config)
+        if log is not None:
+            log.append(request_id, event_type, actor, **data)
+    except Exception as e:
+        logger.error(f'记录审计事件失败: {request_id} {event_type}: {str(e)}')
+
+
+def event_log_stats():
+    """各事件日志统计（供 /api/metrics 使用）"""
+    with _instances_lock:
+        return {directory: log.stats() for directory, log in _instances.items()}
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+物料主数据后端 - EBS Oracle（OraclePool）或本地 SQLite 替身，由 ITEM_MASTER_BACKEND 选择
+
+SQLite 替身建一张与 EBS 同名同列的 mtl_system_items_b，启动时填充合成物料（含请求库中
+出现过的物料号），接口与 OraclePool 相同；每次网络往返注入可配置的延迟，并按连接池容量
+限制并发，便于在没有公司 Oracle 的环境下对缓存、批量查询和连接池参数做压测。
+"""
+import functools
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from app.utils.db import OraclePool, DatabaseUnavailable
+from app.utils.json_store import load_json
+from app.utils.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mtl_system_items_b (
+    inventory_item_id           INTEGER NOT NULL,
+    organization_id             INTEGER NOT NULL,
+    segment1                    TEXT NOT NULL,
+    description                 TEXT,
+    primary_uom_code            TEXT,
+    item_type                   TEXT,
+    inventory_item_status_code  TEXT,
+    list_price_per_unit         REAL,
+    purchasing_item_flag        TEXT,
+    customer_order_flag         TEXT,
+    stock_enabled_flag          TEXT,
+    buyer_id                    INTEGER,
+    full_lead_time              INTEGER CHECK (full_lead_time >= 0),
+    minimum_order_quantity      REAL CHECK (minimum_order_quantity >= 0),
+    fixed_order_quantity        REAL CHECK (fixed_order_quantity >= 0),
+    fixed_lot_multiplier        REAL CHECK (fixed_lot_multiplier >= 0),
+    attribute1                  TEXT,
+    attribute2                  TEXT,
+    creation_date               TEXT,
+    last_update_date            TEXT,
+    PRIMARY KEY (inventory_item_id, organization_id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS mtl_system_items_b_n1 ON mtl_system_items_b (segment1, organization_id);
+"""
+
+_COLUMNS = ('inventory_item_id', 'organization_id', 'segment1', 'description', 'primary_uom_code',
+            'item_type', 'inventory_item_status_code', 'list_price_per_unit', 'purchasing_item_flag',
+            'customer_order_flag', 'stock_enabled_flag', 'buyer_id', 'full_lead_time',
+            'minimum_order_quantity', 'fixed_order_quantity', 'fixed_lot_multiplier',
+            'attribute1', 'attribute2', 'creation_date', 'last_update_date')
+
+# 主组织（查询都限定 organization_id = 101）及其他库存组织
+MASTER_ORG = 101
+_OTHER_ORGS = (102, 103, 201, 301)
+
+# 本项目SQL中用到的Oracle写法 → SQLite
+_ROWNUM_ONE = re.compile(r'\s+AND\s+ROWNUM\s*=\s*1\b', re.IGNORECASE)
+_SYSDATE = re.compile(r'\bSYSDATE\b', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=256)
+def _translate(sql):
+    """把 ROWNUM = 1、SYSDATE 改写为 SQLite 语法（绑定变量 :name 两边通用）"""
+    sql, limited = _ROWNUM_ONE.subn('', sql)
+    sql = _SYSDATE.sub("datetime('now', 'localtime')", sql)
+    return sql.rstrip() + ' LIMIT 1' if limited else sql
+
+
+class SQLiteItemMaster:
+    """
+    mtl_system_items_b 的 SQLite 替身（接口同 OraclePool）
+
+    注入延迟按往返计：execute、超出预取行数后的每批 fetch、commit 各一次。
+    连接数不超过 max_connections，等待超过 wait_timeout_ms 抛 DatabaseUnavailable（同 ORA-24457）。
+    """
+
+    def __init__(self, path, latency_ms=0.0, jitter_ms=0.0, max_connections=10, wait_timeout_ms=5000,
+                 arraysize=500, prefetchrows=501):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.max_connections = max_connections
+        self.wait_timeout_ms = wait_timeout_ms
+        self.arraysize = arraysize
+        self.prefetchrows = prefetchrows
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._busy = 0
+        self._stats = {
+            'queries': 0,
+            'updates': 0,
+            'round_trips': 0,
+            'rows': 0,
+            'acquires': 0,
+            'acquire_timeouts': 0,
+            'acquire_wait_total_ms': 0.0,
+            'acquire_wait_max_ms': 0.0,
+        }
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config):
+        """按应用配置创建（连接数、等待上限、取数参数沿用 DB_POOL_* / DB_FETCH_*），表为空时填充"""
+        master = cls(config['ITEM_MASTER_SQLITE_FILE'],
+                     latency_ms=config.get('ITEM_MASTER_LATENCY_MS', 0),
+                     jitter_ms=config.get('ITEM_MASTER_JITTER_MS', 0),
+                     max_connections=config.get('DB_POOL_MAX', 10),
+                     wait_timeout_ms=config.get('DB_POOL_WAIT_TIMEOUT_MS', 5000),
+                     arraysize=config.get('DB_FETCH_ARRAYSIZE', 500),
+                     prefetchrows=config.get('DB_PREFETCH_ROWS', 501))
+        master.seed(config.get('ITEM_MASTER_SEED_ITEMS', 20000), config.get('REQUESTS_FILE'))
+        return master
+
+    def _connection(self):
+        """每个线程一个 SQLite 连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def seed(self, count, requests_file=None):
+        """
+        表为空时填充合成物料：请求库中出现过的物料号优先，不足 count 个用 SIM 编号补齐
+
+        每个物料都在主组织 101，另随机分配 0~2 个其他组织。随机数种子固定，结果可复现。
+
+        Returns:
+            int: 新增的物料数（表非空时为0）
+        """
+        conn = self._connection()
+        if conn.execute('SELECT 1 FROM mtl_system_items_b LIMIT 1').fetchone():
+            return 0
+        started = time.perf_counter()
+        items = []
+        if requests_file:
+            items = list(dict.fromkeys(
+                item for record in load_json(requests_file) for item in record.get('items') or [] if item
+            ))
+        known, n = set(items), 0
+        while len(items) < count:
+            if f'SIM{n:06d}' not in known:
+                items.append(f'SIM{n:06d}')
+            n += 1
+
+        rng = random.Random(count)
+        rows = []
+        for item_id, item in enumerate(items, 1):
+            for org in (MASTER_ORG, *rng.sample(_OTHER_ORGS, rng.randint(0, 2))):
+                rows.append(_synthetic_row(rng, item_id, org, item))
+        with conn:
+            conn.executemany(
+                f'INSERT INTO mtl_system_items_b ({", ".join(_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(_COLUMNS))})', rows
+            )
+        logger.info(f'物料主数据替身已填充: {len(items)} 个物料, {len(rows)} 行 '
+                    f'（{(time.perf_counter() - started) * 1000:.0f}ms）')
+        return len(items)
+
+    def _round_trip(self):
+        """模拟一次网络往返"""
+        with self._stats_lock:
+            self._stats['round_trips'] += 1
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _acquire(self):
+        """占用一个连接名额；池满且等待超时抛 DatabaseUnavailable"""
+        started = time.perf_counter()
+        acquired = self._slots.acquire(timeout=self.wait_timeout_ms / 1000)
+        waited = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            stats = self._stats
+            stats['acquires'] += 1
+            stats['acquire_wait_total_ms'] += waited
+            stats['acquire_wait_max_ms'] = max(stats['acquire_wait_max_ms'], waited)
+            if not acquired:
+                stats['acquire_timeouts'] += 1
+            else:
+                self._busy += 1
+        if not acquired:
+            raise DatabaseUnavailable('数据库连接不可用（连接池等待超时）')
+        return self._connection()
+
+    def _release(self):
+        with self._stats_lock:
+            self._busy -= 1
+        self._slots.release()
+
+    def stats(self):
+        """往返次数、连接等待等指标（字段与 OraclePool.stats 对齐）"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            busy = self._busy
+        acquires = stats['acquires']
+        wait_total = stats.pop('acquire_wait_total_ms')
+        stats['acquire_wait_avg_ms'] = round(wait_total / acquires, 2) if acquires else 0.0
+        stats['acquire_wait_max_ms'] = round(stats['acquire_wait_max_ms'], 2)
+        stats.update(ready=True, busy=busy, max=self.max_connections,
+                     latency_ms=self.latency_ms, jitter_ms=self.jitter_ms, path=self.path)
+        return stats
+
+    def execute_query(self, sql, params=None):
+        """执行查询SQL，失败返回空列表（同 OraclePool.execute_query）"""
+        try:
+            return list(self.iter_query(sql, params))
+
+        except DatabaseUnavailable as e:
+            logger.warning(f'{str(e)}，返回空结果')
+            return []
+
+        except Exception as e:
+            logger.error(f'SQL查询失败: {str(e)}\nSQL: {sql}')
+            return []
+
+    def iter_query(self, sql, params=None, columns=None, as_dict=True, arraysize=None, prefetchrows=None):
+        """
+        流式查询（参数同 OraclePool.iter_query），列名统一为大写
+
+        Raises:
+            DatabaseUnavailable: 连接池等待超时
+        """
+        arraysize = arraysize or self.arraysize
+        prefetchrows = self.prefetchrows if prefetchrows is None else prefetchrows
+        conn = self._acquire()
+        cursor = None
+        try:
+            self._round_trip()
+            cursor = conn.execute(_translate(sql), params or ())
+            with self._stats_lock:
+                self._stats['queries'] += 1
+
+            names = [col[0].upper() for col in cursor.description]
+            if columns:
+                wanted = [name.upper() for name in columns]
+                unknown = [name for name in wanted if name not in names]
+                if unknown:
+                    raise ValueError(f'查询结果中没有列: {", ".join(unknown)}')
+                indexes = [names.index(name) for name in wanted]
+                names = wanted
+            else:
+                indexes = None
+
+            # execute 的响应带回 prefetchrows 行，之后每 arraysize 行一次往返
+            fetched, available = 0, prefetchrows
+            while True:
+                if fetched >= available:
+                    self._round_trip()
+                    available += arraysize
+                rows = cursor.fetchmany(available - fetched)
+                if not rows:
+                    break
+                fetched += len(rows)
+                with self._stats_lock:
+                    self._stats['rows'] += len(rows)
+                for row in rows:
+                    if indexes is not None:
+                        row = tuple(row[i] for i in indexes)
+                    yield dict(zip(names, row)) if as_dict else row
+
+        finally:
+            if cursor:
+                cursor.close()
+            self._release()
+
+    def execute_many(self, sql, rows):
+        """
+        数组DML（同 OraclePool.execute_many）：整批一次往返、一个事务，单行出错不影响其他行
+
+        Returns:
+            dict: {'rowcounts': [每行影响的行数], 'errors': {行号: 错误信息}, 'retryable': bool}
+        """
+        conn = None
+        try:
+            conn = self._acquire()
+            sql = _translate(sql)
+            self._round_trip()
+            rowcounts, errors = [], {}
+            for offset, params in enumerate(rows):
+                try:
+                    rowcounts.append(conn.execute(sql, params).rowcount)
+                except sqlite3.Error as e:
+                    rowcounts.append(0)
+                    errors[offset] = str(e)
+            self._round_trip()
+            conn.commit()
+            with self._stats_lock:
+                self._stats['updates'] += 1
+            return {'rowcounts': rowcounts, 'errors': errors, 'retryable': False}
+
+        except DatabaseUnavailable as e:
+            logger.warning(str(e))
+            conn = None
+            return {'rowcounts': [0] * len(rows), 'errors': dict.fromkeys(range(len(rows)), str(e)), 'retryable': True}
+
+        except Exception as e:
+            logger.error(f'SQL批量更新失败: {str(e)}\nSQL: {sql}')
+            if conn is not None:
+                conn.rollback()
+            # 库被锁等 OperationalError 相当于Oracle的连接类错误，可重试
+            return {'rowcounts': [0] * len(rows), 'errors': dict.fromkeys(range(len(rows)), str(e)),
+                    'retryable': isinstance(e, sqlite3.OperationalError)}
+
+        finally:
+            if conn is not None:
+                self._release()
+
+    def execute_update(self, sql, params=None):
+        """执行更新SQL并提交，返回影响行数，失败返回0（同 OraclePool.execute_update）"""
+        conn = None
+        try:
+            conn = self._acquire()
+            self._round_trip()
+            cursor = conn.execute(_translate(sql), params or ())
+            self._round_trip()
+            conn.commit()
+            with self._stats_lock:
+                self._stats['updates'] += 1
+            return cursor.rowcount
+
+        except DatabaseUnavailable as e:
+            logger.warning(str(e))
+            conn = None
+            return 0
+
+        except Exception as e:
+            logger.error(f'SQL更新失败: {str(e)}\nSQL: {sql}')
+            conn.rollback()
+            return 0
+
+        finally:
+            if conn is not None:
+                self._release()
+
+
+def _synthetic_row(rng, item_id, org, item):
+    """一行合成的物料主数据"""
+    item_type = rng.choice(('FG', 'FG', 'RM', 'RM', 'PK', 'SA'))
+    created = f'{rng.randint(2015, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 08:00:00'
+    updated = f'{rng.randint(2024, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00'
+    return (
+        item_id, org, item,
+        f'{rng.choice(("Vitamin", "Protein", "Fish Oil", "Probiotic", "Label", "Bottle", "Carton"))} '
+        f'{rng.choice(("Tablet", "Softgel", "Powder", "Capsule", "Gummy", "Pack"))} {item_id}',
+        rng.choice(('EA', 'EA', 'CS', 'KG', 'LB', 'GAL')),
+        item_type,
+        rng.choice(('Active',) * 8 + ('Inactive', 'Obsolete', 'Hold')),
+        round(rng.uniform(0.05, 250.0), 2),
+        'Y' if item_type in ('RM', 'PK') else rng.choice(('Y', 'N')),
+        'Y' if item_type == 'FG' else 'N',
+        'Y',
+        rng.randint(1000, 1200),
+        rng.choice((7, 14, 21, 28, 35, 45, 60)),
+        rng.choice((0, 1, 10, 100, 500, 1000)),
+        0,
+        rng.choice((0, 1, 12, 24, 48)),
+        '', '',
+        created, updated,
+    )
+
+
+# 当前物料主数据后端（默认 EBS Oracle）
+_backend = OraclePool
+_backend_name = 'oracle'
+
+
+def init_item_master(app):
+    """按 ITEM_MASTER_BACKEND 选择并初始化物料主数据后端（应用启动时调用）"""
+    global _backend, _backend_name
+    name = app.config.get('ITEM_MASTER_BACKEND', 'oracle')
+    if name == 'oracle':
+        OraclePool.init_app(app)
+        backend = OraclePool
+    elif name == 'sqlite':
+        backend = SQLiteItemMaster.from_config(app.config)
+        logger.info(f'物料主数据使用SQLite替身: {backend.path}（注入延迟 {backend.latency_ms}ms）')
+    else:
+        raise ValueError(f'未知的物料主数据后端: {name}（可选 oracle / sqlite）')
+    _backend, _backend_name = backend, name
+
+
+def get_item_master():
+    """当前物料主数据后端（OraclePool 或 SQLiteItemMaster，接口相同）"""
+    return _backend
+
+
+def item_master_stats():
+    """后端指标（供 /api/metrics 使用）"""
+    return {'backend': _backend_name, **_backend.stats()}
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSON文件存储 - 读取与原子写入
+"""
+import json
+import os
+import tempfile
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows 本地开发：只有进程内的线程锁
+    fcntl = None
+
+
+def load_json(path, default=None):
+    """读取JSON文件，不存在时返回default（默认空列表）"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return [] if default is None else default
+
+
+def save_json(path, data):
+    """
+    原子写入JSON文件
+
+    先写入同目录下的临时文件再 os.replace，进程中途退出时不会留下半截文件。
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class _FileLock:
+    """
+    可重入的读-改-写锁：进程内线程锁 + 跨进程文件锁（<文件名>.lock 上的 flock）
+
+    同一线程嵌套获取时只在最外层加/解文件锁。没有 fcntl 的平台只有进程内互斥。
+    """
+
+    def __init__(self, path):
+        self.lock_path = path + '.lock'
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+                    self._file = open(self.lock_path, 'a')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        try:
+            if self._depth == 0 and fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def lock_for(path):
+    """
+    文件的读-改-写锁（可重入，跨线程、跨进程）
+
+    load_json → 修改 → save_json 期间持有，避免并发的两次读-改-写互相覆盖；
+    gunicorn 多 worker 各自的回写线程和请求处理共用同一把文件锁。
+    """
+    key = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = _FileLock(key)
+        return lock
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming record reader for bulk loads.
+
+Reads either a JSON array (sp_mdm_all.json as exported from the SharePoint
+REST API) or NDJSON (one object per line) without materializing the whole
+file, so memory stays flat regardless of export size.
+"""
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+def iter_records(path, chunk_size=1 << 16):
+    """
+    Yield records one at a time from a JSON array or NDJSON file.
+
+    The format is detected from the first non-whitespace character:
+    ``[`` means a JSON array, anything else is treated as NDJSON.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        head = f.read(chunk_size)
+        stripped = head.lstrip(_WHITESPACE)
+        while head and not stripped:
+            head = f.read(chunk_size)
+            stripped = head.lstrip(_WHITESPACE)
+        if stripped.startswith('['):
+            yield from _iter_array(f, stripped[1:], chunk_size)
+        else:
+            yield from _iter_lines(f, head)
+
+
+def _iter_lines(f, head):
+    """NDJSON: one JSON object per non-blank line."""
+    buf = ''
+    chunk = head
+    while chunk:
+        *lines, buf = (buf + chunk).split('\n')
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+        chunk = f.read(1 << 16)
+    if buf.strip():
+        yield json.loads(buf)
+
+
+def _iter_array(f, buf, chunk_size):
+    """JSON array: decode elements incrementally with raw_decode."""
+    eof = False
+    pos = 0
+    while True:
+        # Skip separators between elements
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE + ',':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = buf[pos:] + f.read(chunk_size), 0
+            eof = pos == len(buf)
+
+        if pos >= len(buf):
+            raise ValueError('Unterminated JSON array')
+        if buf[pos] == ']':
+            return
+
+        try:
+            obj, end = _decoder.raw_decode(buf, pos)
+            # A scalar ending exactly at the buffer edge may be truncated
+            if end == len(buf) and not eof:
+                raise ValueError('need more data')
+        except ValueError:
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            continue
+
+        yield obj
+        pos = end
+        # Keep the buffer from growing with already-consumed text
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
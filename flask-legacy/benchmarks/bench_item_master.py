@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Item-path benchmark against the SQLite item-master stand-in.
+
+Points ebs_service at a local mtl_system_items_b (app/utils/item_master.py)
+with injected per-round-trip latency, then measures the item lookup path the
+way /api/item and /api/item/batch exercise it:
+
+  - single lookups, cache bypassed (every call reaches the database)
+  - single lookups, warm item cache
+  - single lookups from --clients concurrent threads (pool contention:
+    --pool-max connections, acquire wait reported)
+  - one query_items_batch call for --batch items vs the same items one by one
+  - approval writeback of --batch items: update_ebs_item per item vs one
+    update_ebs_items call (executemany per field)
+
+Each scenario prints latency percentiles, throughput and database round trips,
+so cache, batching and pool settings can be compared without Oracle.
+
+Usage:
+    python benchmarks/bench_item_master.py [--latency-ms 2] [--jitter-ms 1] [--lookups 200]
+        [--clients 16] [--pool-max 10] [--batch 1000] [--db PATH] [--seed-items 20000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+
+from app.config import get_config  # noqa: E402
+from app.services import ebs_service  # noqa: E402
+from app.utils.item_master import MASTER_ORG, get_item_master, init_item_master  # noqa: E402
+from app.utils.logger import logger  # noqa: E402
+
+
+def build_app(args):
+    app = Flask(__name__)
+    app.config.from_object(get_config('development'))
+    app.config.update(
+        ITEM_MASTER_BACKEND='sqlite',
+        ITEM_MASTER_SQLITE_FILE=args.db,
+        ITEM_MASTER_SEED_ITEMS=args.seed_items,
+        ITEM_MASTER_LATENCY_MS=args.latency_ms,
+        ITEM_MASTER_JITTER_MS=args.jitter_ms,
+        DB_POOL_MAX=args.pool_max,
+    )
+    init_item_master(app)
+    ebs_service.configure_item_cache(max(app.config['ITEM_CACHE_SIZE'], args.batch),
+                                     app.config['ITEM_CACHE_EBS_TTL'], app.config['ITEM_CACHE_PLM_TTL'])
+    ebs_service.configure_item_fanout(app.config['ITEM_FANOUT_WORKERS'], app.config['ITEM_EBS_TIMEOUT'],
+                                      app.config['ITEM_PLM_TIMEOUT'])
+    return app
+
+
+def report(label, latencies, elapsed, round_trips):
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    print(f"  {label:<28} p50 {pct(0.5):7.2f}ms  p95 {pct(0.95):7.2f}ms  "
+          f"{len(latencies) / elapsed:>9,.0f} lookups/s  {round_trips:>6} round trips")
+
+
+def run(label, fn, items, clients=1):
+    """Time fn(item) for every item, optionally from several threads."""
+    master = get_item_master()
+    before = master.stats()['round_trips']
+    latencies = []
+
+    def one(item):
+        started = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    if clients > 1:
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            list(pool.map(one, items))
+    else:
+        for item in items:
+            one(item)
+    report(label, latencies, time.perf_counter() - started, master.stats()['round_trips'] - before)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'bench_item_master.sqlite3'),
+                   help='stand-in database (seeded on first use; delete it to reseed)')
+    p.add_argument('--seed-items', type=int, default=20000)
+    p.add_argument('--latency-ms', type=float, default=2.0, help='injected latency per round trip')
+    p.add_argument('--jitter-ms', type=float, default=1.0)
+    p.add_argument('--lookups', type=int, default=200)
+    p.add_argument('--clients', type=int, default=16)
+    p.add_argument('--pool-max', type=int, default=10)
+    p.add_argument('--batch', type=int, default=1000)
+    args = p.parse_args(argv)
+
+    logger.setLevel(logging.WARNING)  # services log every lookup
+    app = build_app(args)
+    master = get_item_master()
+    items = [row['SEGMENT1'] for row in master.execute_query(
+        'SELECT segment1 FROM mtl_system_items_b WHERE organization_id = :org', {'org': MASTER_ORG})]
+    rng = random.Random(0)
+    sample = rng.sample(items, min(args.lookups, len(items)))
+    batch = rng.sample(items, min(args.batch, len(items)))
+    print(f"Stand-in {args.db}: {len(items)} items, {args.latency_ms}ms + 0-{args.jitter_ms}ms per round trip, "
+          f"pool max {args.pool_max}")
+
+    with app.app_context():
+        run('single, cache bypassed', lambda i: ebs_service.query_item_info(i, use_cache=False), sample)
+        run('single, warm cache', ebs_service.query_item_info, sample)
+        run(f'single, {args.clients} clients', lambda i: ebs_service.query_item_info(i, use_cache=False),
+            sample, clients=args.clients)
+
+        print(f"\nBatch of {len(batch)} items (cache bypassed):")
+        run('one by one', lambda i: ebs_service.query_item_info(i, use_cache=False), batch)
+        before = master.stats()['round_trips']
+        started = time.perf_counter()
+        result = ebs_service.query_items_batch(batch, use_cache=False)
+        elapsed = time.perf_counter() - started
+        found = sum(1 for r in result.values() if r['ebs_found'])
+        print(f"  {'query_items_batch':<28} {elapsed * 1000:9.1f}ms total  {found} found  "
+              f"{master.stats()['round_trips'] - before:>6} round trips")
+
+        print(f"\nWriteback of {len(batch)} items:")
+        run('update_ebs_item per item', lambda i: ebs_service.update_ebs_item(i, 'lead_time', '21'), batch)
+        before = master.stats()['round_trips']
+        started = time.perf_counter()
+        result = ebs_service.update_ebs_items([(i, 'lead_time', '28') for i in batch])
+        elapsed = time.perf_counter() - started
+        print(f"  {'update_ebs_items':<28} {elapsed * 1000:9.1f}ms total  {result['updated']} updated  "
+              f"{master.stats()['round_trips'] - before:>6} round trips")
+
+    stats = master.stats()
+    print(f"\nPool: {stats['acquires']} acquires, avg wait {stats['acquire_wait_avg_ms']}ms, "
+          f"max wait {stats['acquire_wait_max_ms']}ms, {stats['acquire_timeouts']} timeouts")
+
+
+if __name__ == '__main__':
+    main()
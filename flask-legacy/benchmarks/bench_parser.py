@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parse-throughput benchmark for mdm_parser.
+
+Runs parse_request over every title/instructions pair in change_requests.json
+and sample_requests/, repeated --rounds times, and prints records/sec for the
+whole parse (uncached, cold cache, warm cache) and for each stage (rule
+detection, item extraction, values).
+
+Usage:
+    python benchmarks/bench_parser.py [--rounds 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import mdm_parser  # noqa: E402
+from app.services.keyword_engine import dictionary_keywords  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT, 'app', 'data')
+
+
+def load_corpus():
+    """(title, instructions, request_type) from the request store and SharePoint samples."""
+    with open(os.path.join(DATA_DIR, 'change_requests.json'), encoding='utf-8') as f:
+        corpus = [(r.get('source_title', ''), r.get('instructions', ''), r.get('change_type', ''))
+                  for r in json.load(f)]
+    with open(os.path.join(DATA_DIR, 'sample_requests', 'sharepoint_mdm_requests.json'), encoding='utf-8') as f:
+        corpus += [(r.get('title', ''), r.get('instructions', ''), r.get('type', '')) for r in json.load(f)]
+    return corpus
+
+
+def timed(fn, args_list, rounds):
+    """Best-of-rounds records/sec for fn(*args) over args_list."""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for args in args_list:
+            fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return len(args_list) / best
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--rounds', type=int, default=5)
+    args = p.parse_args(argv)
+
+    dictionary_keywords.load_file(os.path.join(DATA_DIR, 'field_dictionary.json'))
+    corpus = load_corpus()
+    texts = [(f"{t} {i}".strip(),) for t, i, _ in corpus]
+    fields = [(text, mdm_parser._detect_field(text, rt)[0]) for (text,), (_, _, rt) in zip(texts, corpus)]
+
+    print(f"Corpus: {len(corpus)} records, avg {sum(len(t) for t, in texts) / len(texts):.0f} chars")
+    print(f"  parse (uncached)  {timed(mdm_parser._parse_uncached, corpus, args.rounds):>10,.0f} rec/s")
+    mdm_parser._parse_cache.clear()
+    print(f"  parse_request     {timed(mdm_parser.parse_request, corpus, 1):>10,.0f} rec/s  (cold cache)")
+    print(f"  parse_request     {timed(mdm_parser.parse_request, corpus, args.rounds):>10,.0f} rec/s  (warm cache)")
+    print(f"  rule detection    {timed(mdm_parser._first_rule, texts, args.rounds):>10,.0f} rec/s")
+    print(f"  item extraction   {timed(mdm_parser._extract_items, texts, args.rounds):>10,.0f} rec/s")
+    print(f"  value extraction  {timed(mdm_parser._extract_values, fields, args.rounds):>10,.0f} rec/s")
+
+
+if __name__ == '__main__':
+    main()
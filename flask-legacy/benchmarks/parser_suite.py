@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parser benchmark and accuracy suite for mdm_parser and ai_parser._parse_with_rules.
+
+Golden corpus: every record in change_requests.json supplies its inputs
+(source_title / instructions / change_type) and the field / items / orgs the
+parser stored at ingest time. sample_requests/sharepoint_mdm_requests.json rows
+are joined to the store by title; rows that aren't in the store only count
+towards throughput. --save-golden snapshots the current parser output so a later
+run with --golden can flag regressions against it.
+
+Reports, per parser:
+  - records/sec and p50/p99 per-record latency
+  - field / items / orgs agreement rate against the golden output
+  - throughput as the corpus is scaled synthetically (default up to 1M records,
+    streamed, with fresh item codes so the parse cache can't help) and as
+    single texts grow longer — a falling rate flags super-linear behaviour.
+
+Usage:
+    python benchmarks/parser_suite.py [--scale 1000000] [--golden FILE] [--save-golden FILE] [--skip-scale]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.services import mdm_parser  # noqa: E402
+from app.services.ai_parser import _parse_with_rules  # noqa: E402
+from app.services.keyword_engine import dictionary_keywords  # noqa: E402
+from app.utils.logger import logger  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT, 'app', 'data')
+ITEM_CODE = re.compile(r'\b([A-Z]{2,4})(\d{5,7})\b')
+
+
+def _load(name):
+    with open(os.path.join(DATA_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_golden():
+    """[{'title', 'instructions', 'request_type', 'golden': {field, items, orgs} | None}]"""
+    corpus = []
+    by_title = {}
+    for r in _load('change_requests.json'):
+        entry = {
+            'title': r.get('source_title', ''),
+            'instructions': r.get('instructions', ''),
+            'request_type': r.get('change_type', ''),
+            'golden': {'field': r.get('field'), 'items': r.get('items', []), 'orgs': r.get('orgs', [])},
+        }
+        corpus.append(entry)
+        by_title.setdefault(entry['title'], entry)
+    for r in _load(os.path.join('sample_requests', 'sharepoint_mdm_requests.json')):
+        title = r.get('title', '').strip()
+        stored = by_title.get(title)
+        corpus.append({
+            'title': title,
+            'instructions': r.get('instructions', ''),
+            'request_type': r.get('type', ''),
+            'golden': stored['golden'] if stored else None,
+        })
+    return corpus
+
+
+def _mdm(entry):
+    result = mdm_parser._parse_uncached(entry['title'], entry['instructions'], entry['request_type'])
+    return {'field': result['field'], 'items': result['items'], 'orgs': result['orgs']}
+
+
+def _ai_rules(entry):
+    changes = _parse_with_rules(f"{entry['title']}\n{entry['instructions']}")['changes']
+    first = changes[0] if changes else {}
+    return {
+        'field': first.get('field', ''),
+        'items': [c['item'] for c in changes if c.get('item')],
+        'orgs': sorted({c['org'] for c in changes if c.get('org')}),
+    }
+
+
+PARSERS = {
+    'mdm_parser.parse_request': _mdm,
+    'ai_parser._parse_with_rules': _ai_rules,
+}
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def run_corpus(parse, corpus):
+    """Time every record individually; returns (outputs, rec/s, p50 µs, p99 µs)."""
+    outputs = []
+    latencies = []
+    clock = time.perf_counter_ns
+    started = clock()
+    for entry in corpus:
+        t0 = clock()
+        outputs.append(parse(entry))
+        latencies.append(clock() - t0)
+    elapsed = (clock() - started) / 1e9
+    latencies.sort()
+    return outputs, len(corpus) / elapsed, _percentile(latencies, 50) / 1e3, _percentile(latencies, 99) / 1e3
+
+
+def agreement(outputs, golden):
+    """Share of records whose field / items / orgs match the golden output."""
+    pairs = [(o, g) for o, g in zip(outputs, golden) if g is not None]
+    if not pairs:
+        return {}
+    n = len(pairs)
+    return {
+        'records': n,
+        'field': sum(o['field'] == g['field'] for o, g in pairs) / n,
+        'items': sum(o['items'] == g['items'] for o, g in pairs) / n,
+        'orgs': sum(sorted(o['orgs']) == sorted(g['orgs']) for o, g in pairs) / n,
+    }
+
+
+def synthetic(corpus, n, seed=7):
+    """Stream n records derived from the corpus with fresh item codes (defeats the parse cache)."""
+    rng = random.Random(seed)
+
+    def fresh(m):
+        return f"{m.group(1)}{rng.randrange(10 ** (len(m.group(2)) - 1), 10 ** len(m.group(2)))}"
+
+    for i in range(n):
+        entry = corpus[i % len(corpus)]
+        yield {
+            'title': ITEM_CODE.sub(fresh, entry['title']),
+            'instructions': ITEM_CODE.sub(fresh, entry['instructions']),
+            'request_type': entry['request_type'],
+        }
+
+
+def run_scale(parse, corpus, max_records):
+    """Throughput at growing corpus sizes (10k, 100k, ... up to max_records)."""
+    rows = []
+    size = min(10_000, max_records)
+    while True:
+        started = time.perf_counter()
+        for entry in synthetic(corpus, size):
+            parse(entry)
+        elapsed = time.perf_counter() - started
+        rows.append((size, size / elapsed))
+        if size >= max_records:
+            return rows
+        size = min(size * 10, max_records)
+
+
+def run_length(parse, corpus, factors=(1, 4, 16, 64), sample=200):
+    """µs per 1k chars as single texts grow — roughly constant means linear in text length."""
+    rows = []
+    base = corpus[:sample]
+    for k in factors:
+        entries = [{'title': e['title'], 'instructions': ' '.join([e['instructions']] * k),
+                    'request_type': e['request_type']} for e in base]
+        chars = sum(len(e['title']) + len(e['instructions']) for e in entries)
+        started = time.perf_counter()
+        for e in entries:
+            parse(e)
+        rows.append((k, (time.perf_counter() - started) * 1e6 / (chars / 1000)))
+    return rows
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Parser benchmark and accuracy suite.')
+    p.add_argument('--scale', type=int, default=1_000_000, help='largest synthetic corpus size')
+    p.add_argument('--skip-scale', action='store_true', help='skip the synthetic scaling runs')
+    p.add_argument('--golden', help='compare against a snapshot written by --save-golden instead of the store')
+    p.add_argument('--save-golden', help='write current mdm_parser output as a golden snapshot')
+    p.add_argument('--parser', choices=sorted(PARSERS), action='append', help='limit to these parsers')
+    args = p.parse_args(argv)
+
+    logger.setLevel(logging.WARNING)  # _parse_with_rules logs every call
+    dictionary_keywords.load_file(os.path.join(DATA_DIR, 'field_dictionary.json'))
+
+    corpus = build_golden()
+    if args.golden:
+        with open(args.golden, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        for entry, golden in zip(corpus, snapshot):
+            entry['golden'] = golden
+    golden = [e['golden'] for e in corpus]
+    print(f"Golden corpus: {len(corpus)} records ({sum(g is not None for g in golden)} with golden output), "
+          f"parser version {mdm_parser.parser_version()}")
+
+    for name in args.parser or PARSERS:
+        parse = PARSERS[name]
+        outputs, rate, p50, p99 = run_corpus(parse, corpus)
+        print(f"\n== {name}")
+        print(f"  throughput   {rate:>12,.0f} rec/s   p50 {p50:8.1f} µs   p99 {p99:8.1f} µs")
+        agree = agreement(outputs, golden)
+        if agree:
+            print(f"  agreement    field {agree['field']:.1%}   items {agree['items']:.1%}   "
+                  f"orgs {agree['orgs']:.1%}   ({agree['records']} records)")
+
+        if args.save_golden and name == 'mdm_parser.parse_request':
+            with open(args.save_golden, 'w', encoding='utf-8') as f:
+                json.dump(outputs, f, ensure_ascii=False)
+            print(f"  golden snapshot written to {args.save_golden}")
+
+        for k, us in run_length(parse, corpus):
+            print(f"  text x{k:<3}     {us:>12,.1f} µs / 1k chars")
+
+        if not args.skip_scale:
+            rows = run_scale(parse, corpus, args.scale)
+            for size, size_rate in rows:
+                print(f"  scale {size:>9,}  {size_rate:>12,.0f} rec/s")
+            if rows[-1][1] < 0.7 * rows[0][1]:
+                print(f"  WARNING: throughput fell {1 - rows[-1][1] / rows[0][1]:.0%} from "
+                      f"{rows[0][0]:,} to {rows[-1][0]:,} records — super-linear behaviour")
+
+
+if __name__ == '__main__':
+    main()
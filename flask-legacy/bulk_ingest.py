@@ -1,51 +1,171 @@
 """
-Bulk ingest: reads sp_mdm_all.json (downloaded from SharePoint API) and POSTs to OpenAssist ingest API.
+Bulk ingest: streams sp_mdm_all.json (downloaded from SharePoint API) and POSTs it to the OpenAssist ingest API.
+
+Batches are sent concurrently over one keep-alive session with a bounded number
+of requests in flight. The batch size adapts to server latency (grows while the
+server answers well under --target-latency, halves when it goes over), and
+failed batches are retried with exponential backoff. Retries are safe because
+the ingest API deduplicates by title.
+
+Usage:
+    python bulk_ingest.py [sp_mdm_all.json|export.ndjson] [--url URL] [--workers 4] [--batch-size 200]
 """
-import json, requests, sys, os
-
-INPUT = os.path.join(os.path.dirname(__file__), "sp_mdm_all.json")
-API_URL = "http://127.0.0.1:5001/api/mdm/ingest"
-API_KEY = "openassist-ingest-2026"
-BATCH = 200
-
-if not os.path.exists(INPUT):
-    print(f"ERROR: {INPUT} not found"); sys.exit(1)
-
-with open(INPUT, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-print(f"Loaded {len(data)} records from {INPUT}")
-
-total_new = 0
-total_dup = 0
-total_err = 0
-
-for i in range(0, len(data), BATCH):
-    batch = data[i:i+BATCH]
-    payload = {
-        "api_key": API_KEY,
-        "requests": [{
-            "title": r.get("title", ""),
-            "urgency": r.get("urgency", ""),
-            "status": r.get("status", ""),
-            "requestor": r.get("requestor", ""),
-            "date_requested": r.get("date_requested", ""),
-            "type": r.get("type", ""),
-            "requested_completion": r.get("requested_completion", ""),
-            "instructions": r.get("instructions", ""),
-            "assigned_to": r.get("assigned_to", ""),
-        } for r in batch]
-    }
-    try:
-        resp = requests.post(API_URL, json=payload, timeout=30)
-        result = resp.json()
-        new = result.get("new_count", 0)
-        dup = result.get("duplicate_count", 0)
-        total_new += new
-        total_dup += dup
-        print(f"  Batch {i//BATCH+1}: {len(batch)} sent, {new} new, {dup} dup")
-    except Exception as e:
-        total_err += len(batch)
-        print(f"  Batch {i//BATCH+1}: ERROR - {e}")
-
-print(f"\nDone! New: {total_new}, Duplicates: {total_dup}, Errors: {total_err}")
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.record_stream import iter_records
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "sp_mdm_all.json")
+DEFAULT_URL = "http://127.0.0.1:5001/api/mdm/ingest"
+DEFAULT_API_KEY = os.getenv("INGEST_API_KEY", "openassist-ingest-2026")
+
+FIELDS = ("title", "urgency", "status", "requestor", "date_requested", "type",
+          "requested_completion", "instructions", "assigned_to")
+
+# Status codes worth retrying; anything else (401 bad key, 400 bad payload) fails fast
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class BatchError(Exception):
+    """A batch that failed after all retries (or with a non-retryable status)."""
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Stream SharePoint MDM records into the OpenAssist ingest API.")
+    p.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="JSON array or NDJSON file")
+    p.add_argument("--url", default=DEFAULT_URL, help="ingest endpoint")
+    p.add_argument("--api-key", default=DEFAULT_API_KEY)
+    p.add_argument("--workers", type=int, default=4, help="max batches in flight")
+    p.add_argument("--batch-size", type=int, default=200, help="initial batch size")
+    p.add_argument("--min-batch", type=int, default=25)
+    p.add_argument("--max-batch", type=int, default=1000)
+    p.add_argument("--target-latency", type=float, default=2.0, help="seconds per batch to aim for")
+    p.add_argument("--retries", type=int, default=4)
+    p.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    return p.parse_args(argv)
+
+
+def make_session(workers):
+    """One keep-alive session whose connection pool matches the number of in-flight batches."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def to_payload_record(r):
+    return {k: r.get(k, "") for k in FIELDS}
+
+
+def post_batch(session, args, batch):
+    """POST one batch with retry + exponential backoff. Returns (response_json, latency, attempts)."""
+    payload = {"api_key": args.api_key, "requests": batch}
+    for attempt in range(1, args.retries + 2):
+        started = time.perf_counter()
+        try:
+            resp = session.post(args.url, json=payload, timeout=args.timeout)
+            latency = time.perf_counter() - started
+            if resp.status_code == 200:
+                return resp.json(), latency, attempt
+            if resp.status_code not in RETRY_STATUS:
+                raise BatchError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+            error = f"HTTP {resp.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if attempt > args.retries:
+            raise BatchError(f"gave up after {attempt} attempts ({error})")
+        delay = min(30.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        print(f"    retry {attempt}/{args.retries} in {delay:.1f}s ({error})")
+        time.sleep(delay)
+
+
+class BatchSizer:
+    """Adapts batch size to observed latency: additive growth, multiplicative back-off."""
+
+    def __init__(self, initial, lo, hi, target):
+        self.size = max(lo, min(hi, initial))
+        self.lo, self.hi, self.target = lo, hi, target
+
+    def observe(self, latency):
+        if latency > self.target:
+            self.size = max(self.lo, self.size // 2)
+        elif latency < self.target / 2:
+            self.size = min(self.hi, self.size + max(1, self.size // 4))
+
+
+def iter_batches(records, sizer):
+    batch = []
+    for r in records:
+        batch.append(to_payload_record(r))
+        if len(batch) >= sizer.size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f"ERROR: {args.input} not found")
+        return 1
+
+    sizer = BatchSizer(args.batch_size, args.min_batch, args.max_batch, args.target_latency)
+    session = make_session(args.workers)
+    totals = {"sent": 0, "added": 0, "dup": 0, "err": 0, "batches": 0}
+    server_total = None
+    started = time.perf_counter()
+
+    def handle(done):
+        nonlocal server_total
+        for fut in done:
+            no, size = in_flight.pop(fut)
+            try:
+                result, latency, attempts = fut.result()
+            except Exception as e:
+                totals["err"] += size
+                print(f"  Batch {no}: {size} sent, ERROR - {e}")
+                continue
+            added = result.get("added", 0)
+            server_total = result.get("total", server_total)
+            totals["added"] += added
+            totals["dup"] += size - added
+            sizer.observe(latency)
+            retry_note = f", {attempts} attempts" if attempts > 1 else ""
+            print(f"  Batch {no}: {size} sent, {added} new, {size - added} dup, "
+                  f"{latency * 1000:.0f} ms ({size / latency:.0f} rec/s{retry_note}), next size {sizer.size}")
+
+    print(f"Streaming {args.input} → {args.url} ({args.workers} in flight, batch {sizer.size})")
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for batch in iter_batches(iter_records(args.input), sizer):
+            if len(in_flight) >= args.workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                handle(done)
+            totals["batches"] += 1
+            totals["sent"] += len(batch)
+            in_flight[pool.submit(post_batch, session, args, batch)] = (totals["batches"], len(batch))
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            handle(done)
+
+    elapsed = time.perf_counter() - started
+    rate = totals["sent"] / elapsed if elapsed else 0.0
+    print(f"\nDone! Sent: {totals['sent']} in {totals['batches']} batches, New: {totals['added']}, "
+          f"Duplicates: {totals['dup']}, Errors: {totals['err']}")
+    print(f"Elapsed {elapsed:.1f}s, {rate:.0f} records/s"
+          + (f", server now holds {server_total} requests" if server_total is not None else ""))
+    return 1 if totals["err"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
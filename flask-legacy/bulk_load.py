@@ -0,0 +1,85 @@
+"""
+Offline bulk loader: streams sp_mdm_all.json (or NDJSON) straight into the change-request store, bypassing HTTP.
+
+Uses the same parsing and record-building code as POST /api/mdm/ingest
+(app/services/mdm_ingest.py), deduplicates by title against the existing
+store, and writes the store once at the end with a single atomic replace.
+Intended for initial loads and disaster recovery — stop the web server first,
+otherwise its next write will overwrite the loaded data.
+
+Usage:
+    python bulk_load.py [sp_mdm_all.json|export.ndjson] [--store app/data/change_requests.json] [--dry-run]
+"""
+import argparse
+import os
+import sys
+import time
+
+from app.config import get_config
+from app.services.keyword_engine import dictionary_keywords
+from app.services.mdm_ingest import ingest_records
+from app.utils.json_store import load_json, save_json
+from app.utils.record_stream import iter_records
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(__file__), "sp_mdm_all.json")
+
+
+def parse_args(argv=None):
+    config = get_config(os.getenv("FLASK_ENV", "development"))
+    p = argparse.ArgumentParser(description="Load SharePoint MDM records directly into the OpenAssist store.")
+    p.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="JSON array or NDJSON file")
+    p.add_argument("--store", default=config.REQUESTS_FILE, help="change_requests.json to load into")
+    p.add_argument("--dictionary", default=config.DICTIONARY_FILE, help="field dictionary used by the parser")
+    p.add_argument("--created-by", default="bulk-loader", help="value for the created_by field")
+    p.add_argument("--dry-run", action="store_true", help="parse and dedupe, but don't write the store")
+    p.add_argument("--progress", type=int, default=10000, help="print progress every N rows (0 = off)")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f"ERROR: {args.input} not found")
+        return 1
+
+    # Same dictionary keywords as the running app
+    dictionary_keywords.load_file(args.dictionary)
+
+    started = time.perf_counter()
+    requests_list = load_json(args.store)
+    before = len(requests_list)
+    print(f"Store {args.store}: {before} existing requests ({time.perf_counter() - started:.2f}s to load)")
+
+    rows = 0
+
+    def counted(records):
+        nonlocal rows
+        for r in records:
+            rows += 1
+            if args.progress and rows % args.progress == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  {rows} rows read, {len(requests_list) - before} new, {rows / elapsed:.0f} rows/s")
+            yield r
+
+    parse_started = time.perf_counter()
+    added = ingest_records(requests_list, counted(iter_records(args.input)), created_by=args.created_by)
+    parse_elapsed = time.perf_counter() - parse_started
+
+    if args.dry_run:
+        print("Dry run — store not written")
+    elif added:
+        write_started = time.perf_counter()
+        save_json(args.store, requests_list)
+        print(f"Wrote {len(requests_list)} requests in {time.perf_counter() - write_started:.2f}s")
+    else:
+        print("Nothing new — store not written")
+
+    elapsed = time.perf_counter() - started
+    print(f"\nDone! Rows: {rows}, New: {added}, Duplicates/skipped: {rows - added}, Total: {len(requests_list)}")
+    print(f"Parse+dedupe {rows / parse_elapsed if parse_elapsed else 0:.0f} rows/s, "
+          f"end-to-end {rows / elapsed if elapsed else 0:.0f} rows/s ({elapsed:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Re-parse backfill: refreshes parser-derived fields on stored requests after mdm_parser rules change.
+
+Every record carries a `parser_version` stamp (mdm_parser.parser_version():
+built-in rules fingerprint + field dictionary version). This tool re-parses
+only the records whose stamp differs from the current version, fans the work
+out over a process pool, and writes all changes back with one atomic store
+write. Records edited by hand (updated_at set) keep their values unless
+--include-edited is given.
+
+Progress is appended to a checkpoint file next to the store, so an interrupted
+run resumes where it stopped; the checkpoint is removed after the final write.
+
+Usage:
+    python reparse.py [--store app/data/change_requests.json] [--workers N] [--dry-run] [--include-edited]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import get_config
+from app.services.keyword_engine import dictionary_keywords
+from app.services.mdm_ingest import parsed_fields
+from app.services.mdm_parser import parser_version
+from app.utils.json_store import load_json, save_json
+
+# Fields the backfill may rewrite (everything parsed_fields derives)
+DERIVED = ("items", "item", "orgs", "org", "category", "field", "old_value", "new_value", "system")
+
+
+def parse_args(argv=None):
+    config = get_config(os.getenv("FLASK_ENV", "development"))
+    p = argparse.ArgumentParser(description="Re-parse stored requests stamped with an older parser version.")
+    p.add_argument("--store", default=config.REQUESTS_FILE)
+    p.add_argument("--dictionary", default=config.DICTIONARY_FILE)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    p.add_argument("--chunk-size", type=int, default=500, help="records per worker task / checkpoint flush")
+    p.add_argument("--include-edited", action="store_true", help="also re-parse records edited by hand")
+    p.add_argument("--dry-run", action="store_true", help="report the diff without writing the store")
+    return p.parse_args(argv)
+
+
+def _init_worker(dictionary_file):
+    """Worker processes need the same dictionary keywords as the parent."""
+    dictionary_keywords.load_file(dictionary_file)
+
+
+def _reparse_chunk(chunk):
+    """[(key, title, instructions, request_type)] → [(key, derived_fields)]"""
+    return [(key, parsed_fields(title, instructions, req_type)) for key, title, instructions, req_type in chunk]
+
+
+def _key(record):
+    # source_title is the ingest dedup key; request_id isn't unique in older data
+    return record.get("source_title", "")
+
+
+def _read_checkpoint(path, version):
+    """{key: derived_fields} from a previous interrupted run with the same parser version."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        header = f.readline()
+        if not header or json.loads(header).get("parser_version") != version:
+            print(f"Checkpoint {path} is for another parser version — starting over")
+            return done
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # torn last line from the interruption
+            done[entry["key"]] = entry["fields"]
+    return done
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    dictionary_keywords.load_file(args.dictionary)
+    version = parser_version()
+    checkpoint = args.store + ".reparse.ckpt"
+
+    records = load_json(args.store)
+    skipped_edited = 0
+    todo = []
+    for r in records:
+        if r.get("parser_version") == version:
+            continue
+        if r.get("updated_at") and not args.include_edited:
+            skipped_edited += 1
+            continue
+        todo.append(r)
+    print(f"Store {args.store}: {len(records)} records, {len(todo)} stamped with an older parser version "
+          f"(current {version}), {skipped_edited} hand-edited skipped")
+
+    results = _read_checkpoint(checkpoint, version)
+    if results:
+        print(f"Resuming from checkpoint: {len(results)} records already re-parsed")
+    pending = [(_key(r), r.get("source_title", ""), r.get("instructions", ""), r.get("change_type", ""))
+               for r in todo if _key(r) not in results]
+    chunks = [pending[i:i + args.chunk_size] for i in range(0, len(pending), args.chunk_size)]
+
+    started = time.perf_counter()
+    if chunks:
+        # Rewrite the checkpoint from what was recovered, dropping any torn last line
+        with open(checkpoint, "w", encoding="utf-8") as ckpt, \
+                ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                    initargs=(args.dictionary,)) as pool:
+            ckpt.write(json.dumps({"parser_version": version, "store": args.store}) + "\n")
+            for key, fields in results.items():
+                ckpt.write(json.dumps({"key": key, "fields": fields}, ensure_ascii=False) + "\n")
+            for n, chunk_result in enumerate(pool.map(_reparse_chunk, chunks), 1):
+                for key, fields in chunk_result:
+                    results[key] = fields
+                    ckpt.write(json.dumps({"key": key, "fields": fields}, ensure_ascii=False) + "\n")
+                ckpt.flush()
+                os.fsync(ckpt.fileno())
+                print(f"  chunk {n}/{len(chunks)}: {len(results)} re-parsed")
+    elapsed = time.perf_counter() - started
+    if pending:
+        print(f"Re-parsed {len(pending)} records in {elapsed:.1f}s ({len(pending) / elapsed:.0f} rec/s, "
+              f"{args.workers} workers)")
+
+    # Re-read the store right before writing so requests ingested meanwhile aren't lost
+    records = load_json(args.store)
+    changed_fields = Counter()
+    transitions = Counter()
+    changed = stamped = 0
+    for r in records:
+        fields = results.get(_key(r))
+        if fields is None or r.get("parser_version") == version:
+            continue
+        if r.get("updated_at") and not args.include_edited:
+            continue
+        diff = [k for k in DERIVED if r.get(k) != fields[k]]
+        if diff:
+            changed += 1
+            changed_fields.update(diff)
+            if "field" in diff:
+                transitions[(r.get("field"), fields["field"])] += 1
+        r.update(fields)
+        stamped += 1
+
+    print(f"\nDiff summary: {changed} of {stamped} re-parsed records changed")
+    for name, count in changed_fields.most_common():
+        print(f"  {name:<10} {count}")
+    if transitions:
+        print("  field transitions:")
+        for (old, new), count in transitions.most_common(15):
+            print(f"    {old} → {new}: {count}")
+
+    if args.dry_run:
+        print("Dry run — store not written (checkpoint kept for the real run)")
+        return 0
+    if stamped:
+        save_json(args.store, records)
+        print(f"Wrote {len(records)} records to {args.store}")
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
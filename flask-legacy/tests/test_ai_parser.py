@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+AI解析服务测试 - LLM结果缓存、批量并发解析（本地模拟模型服务）、流式解析、熔断
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask import Flask
+
+from app.services import ai_parser, llm_providers
+from app.services.llm_cache import LLMCache, make_key
+from app.utils.circuit_breaker import CircuitBreaker
+
+DOC = 'Update item AB12345 org 100\nLead time: 10 -> 14'
+
+
+def _app(tmp_path, **config):
+    app = Flask(__name__)
+    app.config.update(AI_MODEL='gpt-4', OPENAI_API_KEY='test-key', ANTHROPIC_API_KEY='',
+                      LLM_CACHE_FILE=str(tmp_path / 'llm_cache.sqlite3'))
+    app.config.update(config)
+    return app
+
+
+def test_llm_result_cached_by_content(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_llm(text, settings):
+        calls.append(text)
+        return {'success': True, 'changes': [{'item': 'AB12345'}], 'message': 'ok', 'engine': 'openai'}
+
+    monkeypatch.setattr(ai_parser, '_request_llm', fake_llm)
+    with _app(tmp_path).app_context():
+        first = ai_parser.parse_document(DOC)
+        # 只有空白差异的同一文档命中缓存
+        second = ai_parser.parse_document('  Update item   AB12345 org 100\n\nLead time: 10 -> 14  ')
+    assert len(calls) == 1
+    assert first['cached'] is False and second['cached'] is True
+    assert second['changes'] == first['changes']
+
+
+def test_rule_fallback_not_cached(tmp_path, monkeypatch):
+    def failing_llm(text, settings):
+        raise ConnectionError('provider down')
+
+    monkeypatch.setattr(ai_parser, '_request_llm', failing_llm)
+    with _app(tmp_path, LLM_MAX_RETRIES=0).app_context():
+        ai_parser.parse_document(DOC)
+        assert ai_parser.parse_document(DOC)['cached'] is False
+
+
+def test_ttl_and_prompt_version(tmp_path):
+    cache = LLMCache(str(tmp_path / 'c.sqlite3'), ttl=0.05)
+    key = make_key(DOC, 'gpt-4', 1)
+    assert make_key(DOC, 'gpt-4', 2) != key
+    cache.put(key, 'gpt-4', {'changes': []}, latency=1.5)
+    assert cache.get(key) == {'changes': []}
+    time.sleep(0.1)
+    assert cache.get(key) is None
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['expired'] == 1 and stats['latency_saved_s'] == 1.5
+
+
+class _StubModel(BaseHTTPRequestHandler):
+    """OpenAI兼容的 /chat/completions：回显文档第一行为物料号；'FLAKY' 文档首次返回500"""
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    seen = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        doc = body['messages'][-1]['content'].split('文档内容：\n', 1)[1].split('\n', 1)[0]
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+            flaky = doc.startswith('FLAKY') and doc not in cls.seen
+            cls.seen.add(doc)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.active -= 1
+        if flaky:
+            self.send_response(500)
+            self.end_headers()
+            return
+        content = json.dumps({'changes': [{'item': doc}]})
+        payload = json.dumps({
+            'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_parse_documents_against_stub_server(tmp_path):
+    pytest.importorskip('openai')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubModel)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        app = _app(tmp_path, OPENAI_BASE_URL=f'http://127.0.0.1:{server.server_port}/v1',
+                   LLM_CACHE_FILE='', LLM_TIMEOUT=5)
+        docs = [f'DOC{i:02d}' for i in range(12)] + ['FLAKY01', 'DOC03']
+        with app.app_context():
+            results = ai_parser.parse_documents(docs, concurrency=4, rate=0, retries=2)
+    finally:
+        server.shutdown()
+
+    # 顺序与输入一致，失败的调用重试后成功，重复文档只调用一次
+    assert [r['changes'][0]['item'] for r in results] == docs
+    assert all(r['engine'] == 'openai' for r in results)
+    assert 1 < _StubModel.peak <= 4
+
+
+def test_cascade_skips_llm_for_confident_lines(tmp_path, monkeypatch):
+    sent = []
+
+    def fake_llm(text, settings):
+        sent.append(text)
+        return {'success': True, 'changes': [{'item': 'AB12345', 'field': 'lead_time'}],
+                'message': 'ok', 'engine': 'openai'}
+
+    monkeypatch.setattr(ai_parser, '_request_llm', fake_llm)
+    confident = 'Item: SAMPLE-001, change status from Active to Inactive\nItem: SAMPLE-003, BOM update'
+    with _app(tmp_path, LLM_CACHE_FILE='').app_context():
+        rules = ai_parser.parse_document('Requestor: Business Team\n' + confident)
+        mixed = ai_parser.parse_document(confident + '\nPlease review lead time for AB12345')
+
+    assert rules['path'] == 'rules' and rules['llm_lines'] == 0
+    assert [c['item'] for c in rules['changes']] == ['SAMPLE-001', 'SAMPLE-003']
+    # 只有低置信度的一行交给AI
+    assert sent == ['Please review lead time for AB12345']
+    assert mixed['path'] == 'mixed' and (mixed['rule_lines'], mixed['llm_lines']) == (2, 1)
+    assert [c['item'] for c in mixed['changes']] == ['SAMPLE-001', 'SAMPLE-003', 'AB12345']
+
+
+def test_parse_stream_chunks_and_dedupes(tmp_path, monkeypatch):
+    chunks = []
+
+    def fake_llm(text, settings):
+        chunks.append(text)
+        return {'success': True, 'changes': [{'item': line.split()[-1], 'field': 'misc'} for line in text.split('\n')],
+                'message': 'ok', 'engine': 'openai'}
+
+    monkeypatch.setattr(ai_parser, '_request_llm', fake_llm)
+    # 每行只有物料号、规则无法确定字段，全部交给AI；后半部分重复的记录应被去重
+    lines = [f'please review item code XX{i:05d}' for i in range(200)] * 2
+    doc = io.BytesIO('\n'.join(lines).encode('utf-8'))
+    with _app(tmp_path, LLM_CACHE_FILE='', LLM_RATE_LIMIT=0).app_context():
+        changes = list(ai_parser.parse_stream(doc, chunk_tokens=100, concurrency=3))
+
+    assert len(chunks) > 10
+    assert all(ai_parser._estimate_tokens(c) <= 100 + 20 for c in chunks)
+    assert [c['item'] for c in changes] == [f'XX{i:05d}' for i in range(200)]
+
+
+def test_stream_reports_failed_chunks():
+    def parse_chunk(text):
+        if text == 'bad':
+            raise RuntimeError('LLM timeout')
+        return [{'item': text, 'field': 'misc'}]
+
+    out = list(ai_parser._stream_changes(iter(['A1', 'bad', 'A2']), parse_chunk, concurrency=2, window=10))
+    assert [c.get('item') for c in out] == ['A1', None, 'A2']
+    assert out[1]['chunk_error'] and out[1]['chunk'] == 2 and 'LLM timeout' in out[1]['message']
+
+
+def test_circuit_breaker_half_open_probe():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    time.sleep(0.06)
+    # 半开：只放行一个探测
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_open_breaker_routes_to_rules(tmp_path):
+    pytest.importorskip('openai')
+    breaker = llm_providers._breakers['openai']
+    metrics = llm_providers._metrics['openai']
+    calls_before = metrics.calls
+    llm_providers.configure_breakers(2, 60)
+    try:
+        # 端口1无服务：连接被拒绝
+        app = _app(tmp_path, OPENAI_BASE_URL='http://127.0.0.1:1/v1', LLM_CACHE_FILE='', LLM_MAX_RETRIES=0)
+        with app.app_context():
+            results = [ai_parser.parse_document(f'Unknown request {i}') for i in range(4)]
+        assert all(r['engine'] == 'rules' for r in results)
+        assert breaker.state == 'open'
+        # 熔断后不再发起调用
+        assert metrics.calls - calls_before == 2
+        assert llm_providers.provider_stats()['openai']['breaker']['rejected'] >= 2
+    finally:
+        breaker.record_success()
+        llm_providers.configure_breakers(5, 30)
@@ -28,7 +28,7 @@ def test_app_creation():
     """测试应用创建"""
     try:
         from app import create_app
-        app = create_app()
+        app = create_app('testing')
         
         assert app is not None
         print("✓ Flask应用创建成功")
@@ -41,7 +41,7 @@ def test_routes():
     """测试路由注册"""
     try:
         from app import create_app
-        app = create_app()
+        app = create_app('testing')
         
         rules = [str(rule) for rule in app.url_map.iter_rules()]
         
@@ -62,7 +62,7 @@ def test_ai_parser():
     """测试AI解析器"""
     try:
         from app import create_app
-        app = create_app()
+        app = create_app('testing')
         
         with app.app_context():
             from app.services.ai_parser import parse_document
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+字段词典存储测试 - ID/业务描述索引、写入通知、外部修改后自动重新加载
+"""
+import json
+import os
+import sys
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+
+from app.services.dictionary_store import DictionaryStore, DuplicateEntry
+
+ENTRIES = [
+    {'id': 1, 'business_desc': '提前期', 'field_name': 'lead_time', 'system': 'EBS', 'description': ''},
+    {'id': 3, 'business_desc': 'MOQ', 'field_name': 'moq', 'system': 'EBS', 'description': ''},
+]
+
+
+def test_indexes_writes_and_notifications(tmp_path):
+    path = tmp_path / 'field_dictionary.json'
+    path.write_text(json.dumps(ENTRIES, ensure_ascii=False), encoding='utf-8')
+    store = DictionaryStore(str(path))
+    notified = []
+    store.subscribe(notified.append)
+    store.subscribe(notified.append)
+
+    assert store.get(3)['field_name'] == 'moq'
+    assert store.find_by_desc(' moq ')['id'] == 3
+    assert [e['id'] for e in store.find_by_field('LEAD_TIME')] == [1]
+
+    added = store.add({'business_desc': '最小包装量', 'field_name': 'foq', 'system': 'EBS'})
+    assert added['id'] == 4
+    assert store.update(1, {'field_name': 'lead_time_days'})['business_desc'] == '提前期'
+    assert store.delete(3) and not store.delete(3)
+    assert store.update(3, {}) is None
+
+    assert len(notified) == 3 and [e['id'] for e in notified[-1]] == [1, 4]
+    assert [e['id'] for e in json.loads(path.read_text(encoding='utf-8'))] == [1, 4]
+    assert store.reloads == 1
+
+
+def test_reloads_after_external_edit(tmp_path):
+    path = tmp_path / 'field_dictionary.json'
+    path.write_text(json.dumps(ENTRIES, ensure_ascii=False), encoding='utf-8')
+    store = DictionaryStore(str(path))
+    notified = []
+    store.subscribe(notified.append)
+    assert store.find_by_desc('MOQ') is not None
+
+    path.write_text(json.dumps(ENTRIES[:1], ensure_ascii=False), encoding='utf-8')
+    assert store.find_by_desc('MOQ') is None
+    assert store.reloads == 2 and len(notified) == 1
+
+
+def test_business_desc_unique_on_add_and_update(tmp_path):
+    path = tmp_path / 'field_dictionary.json'
+    path.write_text(json.dumps(ENTRIES, ensure_ascii=False), encoding='utf-8')
+    store = DictionaryStore(str(path))
+
+    with pytest.raises(DuplicateEntry):
+        store.add({'business_desc': ' moq ', 'field_name': 'moq2'})
+    with pytest.raises(DuplicateEntry):
+        store.update(1, {'business_desc': 'MOQ'})
+    assert store.update(3, {'business_desc': 'moq'})['business_desc'] == 'moq'
+
+    # JSON null 按空字符串处理，空业务描述不参与唯一性检查
+    assert store.add({'business_desc': None, 'field_name': None})['business_desc'] == ''
+    assert store.add({'business_desc': None})['field_name'] == ''
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+物料主数据SQLite替身测试 - 填充、单个/批量查询、往返计数、连接池等待超时
+"""
+import json
+import os
+import sys
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask import Flask
+
+from app.services import ebs_service
+from app.utils import item_master
+from app.utils.db import DatabaseUnavailable
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(item_master, '_backend', item_master._backend)
+    monkeypatch.setattr(item_master, '_backend_name', item_master._backend_name)
+    requests_file = tmp_path / 'change_requests.json'
+    requests_file.write_text(json.dumps([{'items': ['WAL652290N', 'LP145886']}]), encoding='utf-8')
+    app = Flask(__name__)
+    app.config.update(ITEM_MASTER_BACKEND='sqlite', ITEM_MASTER_SQLITE_FILE=str(tmp_path / 'items.sqlite3'),
+                      ITEM_MASTER_SEED_ITEMS=50, REQUESTS_FILE=str(requests_file),
+                      DB_POOL_MAX=2, DB_POOL_WAIT_TIMEOUT_MS=50)
+    item_master.init_item_master(app)
+    return app
+
+
+def test_seeded_items_served_through_ebs_service(app):
+    master = item_master.get_item_master()
+    count = master.execute_query('SELECT COUNT(DISTINCT segment1) AS n FROM mtl_system_items_b')[0]['N']
+    assert count == 50
+
+    with app.app_context():
+        result = ebs_service.query_item_info('WAL652290N', use_cache=False)
+    assert result['ebs_data']['ITEM_NUMBER'] == 'WAL652290N'
+    assert result['ebs_data']['DESCRIPTION'] != 'Sample Item Description'
+
+    before = master.stats()['round_trips']
+    rows = ebs_service.query_items_batch(['LP145886', 'SIM000000', 'NOPE1'], use_cache=False)
+    assert master.stats()['round_trips'] - before == 1
+    assert rows['LP145886']['ebs_found'] and rows['SIM000000']['ebs_found']
+    assert not rows['NOPE1']['ebs_found']
+
+
+def test_pool_exhaustion_raises_database_unavailable(app):
+    master = item_master.get_item_master()
+    held = [master.iter_query('SELECT segment1 FROM mtl_system_items_b', arraysize=1, prefetchrows=0)
+            for _ in range(2)]
+    for rows in held:
+        next(rows)
+    with pytest.raises(DatabaseUnavailable):
+        next(master.iter_query('SELECT 1 AS x'))
+    assert master.stats()['acquire_timeouts'] == 1
+    # 整批因取不到连接失败：可重试
+    assert all(r['retryable'] for r in ebs_service.update_ebs_items([('SIM000001', 'moq', '5')])['results'])
+
+    for rows in held:
+        rows.close()
+    assert master.execute_query('SELECT 1 AS x') == [{'X': 1}]
+    assert master.stats()['busy'] == 0
+
+
+def test_batched_writeback_reports_per_row_errors(app):
+    master = item_master.get_item_master()
+    before = master.stats()['round_trips']
+    result = ebs_service.update_ebs_items([
+        ('SIM000001', 'lead_time', '21 days'),
+        ('SIM000002', 'lead_time', '-3'),          # 违反约束
+        ('NOPE1', 'lead_time', '14'),              # 物料不存在
+        ('SIM000003', 'moq', 'n/a'),               # 数值无效，不发往数据库
+        ('SIM000004', 'lead_time = 0; --', 'X'),   # 非法字段名
+        ('SIM000005', 'item_status', 'Inactive'),
+    ])
+    # 两个字段组各一次 executemany（执行 + 提交）
+    assert master.stats()['round_trips'] - before == 4
+    assert [r['success'] for r in result['results']] == [True, False, False, False, False, True]
+    assert result['updated'] == 2 and not result['success']
+    # 单行错误（约束、物料不存在）是数据问题，重试也不会成功
+    assert not any(r['retryable'] for r in result['results'])
+
+    rows = ebs_service.query_items_batch(['SIM000001', 'SIM000002', 'SIM000005'], use_cache=False)
+    lead_times = master.execute_query(
+        "SELECT segment1, full_lead_time FROM mtl_system_items_b "
+        "WHERE segment1 IN ('SIM000001', 'SIM000002') AND organization_id = 101 ORDER BY segment1")
+    assert lead_times[0]['FULL_LEAD_TIME'] == 21 and lead_times[1]['FULL_LEAD_TIME'] != -3
+    assert rows['SIM000005']['ebs_data']['STATUS'] == 'Inactive'
+
+
+def test_fields_outside_writeback_scope_are_skipped(app):
+    master = item_master.get_item_master()
+    before = master.stats()['round_trips']
+    result = ebs_service.update_ebs_items([
+        ('SIM000001', 'bom', 'Rev B'),
+        ('SIM000002', 'formula', 'MBR-100'),
+        ('SIM000003', 'buyer_code', 'JS'),
+    ])
+    assert master.stats()['round_trips'] == before
+    assert result['success'] and result['updated'] == 0 and result['skipped'] == 3
+    assert all(r['success'] and r['skipped'] and not r['retryable'] for r in result['results'])
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MDM解析器测试 - 单遍扫描器与逐条规则扫描结果一致
+"""
+import json
+import os
+import re
+import sys
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.services import mdm_parser
+from app.services.mdm_parser import RULES, ITEM_PATTERNS, RULE_FIRST_CHARS, parse_request
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'data')
+
+
+def _corpus():
+    """change_requests.json + sample_requests → (title, instructions, request_type)"""
+    with open(os.path.join(DATA_DIR, 'change_requests.json'), encoding='utf-8') as f:
+        records = [(r.get('source_title', ''), r.get('instructions', ''), r.get('change_type', ''))
+                   for r in json.load(f)]
+    with open(os.path.join(DATA_DIR, 'sample_requests', 'sharepoint_mdm_requests.json'), encoding='utf-8') as f:
+        records += [(r.get('title', ''), r.get('instructions', ''), r.get('type', '')) for r in json.load(f)]
+    # Without the type hint every record goes through the rule scanner
+    return records + [(t, i, '') for t, i, _ in records]
+
+
+def _sequential_rule(text):
+    """逐条规则扫描（原实现）"""
+    for idx, (pattern, _, _) in enumerate(RULES):
+        if re.search(pattern, text):
+            return idx
+    return None
+
+
+def _sequential_items(text):
+    """逐个物料号模式扫描（原实现）"""
+    items = []
+    seen = set()
+    for pattern in ITEM_PATTERNS:
+        for m in re.finditer(pattern, text):
+            item = m.group(1)
+            if item.isdigit() and (len(item) < 5 or int(item) < 10000):
+                continue
+            if item not in seen:
+                items.append(item)
+                seen.add(item)
+    return items[:20]
+
+
+def test_rule_scanner_matches_sequential():
+    """组合规则扫描器保持"第一条规则优先" """
+    for title, instructions, _ in _corpus():
+        text = f"{title} {instructions}".strip()
+        assert mdm_parser._first_rule(text) == _sequential_rule(text), text
+
+
+def test_item_scanner_matches_sequential():
+    """单遍物料号提取与逐模式提取顺序一致"""
+    for title, instructions, _ in _corpus():
+        text = f"{title} {instructions}".strip()
+        assert mdm_parser._extract_items(text) == _sequential_items(text), text
+    # Same position, different text from different patterns
+    assert mdm_parser._extract_items('PM12345-1 RM1918') == _sequential_items('PM12345-1 RM1918')
+
+
+def test_rule_first_chars_cover_rules():
+    """RULE_FIRST_CHARS 覆盖所有规则匹配的首字母"""
+    for title, instructions, _ in _corpus():
+        text = f"{title} {instructions}".strip()
+        for pattern, _, _ in RULES:
+            for m in re.finditer(pattern, text):
+                assert m.group(0)[0].lower() in RULE_FIRST_CHARS, (pattern, m.group(0))
+
+
+def test_parse_request_examples():
+    """典型请求解析"""
+    result = parse_request('HL FG status change - transition to DISC',
+                           'Please change the HL FG status from TRANSITION to DISC: HLL56326-13 HLL14235-07',
+                           'Status Change Requests')
+    assert result['field'] == 'item_status'
+    assert result['items'] == ['HLL56326-13', 'HLL14235-07']
+    assert (result['old_value'], result['new_value']) == ('TRANSITION', 'DISC')
+
+    result = parse_request('TOP649972 Pallet Configuration Update', 'New pallet configuration 15x7, AND org')
+    assert result['field'] == 'pallet_config'
+    assert result['new_value'] == '15/7'
+    assert result['orgs'] == ['AND']
+
+    assert parse_request('', '')['field'] == 'other'
+
+
+def test_parse_cache_hits_and_isolation():
+    """解析缓存命中统计，返回结果互不影响"""
+    mdm_parser._parse_cache.clear()
+    before = mdm_parser.parse_cache_stats()
+
+    first = parse_request('WAL653192 LABEL LP145886 STATUS CHANGE FROM DISC TO APPROVE', '', 'BOM Updates')
+    first['items'].append('MUTATED')
+    second = parse_request('WAL653192 LABEL LP145886 STATUS CHANGE FROM DISC TO APPROVE', '', 'BOM Updates')
+
+    stats = mdm_parser.parse_cache_stats()
+    assert stats['misses'] == before['misses'] + 1
+    assert stats['hits'] == before['hits'] + 1
+    assert 'MUTATED' not in second['items']
+    assert stats['parser_version'] == mdm_parser.parser_version()
+
+
+def test_parse_cache_keyed_on_version(monkeypatch):
+    """解析器版本变化后不再命中旧条目"""
+    key = mdm_parser._cache_key('358642', 'rounding multiple to 25kg', '')
+    monkeypatch.setattr(mdm_parser, 'PARSER_VERSION', 'changed')
+    assert mdm_parser._cache_key('358642', 'rounding multiple to 25kg', '') != key
+
+
+def test_dictionary_keywords_drive_parsing():
+    """字典关键词经后台重建后生效，并使缓存失效"""
+    from app.services.keyword_engine import dictionary_keywords
+
+    title, instructions = 'Please change the shelf life for 3300228', 'DDR'
+    assert parse_request(title, instructions)['field'] != 'shelf_life'
+    old_version = mdm_parser.parser_version()
+
+    try:
+        dictionary_keywords.rebuild_async([
+            {'id': 1, 'business_desc': 'shelf life, expiry', 'field_name': 'shelf_life', 'system': 'EBS'},
+            {'id': 2, 'business_desc': 'change buyer', 'field_name': 'buyer_code', 'system': 'EBS'},
+        ])
+        dictionary_keywords.wait(5)
+
+        assert mdm_parser.parser_version() != old_version
+        result = parse_request(title, instructions)
+        assert (result['field'], result['system'], result['category']) == ('shelf_life', 'EBS', 'Shelf Life')
+        assert parse_request('Update expiry dating', '')['field'] == 'shelf_life'
+        # Known fields keep their built-in category label
+        assert parse_request('Change buyer code', '')['category'] == 'Buyer/Planner Update'
+    finally:
+        dictionary_keywords.load([])
+
+
+def test_aho_corasick_finds_overlapping_keywords():
+    """Aho–Corasick 一遍找出所有（含重叠）关键词"""
+    from app.services.keyword_engine import AhoCorasick, tokenize
+
+    automaton = AhoCorasick([(tuple(tokenize(k)), k) for k in ('update bom', 'bom', 'bom label', 'label')])
+    hits = sorted(automaton.find_all(tokenize('Please UPDATE BOM label')))
+    assert hits == [(1, 2, 'update bom'), (2, 1, 'bom'), (2, 2, 'bom label'), (3, 1, 'label')]
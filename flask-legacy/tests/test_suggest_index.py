@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+输入联想测试 - 前缀补全、字典变更通知、请求文件变化后重建
+"""
+import json
+import os
+import sys
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.services.dictionary_store import DictionaryStore
+from app.services.suggest_index import SuggestIndex, _Sorted
+
+REQUESTS = [
+    {'request_id': 'R1', 'item': 'AB12345', 'items': ['AB12345', 'AB12999'], 'requestor': 'Tina Willis', 'assigned_to': ''},
+    {'request_id': 'R2', 'item': 'CD00001', 'requestor': 'tina willis', 'assigned_to': 'Bob Chen'},
+]
+
+
+def test_prefix_completion_and_refresh(tmp_path):
+    dictionary = tmp_path / 'field_dictionary.json'
+    dictionary.write_text(json.dumps([{'id': 1, 'business_desc': '提前期', 'field_name': 'lead_time'}],
+                                     ensure_ascii=False), encoding='utf-8')
+    requests_file = tmp_path / 'change_requests.json'
+    requests_file.write_text(json.dumps(REQUESTS), encoding='utf-8')
+    store = DictionaryStore(str(dictionary))
+    index = SuggestIndex(str(requests_file), store)
+
+    assert index.suggest('item', 'ab1') == [{'value': 'AB12345', 'count': 2}, {'value': 'AB12999', 'count': 1}]
+    assert index.suggest('item', 'ab', limit=1) == [{'value': 'AB12345', 'count': 2}]
+    assert index.suggest('requestor', 'TINA') == [{'value': 'Tina Willis', 'count': 2}]
+    assert [s['value'] for s in index.suggest('assignee', '')] == ['Bob Chen']
+    assert index.suggest('item', 'zz') == []
+
+    store.add({'business_desc': '最小起订量', 'field_name': 'moq'})
+    assert [s['value'] for s in index.suggest('field_name', '')] == ['lead_time', 'moq']
+    assert [s['value'] for s in index.suggest('business_desc', '最小')] == ['最小起订量']
+
+    requests_file.write_text(json.dumps(REQUESTS + [{'request_id': 'R3', 'item': 'AB13000'}]), encoding='utf-8')
+    index.suggest('item', 'ab')
+    index.wait()
+    assert [s['value'] for s in index.suggest('item', 'ab13')] == ['AB13000']
+
+
+    # 本进程写入后同步重建，下一次查询就是新数据
+    updated = REQUESTS + [{'request_id': f'R{n}', 'item': 'AB12999'} for n in range(4, 7)]
+    requests_file.write_text(json.dumps(updated), encoding='utf-8')
+    index.refresh_requests(updated)
+    assert index.suggest('item', 'ab', limit=1) == [{'value': 'AB12999', 'count': 4}]
+
+
+def test_top_k_ranks_by_count_for_broad_prefixes():
+    values = [f'U{n:05d}' for n in range(5000)] + ['U04321'] * 7 + ['U00999'] * 3 + ['V1']
+    index = _Sorted(values, top_k=5)
+    assert [s['value'] for s in index.complete('u', 3)] == ['U04321', 'U00999', 'U00000']
+    assert [s['value'] for s in index.complete('U04', 2)] == ['U04321', 'U04000']
+    assert [s['value'] for s in index.complete('', 2)] == ['U04321', 'U00999']
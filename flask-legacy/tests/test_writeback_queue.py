@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+回写队列测试 - 重试退避、Applied/Failed 状态流转、死信与重新入队、重启恢复
+"""
+import json
+import os
+import sys
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.services import writeback_queue
+from app.services.writeback_queue import WritebackQueue, process_job
+
+CHANGE = {'system': 'EBS', 'item': 'AB12345', 'items': ['AB12345'], 'field': 'lead_time', 'new_value': '14'}
+
+
+def _store(tmp_path):
+    path = tmp_path / 'change_requests.json'
+    path.write_text(json.dumps([{'request_id': 'R1', 'status': 'Approved'}]), encoding='utf-8')
+    return str(path)
+
+
+def _status(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)[0]['status']
+
+
+def _outcome(success, retryable=False):
+    return {'update_success': success, 'update_message': 'ok' if success else 'ORA-03113',
+            'update_errors': [], 'retryable': retryable}
+
+
+def test_retries_with_backoff_then_applied(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    queue = WritebackQueue(str(tmp_path / 'queue.sqlite3'), max_attempts=3, retry_base=0.0)
+    outcomes = iter([_outcome(False, retryable=True), _outcome(True)])
+    monkeypatch.setattr(writeback_queue, 'apply_writeback', lambda change: next(outcomes))
+
+    job_id = queue.enqueue('R1', CHANGE)
+    process_job(queue, queue.claim(), store)
+    job = queue.get(job_id)
+    assert job['state'] == 'queued' and job['last_error'] == 'ORA-03113'
+    assert _status(store) == 'Approved'
+
+    process_job(queue, queue.claim(), store)
+    job = queue.get(job_id)
+    assert job['state'] == 'done' and job['attempts'] == 2
+    assert _status(store) == 'Applied'
+    assert queue.claim() is None
+
+
+def test_backoff_delay_doubles(tmp_path):
+    queue = WritebackQueue(str(tmp_path / 'queue.sqlite3'), max_attempts=5, retry_base=10.0)
+    queue.enqueue('R1', CHANGE)
+    job = queue.claim()
+    first = queue.fail(job, 'down')
+    assert queue.claim() is None  # 还没到重试时间
+    job['attempts'] = 2
+    second = queue.fail(job, 'down')
+    assert 8 <= first <= 12 and 16 <= second <= 24
+
+
+def test_permanent_failure_goes_to_dead_letters_and_requeue(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    queue = WritebackQueue(str(tmp_path / 'queue.sqlite3'), max_attempts=5, retry_base=0.0)
+    monkeypatch.setattr(writeback_queue, 'apply_writeback', lambda change: _outcome(False))
+
+    job_id = queue.enqueue('R1', CHANGE)
+    process_job(queue, queue.claim(), store)
+    assert [job['id'] for job in queue.dead_letters()] == [job_id]
+    assert _status(store) == 'Failed'
+
+    assert queue.requeue(job_id)
+    assert not queue.requeue(job_id)
+    assert queue.claim()['id'] == job_id
+
+
+def test_claim_once_across_processes_and_lease_expiry(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    queue, other = WritebackQueue(path, lease=60.0), WritebackQueue(path, lease=60.0)
+    job_id = queue.enqueue('R1', CHANGE)
+    job = queue.claim()
+    assert job['id'] == job_id
+    assert other.claim() is None
+
+    # 另一进程重启：租约未过期的任务不动
+    assert WritebackQueue(path).recover() == 0
+
+    # 执行进程退出、租约过期后被重新领取，原进程迟到的结果不再生效
+    expired = WritebackQueue(path, lease=0.0)
+    expired.enqueue('R2', CHANGE)
+    stale = expired.claim()
+    retaken = other.claim()
+    assert retaken['id'] == stale['id'] and retaken['attempts'] == 2
+    expired.complete(stale, None)
+    assert other.get(stale['id'])['state'] == 'running'
+    other.complete(retaken, None)
+    assert other.get(stale['id'])['state'] == 'done'
+
+
+def test_skipped_fields_keep_request_approved(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    queue = WritebackQueue(str(tmp_path / 'queue.sqlite3'))
+    skipped = dict(_outcome(True), update_skipped=[{'item': 'AB12345', 'field': 'bom', 'skipped': True}])
+    monkeypatch.setattr(writeback_queue, 'apply_writeback', lambda change: skipped)
+
+    job_id = queue.enqueue('R1', dict(CHANGE, field='bom'))
+    process_job(queue, queue.claim(), store)
+    assert queue.get(job_id)['state'] == 'done'
+    assert _status(store) == 'Approved'